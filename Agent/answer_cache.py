@@ -0,0 +1,112 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from Config.config import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+    PERSONAL_DATA_TOOLS,
+)
+from Logs.logs import LOGGER_NAME
+from Tool.embedding_index import embed_query
+from Tool.text_utils import CREDENTIAL_PATTERN
+
+logger = logging.getLogger(LOGGER_NAME)
+
+# 涉及个人数据的提问：即使语义相近也不能复用别人的回答
+PERSONAL_QUERY_PATTERN = re.compile(r"成绩|绩点|学分|课表|余额|学号|密码|账号|我的")
+
+
+class AnswerCache:
+    """
+    语义答案缓存：对问题做 Embedding，在有效期 (TTL) 内找到相似度超过阈值的历史问题时，
+    直接返回当时的最终回答，跳过整轮 LLM + 工具调用。
+
+    调用过个人数据工具 (如 search_jiaowu_score) 的回答永远不会写入缓存，
+    涉及个人数据或疑似包含账号密码的提问既不查询缓存，也不生成 Embedding。
+    问题向量只保存在内存中，不写入磁盘上的向量缓存，避免用户原文 (可能含凭据) 落盘。
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 capacity: int = ANSWER_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.capacity = capacity
+        self._vectors: List[np.ndarray] = []
+        self._entries: List[Dict] = []   # {"question", "answer", "created_at", "latency"}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def is_cacheable_question(question: str) -> bool:
+        return not (PERSONAL_QUERY_PATTERN.search(question) or CREDENTIAL_PATTERN.search(question))
+
+    def _evict_expired(self, now: float) -> None:
+        keep = [i for i, entry in enumerate(self._entries) if now - entry["created_at"] <= self.ttl]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = [self._vectors[i] for i in keep]
+
+    def lookup(self, question: str) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+        """
+        返回 (命中的缓存条目或 None, 问题向量)。问题向量可在未命中时交给 store 复用，
+        避免对同一问题重复生成 Embedding。
+        """
+        if not self.is_cacheable_question(question):
+            return None, None
+
+        try:
+            vector = embed_query(question, persist=False)
+        except Exception as e:
+            logger.warning("• 答案缓存 Embedding 失败，跳过缓存: %s", e)
+            return None, None
+
+        with self._lock:
+            self._evict_expired(time.time())
+            if self._vectors:
+                similarities = np.stack(self._vectors) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = dict(self._entries[best], similarity=float(similarities[best]))
+                    self.hits += 1
+                    self.saved_seconds += entry["latency"]
+                    return entry, vector
+            self.misses += 1
+            return None, vector
+
+    def store(self, question: str, vector: Optional[np.ndarray], answer: str, latency: float,
+              used_tools: Iterable[str]) -> bool:
+        """写入一次完整运行的最终回答，调用过个人数据工具或回答为空时不写入。"""
+        if vector is None or not answer or set(used_tools) & set(PERSONAL_DATA_TOOLS):
+            return False
+
+        with self._lock:
+            self._vectors.append(np.asarray(vector, dtype=np.float32))
+            self._entries.append({
+                "question": question,
+                "answer": answer,
+                "created_at": time.time(),
+                "latency": latency,
+            })
+            if len(self._entries) > self.capacity:
+                del self._entries[0], self._vectors[0]
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+answer_cache = AnswerCache()
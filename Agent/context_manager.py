@@ -0,0 +1,206 @@
+import ast
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from Config.config import (
+    CONTEXT_EXCERPT_CHARS,
+    CONTEXT_KEEP_RECENT_ROUNDS,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TOOL_RESULT_MAX_TOKENS,
+)
+from Tool.text_utils import estimate_tokens
+
+COMPACTED_PREFIX = "【已压缩的工具结果】"
+TRUNCATED_SUFFIX = "……【结果过长，已截断】"
+MESSAGE_OVERHEAD_TOKENS = 4   # 每条消息的角色、分隔符等固定开销
+
+URL_PATTERN = re.compile(r"https?://[^\s'\"<>\]\)，。]+")
+# 压缩时保留的关键字段 (原样保留)，以及作为正文摘录的字段
+KEY_FIELDS = ("title", "date", "url", "link", "标题", "日期", "网址", "课程名称", "成绩", "学分")
+EXCERPT_FIELDS = ("content", "snippet", "summary", "正文")
+
+
+def _parse_payload(content: str) -> Any:
+    """工具结果可能是 JSON，也可能是 Python 字面量的字符串形式，解析失败返回 None。"""
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            return parse(content)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            continue
+    return None
+
+
+def _key_facts(node: Any, facts: List[Dict[str, str]]) -> None:
+    """递归提取每条记录的关键字段与一小段正文摘录。"""
+    if isinstance(node, dict):
+        fact = {key: str(node[key]) for key in KEY_FIELDS if node.get(key)}
+        for key in EXCERPT_FIELDS:
+            if isinstance(node.get(key), str) and node[key]:
+                fact["摘录"] = node[key][:CONTEXT_EXCERPT_CHARS]
+                break
+        if fact:
+            facts.append(fact)
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                _key_facts(value, facts)
+    elif isinstance(node, list):
+        for item in node:
+            _key_facts(item, facts)
+
+
+def summarize_tool_result(content: str) -> str:
+    """
+    抽取式压缩：保留每条记录的标题、日期、网址等关键字段和一小段摘录，丢弃其余正文。
+    无法解析结构时退回为 "开头摘录 + 所有网址"。
+    """
+    original_tokens = estimate_tokens(content)
+    facts: List[Dict[str, str]] = []
+    _key_facts(_parse_payload(content), facts)
+
+    if facts:
+        body = json.dumps(facts, ensure_ascii=False, separators=(",", ":"))
+    else:
+        urls = list(dict.fromkeys(URL_PATTERN.findall(content)))
+        body = content[:CONTEXT_EXCERPT_CHARS * 2]
+        if urls:
+            body += " 网址: " + " ".join(urls)
+    return f"{COMPACTED_PREFIX}(原约 {original_tokens} tokens，仅保留关键信息) {body}"
+
+
+def _shrink_strings(node: Any, ratio: float) -> Any:
+    """按比例缩短结构中的长字符串 (正文等)，关键字段和短字符串保持不变。"""
+    if isinstance(node, dict):
+        return {key: value if key in KEY_FIELDS else _shrink_strings(value, ratio) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_shrink_strings(item, ratio) for item in node]
+    if isinstance(node, str) and len(node) > CONTEXT_EXCERPT_CHARS:
+        keep = max(CONTEXT_EXCERPT_CHARS, int(len(node) * ratio))
+        return node[:keep] + ("……" if keep < len(node) else "")
+    return node
+
+
+def fit_tool_result(content: str, max_tokens: int) -> str:
+    """
+    把单条工具结果压到 max_tokens 以内：能解析出结构时按比例缩短每条记录的正文，
+    保留全部标题 / 网址；否则退回为按长度截断。
+    """
+    tokens = estimate_tokens(content)
+    if tokens <= max_tokens:
+        return content
+    payload = _parse_payload(content)
+    if isinstance(payload, (dict, list)):
+        ratio = max_tokens / tokens
+        for _ in range(4):
+            fitted = json.dumps(_shrink_strings(payload, ratio), ensure_ascii=False, separators=(",", ":"))
+            if estimate_tokens(fitted) <= max_tokens:
+                return fitted
+            ratio *= 0.7
+    return truncate_text(content, max_tokens)
+
+
+def truncate_text(content: str, max_tokens: int) -> str:
+    """按估算 token 截断文本 (二分查找保留的字符数)，保留被截掉部分里出现的网址。"""
+    if estimate_tokens(content) <= max_tokens:
+        return content
+    low, high = 0, len(content)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(content[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    head = content[:low]
+    dropped_urls = [url for url in dict.fromkeys(URL_PATTERN.findall(content[low:])) if url not in head]
+    tail = f" 其余网址: {' '.join(dropped_urls)}" if dropped_urls else ""
+    return head + TRUNCATED_SUFFIX + tail
+
+
+class ContextManager:
+    """
+    管理智能体循环中的消息列表，让每次调用模型时的输入 token 保持有界：
+
+    1. 工具结果加入时，单条超过 tool_result_max_tokens 的先缩短正文，无法解析时直接截断；
+    2. 每次调用模型前若总量超过 budget，先把最近 keep_recent_rounds 轮以外的全部工具结果
+       按大小从大到小 (不区分轮次) 替换为关键信息摘要，仍然超出时再按同样顺序压缩最近几轮的结果，
+       直到回到预算以内。
+
+    token 数按 estimate_tokens 估算，并按消息缓存，避免每轮重复计算。
+    """
+
+    def __init__(self, messages: List[Dict[str, Any]], budget: int = CONTEXT_TOKEN_BUDGET,
+                 keep_recent_rounds: int = CONTEXT_KEEP_RECENT_ROUNDS,
+                 tool_result_max_tokens: int = CONTEXT_TOOL_RESULT_MAX_TOKENS):
+        self.messages = messages
+        self.budget = budget
+        self.keep_recent_rounds = keep_recent_rounds
+        self.tool_result_max_tokens = tool_result_max_tokens
+        self._counts: Dict[int, Tuple[Dict[str, Any], int]] = {}   # id(消息) -> (消息, token 数)
+
+    def count(self, message: Dict[str, Any]) -> int:
+        cached = self._counts.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.function if hasattr(tool_call, "function") else tool_call["function"]
+            name = function.name if hasattr(function, "name") else function["name"]
+            arguments = function.arguments if hasattr(function, "arguments") else function["arguments"]
+            tokens += estimate_tokens(name) + estimate_tokens(arguments or "")
+        self._counts[id(message)] = (message, tokens)
+        return tokens
+
+    def total_tokens(self) -> int:
+        return sum(self.count(message) for message in self.messages)
+
+    def add_tool_results(self, tool_messages: List[Dict[str, Any]]) -> None:
+        for message in tool_messages:
+            content = message.get("content") or ""
+            if estimate_tokens(content) > self.tool_result_max_tokens:
+                message = dict(message, content=fit_tool_result(content, self.tool_result_max_tokens))
+            self.messages.append(message)
+
+    def _tool_rounds(self) -> List[List[int]]:
+        """按轮次分组的 tool 消息下标：每条带 tool_calls 的 assistant 消息开启新的一轮。"""
+        rounds: List[List[int]] = []
+        for index, message in enumerate(self.messages):
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                rounds.append([])
+            elif message.get("role") == "tool" and rounds:
+                rounds[-1].append(index)
+        return rounds
+
+    def compact(self) -> Optional[Dict[str, int]]:
+        """超出预算时压缩工具结果，返回 {"before", "after", "compacted"}；无需压缩时返回 None。"""
+        before = self.total_tokens()
+        if before <= self.budget:
+            return None
+
+        rounds = self._tool_rounds()
+        stale = rounds[:max(len(rounds) - self.keep_recent_rounds, 0)]
+        recent = rounds[len(stale):]
+        # 先压缩最近几轮以外的结果，再压缩最近几轮的结果；两组内部都不分轮次，按大小先压缩最大的
+        candidates = [index for group in stale for index in group]
+        candidates.sort(key=lambda index: self.count(self.messages[index]), reverse=True)
+        recent_candidates = [index for group in recent for index in group]
+        recent_candidates.sort(key=lambda index: self.count(self.messages[index]), reverse=True)
+
+        total = before
+        compacted = 0
+        for index in candidates + recent_candidates:
+            if total <= self.budget:
+                break
+            message = self.messages[index]
+            content = message.get("content") or ""
+            if content.startswith(COMPACTED_PREFIX):
+                continue
+            summary = summarize_tool_result(content)
+            if estimate_tokens(summary) >= estimate_tokens(content):
+                continue
+            old_tokens = self.count(message)
+            self._counts.pop(id(message), None)
+            self.messages[index] = dict(message, content=summary)
+            total += self.count(self.messages[index]) - old_tokens
+            compacted += 1
+
+        return {"before": before, "after": total, "compacted": compacted}
@@ -0,0 +1,92 @@
+import concurrent.futures
+import inspect
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from Config.config import PREFETCH_RULES
+from Logs.tracing import bind, tracer
+from Tool.text_utils import CREDENTIAL_PATTERN, normalize_query
+
+QUERY_ARGUMENT = "query_text"   # 可预取工具的检索词参数名
+
+# 预取使用独立的小线程池：工具线程池里的任务会等待预取结果，共用一个池在满载时可能互相等待
+PREFETCH_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=max(len(PREFETCH_RULES), 1), thread_name_prefix="prefetch"
+)
+
+
+def predict_tools(user_input: str, rules: Dict[str, List[str]] = PREFETCH_RULES) -> List[str]:
+    """按关键词预测第一轮可能调用的工具 (按规则顺序，可能为空)。"""
+    return [name for name, keywords in rules.items() if any(keyword in user_input for keyword in keywords)]
+
+
+class SpeculativePrefetch:
+    """
+    推测式预取：第一轮模型调用发出的同时，用关键词规则预测可能用到的本地检索工具，
+    以用户原问题为检索词提前执行。用户原问题只在内存中缓存向量，不写入磁盘；
+    疑似包含账号密码的问题不做预取。
+
+    模型真正请求同名工具、且检索词归一化后与用户问题完全相同 (其余参数按默认值补全后一致) 时，
+    直接复用预取结果 (调用记忆表随后以模型的检索词记录它，二者必须是同一次检索)；
+    否则照常执行模型自己的检索，第一轮结束后未被认领的预取结果全部丢弃。
+    """
+
+    def __init__(self, user_input: str, tool_functions: Dict[str, Callable],
+                 rules: Dict[str, List[str]] = PREFETCH_RULES):
+        self.user_input = user_input
+        self.tool_functions = tool_functions
+        self.rules = rules
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+
+    def start(self, executor: concurrent.futures.Executor = PREFETCH_EXECUTOR) -> List[str]:
+        """提交预测出的工具，返回实际开始预取的工具名。"""
+        if CREDENTIAL_PATTERN.search(self.user_input):
+            return []
+        for name in predict_tools(self.user_input, self.rules):
+            func = self.tool_functions.get(name)
+            if func is not None:
+                self._futures[name] = executor.submit(bind(self._run, name, func))
+        return list(self._futures)
+
+    def _run(self, name: str, func: Callable) -> Any:
+        # 在预取线程里才导入 (依赖 numpy)，不拖慢启动
+        from Tool.embedding_index import transient_queries
+
+        with tracer.span(f"prefetch.{name}"), transient_queries():
+            return func(**{QUERY_ARGUMENT: self.user_input})
+
+    def _matches(self, name: str, function_args: Dict[str, Any]) -> bool:
+        query = function_args.get(QUERY_ARGUMENT)
+        if not isinstance(query, str) or normalize_query(query) != normalize_query(self.user_input):
+            return False
+        # 其余参数按函数默认值补全后必须一致 (例如模型显式传了 top_k=3 也算一致)
+        defaults = {
+            key: parameter.default
+            for key, parameter in inspect.signature(self.tool_functions[name]).parameters.items()
+            if parameter.default is not inspect.Parameter.empty
+        }
+        requested = {**defaults, **function_args}
+        requested.pop(QUERY_ARGUMENT)
+        defaults.pop(QUERY_ARGUMENT, None)
+        return requested == defaults
+
+    def claim(self, tool_call) -> Optional[concurrent.futures.Future]:
+        """若该工具调用可以复用预取结果，取出对应的 Future (每个预取只能被认领一次)。"""
+        name = tool_call.function.name
+        if name not in self._futures:
+            return None
+        try:
+            function_args = json.loads(tool_call.function.arguments or "{}")
+        except ValueError:
+            return None
+        if not isinstance(function_args, dict) or not self._matches(name, function_args):
+            return None
+        return self._futures.pop(name)
+
+    def discard(self) -> List[str]:
+        """丢弃未被认领的预取 (尚未开始的直接取消)，返回被丢弃的工具名。"""
+        wasted = list(self._futures)
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        return wasted
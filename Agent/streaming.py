@@ -0,0 +1,80 @@
+from typing import Callable, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion
+
+
+class StreamAssembler:
+    """
+    把 stream=True 返回的 ChatCompletionChunk 逐块拼装回一个完整的 ChatCompletion。
+
+    - 文本增量 (delta.content) 回调 on_delta，便于前端边生成边展示。holdback=True 时由第一个
+      有内容的增量判断本轮类型：先出现工具调用的轮次不回调任何文本；先出现文本 (此前没有工具调用)
+      的轮次视为回答，之后的文本增量到达即回调，不必等到流结束；
+    - 工具调用增量按 index 归并：id / 函数名只出现一次，arguments 分多块到达需要拼接；
+    - 最后一个 chunk 携带 usage (需要 stream_options={"include_usage": True})。
+    """
+
+    def __init__(self, on_delta: Optional[Callable[[str], None]] = None, holdback: bool = False):
+        self.on_delta = on_delta
+        self.holdback = holdback
+        self.content_parts: List[str] = []
+        self._mode: Optional[str] = None   # holdback 模式下本轮的类型: None 未确定 / "text" / "tool_calls"
+        self.tool_calls: Dict[int, Dict] = {}
+        self.role = "assistant"
+        self.finish_reason: Optional[str] = None
+        self.usage = None
+        self.meta: Dict = {}
+
+    def add_chunk(self, chunk) -> None:
+        if not self.meta:
+            self.meta = {"id": chunk.id, "created": chunk.created, "model": chunk.model}
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+
+        for choice in chunk.choices or []:
+            delta = choice.delta
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+            if delta is None:
+                continue
+            if delta.role:
+                self.role = delta.role
+            if delta.tool_calls and self._mode is None:
+                self._mode = "tool_calls"
+            if delta.content:
+                self.content_parts.append(delta.content)
+                if self._mode is None:
+                    self._mode = "text"
+                if self.on_delta and (not self.holdback or self._mode == "text"):
+                    self.on_delta(delta.content)
+            for tool_delta in delta.tool_calls or []:
+                entry = self.tool_calls.setdefault(
+                    tool_delta.index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
+                )
+                if tool_delta.id:
+                    entry["id"] = tool_delta.id
+                if tool_delta.function:
+                    if tool_delta.function.name:
+                        entry["function"]["name"] += tool_delta.function.name
+                    if tool_delta.function.arguments:
+                        entry["function"]["arguments"] += tool_delta.function.arguments
+
+    def build(self) -> ChatCompletion:
+        """生成与非流式调用结构一致的 ChatCompletion，后续逻辑无需区分两种模式。"""
+        tool_calls = [self.tool_calls[index] for index in sorted(self.tool_calls)]
+        return ChatCompletion.model_validate({
+            "id": self.meta.get("id", ""),
+            "created": self.meta.get("created", 0),
+            "model": self.meta.get("model", ""),
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "finish_reason": self.finish_reason or ("tool_calls" if tool_calls else "stop"),
+                "message": {
+                    "role": self.role,
+                    "content": "".join(self.content_parts) or None,
+                    "tool_calls": tool_calls or None,
+                },
+            }],
+            "usage": self.usage.model_dump() if self.usage is not None else None,
+        })
@@ -0,0 +1,67 @@
+import concurrent.futures
+import inspect
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def canonical_arguments(func: Optional[Callable], arguments: Dict[str, Any]) -> str:
+    """
+    参数的规范形式：按函数签名补全默认值后，以排序键的紧凑 JSON 表示。
+    {"query_text": "运动会"} 与 {"top_k": 3, "query_text": "运动会"} 得到相同结果。
+    """
+    merged = dict(arguments)
+    if func is not None:
+        for key, parameter in inspect.signature(func).parameters.items():
+            if parameter.default is not inspect.Parameter.empty and key not in merged:
+                merged[key] = parameter.default
+    return json.dumps(merged, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolMemo:
+    """
+    单次运行内的工具调用记忆表，键为 (工具名, 规范化参数)，值为结果内容的 Future：
+
+      - 第一个发起调用的线程负责执行并写入结果 (owner)；
+      - 之后的相同调用直接等待同一个 Future：同一批内的重复调用合并到正在执行的那次，
+        后续轮次的重复调用直接复用已有结果；
+      - 执行失败的调用会从表中移除，之后的相同调用重新执行。
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[concurrent.futures.Future, int]] = {}
+        self._lock = threading.Lock()
+        self.round = 0
+        self.hits = 0        # 跨轮复用次数
+        self.coalesced = 0   # 同批合并次数
+
+    def begin_round(self) -> None:
+        with self._lock:
+            self.round += 1
+
+    def claim(self, key: Tuple[str, str]) -> Tuple[concurrent.futures.Future, bool, str]:
+        """返回 (Future, 是否由调用方执行, 来源)，来源为 "new" / "batch" / "memo"。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                future = concurrent.futures.Future()
+                self._entries[key] = (future, self.round)
+                return future, True, "new"
+            future, created_round = entry
+            if created_round == self.round:
+                self.coalesced += 1
+                return future, False, "batch"
+            self.hits += 1
+            return future, False, "memo"
+
+    def resolve(self, key: Tuple[str, str], content: Optional[str] = None,
+                error: Optional[BaseException] = None) -> None:
+        """owner 执行结束后写入结果；失败时写入异常并移除该键。"""
+        with self._lock:
+            future, _ = self._entries[key]
+            if error is not None:
+                del self._entries[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(content)
@@ -0,0 +1,36 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from Config.config import TOOL_LOG_PREVIEW_CHARS, TOOL_RESULT_FIELDS
+
+
+def _select_fields(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """按白名单保留字段 (保持白名单顺序)，同时去掉空值。"""
+    if fields is None:
+        return {key: value for key, value in record.items() if value not in (None, "", [], {})}
+    return {key: record[key] for key in fields if record.get(key) not in (None, "", [], {})}
+
+
+def compact_result(function_name: str, data: Any) -> Any:
+    """对工具返回值做字段裁剪：列表中的每条记录 / 顶层字典按该工具的白名单保留字段。"""
+    fields = TOOL_RESULT_FIELDS.get(function_name)
+    if isinstance(data, list):
+        return [_select_fields(item, fields) if isinstance(item, dict) else item for item in data]
+    if isinstance(data, dict):
+        return _select_fields(data, fields)
+    return data
+
+
+def encode_tool_result(function_name: str, data: Any) -> str:
+    """
+    把工具返回值编码为发送给模型的紧凑 JSON：不转义中文、去掉多余空白，
+    不再包一层 {"success": True, "data": ...}。
+    """
+    return json.dumps(compact_result(function_name, data), ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def preview(text: str, limit: int = TOOL_LOG_PREVIEW_CHARS) -> str:
+    """日志用的截断预览。"""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}……(共 {len(text)} 字符)"
@@ -0,0 +1,486 @@
+"""
+离线回放基准测试：不访问 OpenAI 和学校网站，按脚本回放对话，衡量智能体循环本身的开销。
+
+- 模型：用本地替身代替 client.chat.completions.create，按场景脚本逐轮返回工具调用或最终回答；
+- Embedding：用本地替身代替 embeddings.create，返回确定性的伪向量 (查询向量缓存只在内存中)；
+- 工具：TOOL_FUNCTIONS 中的工具全部替换为返回录制结果的替身；
+- 延迟：模型 / 工具 / Embedding 的耗时可固定注入，也可按日志中记录的真实耗时 (可缩放) 回放。
+
+用法:
+  python -m Benchmark.replay                                   # 回放 Benchmark/scenarios.json
+  python -m Benchmark.replay --logs Logs/log/*.log             # 回放运行日志中的真实对话
+  python -m Benchmark.replay --llm-latency 0.5 --tool-latency 0.2 --repeat 5
+  python -m Benchmark.replay --logs Logs/log/*.log --latency recorded --speed 0.1
+  python -m Benchmark.replay --json after.json --compare before.json
+"""
+import argparse
+import ast
+import glob
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# 离线运行：没有配置密钥时给 OpenAI 客户端一个占位值 (所有请求都会被替身拦截)
+os.environ.setdefault("OPENAI_API_KEY", "offline-replay")
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+import Run
+import Tool.embedding_cache as embedding_cache
+import Tool.embedding_index as embedding_index
+from Logs.logs import stop_logging
+from Logs.tracing import tracer
+
+SCENARIO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.json")
+FAKE_EMBEDDING_DIM = 256
+STREAM_PIECES = 10   # 流式回放时把回答切成多少块
+
+
+# --- 1. 场景加载 ---
+
+def load_scenarios(path: str = SCENARIO_FILE) -> List[Dict]:
+    """
+    读取场景文件。每个场景: {"name", "query", "rounds": [...]}，每一轮为
+    {"usage": {...}, "latency": 秒(可选), "tool_calls": [{"name", "arguments", "result", "latency"}]}
+    或 {"usage": {...}, "latency": 秒(可选), "content": "最终回答"}。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+LOG_LINE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - \w+ - \S+ - (.*)$")
+USAGE_PATTERN = re.compile(r"输入(\d+) \+ 输出(\d+) = (\d+) tokens")
+
+
+def _parse_literal(text: str) -> Any:
+    """日志中的参数 / 结果：新版本为 JSON，旧版本为 Python 字面量；被截断的预览原样返回。"""
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            return parse(text)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            continue
+    return text
+
+
+def parse_log_file(path: str) -> List[Dict]:
+    """
+    从 Run.py 的运行日志中还原对话场景：用户问题、每轮的工具调用 (参数 / 结果 / 耗时)、
+    每轮模型调用的 token 与耗时以及最终回答。无法还原完整的运行 (如中途报错) 会被跳过。
+    """
+    records = []   # (时间戳, 消息)，没有时间戳前缀的行是上一条消息的续行
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("{"):   # LOG_FORMAT = "json" 时的 JSON Lines 日志
+                try:
+                    entry = json.loads(line)
+                    records.append([datetime.fromisoformat(entry["time"]).timestamp(), entry["message"]])
+                    continue
+                except (ValueError, KeyError):
+                    pass
+            match = LOG_LINE_PATTERN.match(line.rstrip("\n"))
+            if match:
+                ts = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S,%f").timestamp()
+                records.append([ts, match.group(2)])
+            elif records:
+                records[-1][1] += "\n" + line.rstrip("\n")
+
+    scenarios: List[Dict] = []
+    scenario: Optional[Dict] = None
+    current_round: Optional[Dict] = None
+
+    def start_round(ts: float) -> Dict:
+        round_ = {"tool_calls": [], "_started": ts}
+        scenario["rounds"].append(round_)
+        return round_
+
+    for ts, message in records:
+        if message.startswith("• 用户查询:"):
+            scenario = {
+                "name": f"{os.path.basename(path)}#{len(scenarios) + 1}",
+                "query": message.split(":", 1)[1].strip(),
+                "rounds": [],
+            }
+            scenarios.append(scenario)
+            current_round = None
+            continue
+        if scenario is None:
+            continue
+
+        if message.startswith("• 第 ") and "轮工具调用" in message:
+            current_round = start_round(ts)
+        elif message.startswith("• 达到最大迭代次数"):
+            current_round = start_round(ts)
+        elif (message.startswith("• API调用") or message.startswith("• 最终回答API调用")) and current_round:
+            usage = USAGE_PATTERN.search(message)
+            if usage:
+                current_round["usage"] = {"prompt_tokens": int(usage.group(1)), "completion_tokens": int(usage.group(2))}
+            current_round["latency"] = ts - current_round["_started"]
+        elif message.startswith("• 调用工具:") and current_round:
+            current_round["tool_calls"].append({"name": message.split(":", 1)[1].strip(), "_called": ts})
+        elif message.startswith("• 参数:") and current_round and current_round["tool_calls"]:
+            pending = [call for call in current_round["tool_calls"] if "arguments" not in call]
+            if pending:
+                arguments = _parse_literal(message.split(":", 1)[1].strip())
+                pending[0]["arguments"] = arguments if isinstance(arguments, dict) else {}
+        elif message.startswith("• 结果") and current_round:
+            pending = [call for call in current_round["tool_calls"] if "result" not in call]
+            if pending:
+                payload = _parse_literal(message.split(":", 1)[1].strip())
+                pending[0]["result"] = payload.get("data") if isinstance(payload, dict) and "data" in payload else payload
+                pending[0]["latency"] = ts - pending[0]["_called"]
+        elif message.startswith("• 最终结果:"):
+            if scenario["rounds"]:
+                scenario["rounds"][-1]["content"] = message.split(":", 1)[1].strip()
+
+    complete = []
+    for scenario in scenarios:
+        rounds = scenario["rounds"]
+        if not rounds or "content" not in rounds[-1]:
+            continue
+        for round_ in rounds:
+            round_.pop("_started", None)
+            for call in round_["tool_calls"]:
+                call.pop("_called", None)
+                call.setdefault("arguments", {})
+            if not round_["tool_calls"]:
+                del round_["tool_calls"]
+        complete.append(scenario)
+    return complete
+
+
+# --- 2. 本地替身 ---
+
+class LatencyModel:
+    """决定注入多少延迟：fixed 用命令行给定的值，recorded 用场景中记录的值 (缺失时退回固定值)。"""
+
+    def __init__(self, mode: str, llm: float, tool: float, embedding: float,
+                 per_tool: Dict[str, float], speed: float):
+        self.mode = mode
+        self.llm = llm
+        self.tool = tool
+        self.embedding = embedding
+        self.per_tool = per_tool
+        self.speed = speed
+
+    def for_llm(self, round_: Dict) -> float:
+        if self.mode == "recorded" and "latency" in round_:
+            return round_["latency"] * self.speed
+        return self.llm
+
+    def for_tool(self, name: str, call: Optional[Dict]) -> float:
+        if self.mode == "recorded" and call and "latency" in call:
+            return call["latency"] * self.speed
+        return self.per_tool.get(name, self.tool)
+
+
+class ReplayRecorder:
+    """记录本次运行中的模型调用次数、工具调用次数和每轮扇出。"""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.fan_out: List[int] = []
+        self.first_delta: Optional[float] = None
+
+
+class ReplayChatCompletions:
+    """client.chat.completions 的替身：根据消息中已有的 assistant 消息数决定回放哪一轮。"""
+
+    def __init__(self, harness: "ReplayHarness"):
+        self.harness = harness
+
+    def create(self, messages: List[Dict[str, Any]], stream: bool = False, **kwargs):
+        harness = self.harness
+        rounds = harness.scenario["rounds"]
+        index = sum(1 for message in messages if message.get("role") == "assistant")
+        round_ = rounds[index] if index < len(rounds) else {"content": rounds[-1].get("content") or ""}
+        if index >= len(rounds) - 1 or "tool_calls" not in round_:
+            # 最后一轮 (或被要求最终回答) 只返回文本
+            round_ = {**round_, "content": round_.get("content") or rounds[-1].get("content") or ""}
+            round_.pop("tool_calls", None)
+
+        harness.recorder.llm_calls += 1
+        latency = harness.latency.for_llm(round_)
+        tool_calls = [{
+            "id": f"call_{index}_{k}",
+            "type": "function",
+            "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}), ensure_ascii=False)},
+        } for k, call in enumerate(round_.get("tool_calls", []))]
+        if tool_calls:
+            harness.recorder.fan_out.append(len(tool_calls))
+        usage = round_.get("usage", {"prompt_tokens": 0, "completion_tokens": 0})
+        usage = {**usage, "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"]}
+
+        if not stream:
+            time.sleep(latency)
+            return ChatCompletion.model_validate({
+                "id": f"replay-{index}", "created": int(time.time()), "model": "replay", "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                    "message": {"role": "assistant", "content": round_.get("content"), "tool_calls": tool_calls or None},
+                }],
+                "usage": usage,
+            })
+        return self._stream(index, round_.get("content") or "", tool_calls, usage, latency)
+
+    @staticmethod
+    def _stream(index: int, content: str, tool_calls: List[Dict], usage: Dict, latency: float):
+        """把延迟均摊到各块之间，首块在 latency / (STREAM_PIECES + 1) 之后到达。"""
+        def chunk(delta: Optional[Dict], finish: Optional[str] = None, chunk_usage: Optional[Dict] = None):
+            return ChatCompletionChunk.model_validate({
+                "id": f"replay-{index}", "created": int(time.time()), "model": "replay",
+                "object": "chat.completion.chunk",
+                "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish}],
+                "usage": chunk_usage,
+            })
+
+        step = latency / (STREAM_PIECES + 1)
+        if tool_calls:
+            time.sleep(latency)
+            yield chunk({"role": "assistant", "tool_calls": [dict(call, index=k) for k, call in enumerate(tool_calls)]},
+                        "tool_calls")
+        else:
+            size = max(1, -(-len(content) // STREAM_PIECES))
+            for start in range(0, len(content), size):
+                time.sleep(step)
+                yield chunk({"role": "assistant", "content": content[start:start + size]})
+            yield chunk({}, "stop")
+        yield chunk(None, chunk_usage=usage)
+
+
+class ReplayEmbeddings:
+    """embeddings.create 的替身：按文本哈希生成确定性的伪向量。"""
+
+    def __init__(self, harness: "ReplayHarness"):
+        self.harness = harness
+
+    def create(self, input: List[str], model: str, **kwargs):
+        time.sleep(self.harness.latency.embedding)
+        data = []
+        for text in input:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(FAKE_EMBEDDING_DIM).astype(np.float32)
+            data.append(type("Embedding", (), {"embedding": vector.tolist()})())
+        return type("EmbeddingResponse", (), {"data": data})()
+
+
+class ReplayHarness:
+    """安装 / 卸载所有替身，并逐个场景执行 run_master_agent。"""
+
+    def __init__(self, latency: LatencyModel, stream: bool = False, max_iterations: int = 8):
+        self.latency = latency
+        self.stream = stream
+        self.max_iterations = max_iterations
+        self.scenario: Dict = {}
+        self.recorder = ReplayRecorder()
+        self._lock = threading.Lock()
+
+    def _tool_stub(self, name: str, original=None):
+        def stub(**arguments):
+            with self._lock:
+                self.recorder.tool_calls += 1
+                call = self._match_call(name, arguments)
+            time.sleep(self.latency.for_tool(name, call))
+            return call.get("result") if call else {"replay": True, "tool": name, "arguments": arguments}
+        # 保留原函数签名，预取等按参数默认值做判断的逻辑与真实工具一致
+        return functools.wraps(original)(stub) if original else stub
+
+    def _match_call(self, name: str, arguments: Dict) -> Optional[Dict]:
+        """在场景中找到对应的工具调用：优先参数完全一致的，其次同名的第一个。"""
+        calls = [call for round_ in self.scenario["rounds"] for call in round_.get("tool_calls", [])
+                 if call["name"] == name]
+        for call in calls:
+            if call.get("arguments") == arguments:
+                return call
+        return calls[0] if calls else None
+
+    def install(self) -> None:
+        fake = type("ReplayClient", (), {})()
+        fake.chat = type("Chat", (), {})()
+        fake.chat.completions = ReplayChatCompletions(self)
+        fake.embeddings = ReplayEmbeddings(self)
+        Run.client = fake
+        embedding_index._client = fake
+        # 伪向量只放内存，绝不写入磁盘上的查询向量缓存
+        embedding_cache._cache = embedding_cache.EmbeddingCache(db_path=None)
+        Run.TOOL_FUNCTIONS = {name: self._tool_stub(name, func) for name, func in Run.TOOL_FUNCTIONS.items()}
+        tracer.jsonl_path = None
+        tracer.otlp_endpoint = None
+
+        # 日志照常格式化 (属于被测开销)，但写到空设备，不产生日志文件
+        for handler in stop_logging(Run.logger):
+            path = getattr(handler, "baseFilename", None)
+            if not path:
+                continue
+            if os.path.exists(path) and os.path.getsize(path) == 0:
+                os.remove(path)
+            if os.path.exists(f"{path}.lock"):
+                os.remove(f"{path}.lock")
+            try:
+                os.removedirs(os.path.dirname(path))   # 只删除空目录
+            except OSError:
+                pass
+        null_handler = logging.FileHandler(os.devnull, encoding="utf-8")
+        null_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'))
+        Run.logger.addHandler(null_handler)
+
+    def run_once(self, scenario: Dict, trace_memory: bool = False) -> Dict[str, float]:
+        self.scenario = scenario
+        # 旧日志中可能出现已经下线的工具，同样用替身回放
+        for round_ in scenario["rounds"]:
+            for call in round_.get("tool_calls", []):
+                if call["name"] not in Run.TOOL_FUNCTIONS:
+                    Run.TOOL_FUNCTIONS[call["name"]] = self._tool_stub(call["name"])
+        self.recorder = ReplayRecorder()
+        recorder = self.recorder
+
+        def on_delta(text: str) -> None:
+            if recorder.first_delta is None:
+                recorder.first_delta = time.perf_counter()
+
+        if trace_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        Run.run_master_agent(scenario["query"], max_iterations=self.max_iterations,
+                             on_delta=on_delta if self.stream else None)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        peak = 0
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        return {
+            "wall": wall,
+            "cpu": cpu,
+            "peak_bytes": peak,
+            "ttft": recorder.first_delta - wall_start if recorder.first_delta else None,
+            "llm_calls": recorder.llm_calls,
+            "tool_calls": recorder.tool_calls,
+            "max_fan_out": max(recorder.fan_out, default=0),
+        }
+
+    def benchmark(self, scenario: Dict, repeat: int, warmup: int = 1) -> Dict[str, Any]:
+        for _ in range(warmup):
+            self.run_once(scenario)
+        runs = [self.run_once(scenario) for _ in range(repeat)]
+        # 内存单独跑一次：tracemalloc 本身会明显拖慢计时
+        memory_run = self.run_once(scenario, trace_memory=True)
+
+        walls = [run["wall"] * 1000 for run in runs]
+        ttfts = [run["ttft"] * 1000 for run in runs if run["ttft"] is not None]
+        return {
+            "name": scenario["name"],
+            "runs": repeat,
+            "iterations": runs[-1]["llm_calls"],
+            "tool_calls": runs[-1]["tool_calls"],
+            "max_fan_out": runs[-1]["max_fan_out"],
+            "wall_p50_ms": statistics.median(walls),
+            "wall_p95_ms": float(np.percentile(walls, 95)),
+            "cpu_ms": statistics.mean(run["cpu"] * 1000 for run in runs),
+            "peak_kb": memory_run["peak_bytes"] / 1024,
+            "ttft_p50_ms": statistics.median(ttfts) if ttfts else None,
+        }
+
+
+# --- 3. 报告 ---
+
+def print_report(results: List[Dict], baseline: Optional[Dict[str, Dict]] = None) -> None:
+    header = f"{'场景':<28}{'轮数':>6}{'工具':>6}{'扇出':>6}{'墙钟p50':>12}{'墙钟p95':>12}{'CPU':>10}{'峰值内存':>12}{'首字p50':>10}"
+    print(header)
+    print("-" * 110)
+    for row in results:
+        ttft = f"{row['ttft_p50_ms']:.1f}" if row["ttft_p50_ms"] is not None else "-"
+        print(f"{row['name'][:26]:<28}{row['iterations']:>6}{row['tool_calls']:>6}{row['max_fan_out']:>6}"
+              f"{row['wall_p50_ms']:>10.1f}ms{row['wall_p95_ms']:>10.1f}ms{row['cpu_ms']:>8.1f}ms"
+              f"{row['peak_kb']:>10.0f}KB{ttft:>10}")
+        base = (baseline or {}).get(row["name"])
+        if base:
+            def delta(key: str) -> str:
+                return f"{(row[key] - base[key]) / base[key] * 100:+.1f}%" if base[key] else "-"
+            print(f"{'  对比基线':<28}{'':>18}{delta('wall_p50_ms'):>12}{delta('wall_p95_ms'):>12}"
+                  f"{delta('cpu_ms'):>10}{delta('peak_kb'):>12}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="离线回放基准测试 (不访问 OpenAI 与学校网站)")
+    parser.add_argument("--scenarios", default=SCENARIO_FILE, help="场景文件 (JSON)")
+    parser.add_argument("--logs", nargs="*", default=[], help="从运行日志还原场景，支持通配符")
+    parser.add_argument("--only", default=None, help="只运行名称包含该字符串的场景")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景计时的重复次数")
+    parser.add_argument("--warmup", type=int, default=1, help="每个场景的预热次数")
+    parser.add_argument("--max-iterations", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="以流式模式运行并统计首字延迟")
+    parser.add_argument("--latency", choices=["fixed", "recorded"], default="fixed",
+                        help="fixed: 使用下面给定的延迟；recorded: 使用场景中记录的真实耗时")
+    parser.add_argument("--speed", type=float, default=1.0, help="recorded 模式下的耗时缩放系数")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="每次模型调用注入的延迟 (秒)")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="每次工具调用注入的延迟 (秒)")
+    parser.add_argument("--tool-latency-for", action="append", default=[], metavar="工具名=秒",
+                        help="单独指定某个工具的延迟，可重复")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="每次 Embedding 调用注入的延迟 (秒)")
+    parser.add_argument("--json", default=None, help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", default=None, help="与之前保存的 JSON 结果对比")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict]:
+    args = parse_args(argv)
+
+    scenarios = load_scenarios(args.scenarios) if args.scenarios else []
+    for pattern in args.logs:
+        for path in sorted(glob.glob(pattern)):
+            scenarios.extend(parse_log_file(path))
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if args.only in scenario["name"]]
+    if not scenarios:
+        print("❌ 没有可回放的场景。")
+        return []
+
+    per_tool = {}
+    for item in args.tool_latency_for:
+        name, _, seconds = item.partition("=")
+        per_tool[name.strip()] = float(seconds)
+
+    harness = ReplayHarness(
+        LatencyModel(args.latency, args.llm_latency, args.tool_latency, args.embedding_latency, per_tool, args.speed),
+        stream=args.stream,
+        max_iterations=args.max_iterations,
+    )
+    harness.install()
+
+    results = []
+    for scenario in scenarios:
+        print(f"• 回放场景: {scenario['name']}", file=sys.stderr)
+        results.append(harness.benchmark(scenario, args.repeat, args.warmup))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = {row["name"]: row for row in json.load(f)["results"]}
+    print_report(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入: {args.json}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
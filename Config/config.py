@@ -2,9 +2,167 @@
 #------并行的最大线程-----
 MAX_WORKERS = 10
 
+# 单个工具调用的最长等待时间 (秒)，超时后返回失败信息，不再阻塞本轮其他工具
+TOOL_DEFAULT_TIMEOUT = 30
+TOOL_TIMEOUTS = {
+    "search_jiaowu_score": 60,    # 需要无头浏览器登录，最慢
+    "google_search": 15,
+    "search_library_data": 10,
+    "search_jiaodian_news": 20,
+    "search_school_card_text": 20,
+}
+
 
 #---模型的参数----
 model_name = 'gpt-4.1'  # 模型名称
 max_tokens = 8000      # 最大token
 temperature = 0.1    #模型温度
+PROMPT_CACHE_KEY = "sztu-master-agent"   # 前缀缓存路由键，相同前缀的请求尽量落到同一缓存；不支持该参数的服务设为 None
+PROMPT_CACHE_DISCOUNT = 0.75            # 命中前缀缓存的输入 token 的折扣 (gpt-4.1 缓存输入按 1/4 计费)
+
+
+#---向量检索的参数----
+EMBEDDING_MODEL = "text-embedding-3-small"  # 向量模型名称
+EMBEDDING_BATCH_SIZE = 256                  # 单次 Embedding 请求的最大文本条数
+EMBEDDING_TIMEOUT = 30                      # 单次 Embedding 请求的超时 (秒)，整批构建索引时也够用
+INDEX_DIR_NAME = "index"                    # 语料目录下存放向量索引的子目录
+INDEX_VERSION_GRACE = 600                   # 旧版本向量矩阵文件至少保留的时长 (秒)，之后不再被引用时才清理
+
+
+#---本地语料库目录----
+JIAODIAN_DIR = "./data/text_技大焦点"         # 技大焦点新闻
+SCHOOL_CARD_DIR = "./data/text_校园一卡通"    # 校园一卡通办事指南
+DOC_STORE_FILE = "documents.db"               # 语料目录下的文档库文件 (SQLite)，保存全部文章的标题、日期、网址和正文
+
+
+#---语料定时更新 (Server.py)----
+CORPUS_REFRESH_INTERVAL = 6 * 3600   # 后台增量运行爬虫并热替换索引的间隔 (秒)，设为 0 则不启用
+# 定时更新的语料目录及其爬虫入口 ("模块:函数")，按顺序依次运行
+CORPUS_REFRESH_JOBS = {
+    JIAODIAN_DIR: "Tool.scripty_jiaodian:run_sztu_news_spider",
+    SCHOOL_CARD_DIR: "Tool.scripty_school_card:run_sztu_news_spider",
+}
+
+
+#---段落级检索的参数----
+CHUNK_MAX_CHARS = 400          # 正文切分时单个片段的最大字符数
+PASSAGE_TOKEN_BUDGET = 1500    # 单次检索返回的段落总 token 预算
+RETRIEVAL_CANDIDATES = 40      # 每一路检索参与筛选 / 融合的候选数量
+
+
+#---检索模式----
+RETRIEVAL_MODE = "hybrid"   # "embedding" 向量检索 / "bm25" 本地字面检索 / "hybrid" 两者 RRF 融合
+BM25_K1 = 1.5               # BM25 词频饱和参数
+BM25_B = 0.75               # BM25 文档长度归一化参数
+RRF_K = 60                  # 倒数排名融合 (RRF) 的平滑常数
+
+
+#---查询向量缓存----
+EMBEDDING_CACHE_SIZE = 1024                                # 内存中最多缓存的查询向量条数 (LRU 淘汰)
+EMBEDDING_CACHE_PATH = "./data/cache/embedding_cache.db"   # SQLite 持久化路径，设为 None 则只用内存
+EMBEDDING_CACHE_DISK_MAX = 20000                           # 磁盘上最多保留的条数
+
+
+#---语义答案缓存----
+ANSWER_CACHE_ENABLED = False        # 是否在智能体循环前启用语义答案缓存
+ANSWER_CACHE_THRESHOLD = 0.95       # 问题向量相似度达到该值才复用历史回答
+ANSWER_CACHE_TTL = 3600             # 缓存回答的有效期 (秒)
+ANSWER_CACHE_SIZE = 256             # 最多缓存的回答条数
+PERSONAL_DATA_TOOLS = ["search_jiaowu_score"]   # 涉及个人数据的工具，其结果永不进入答案缓存
+
+
+#---异步多会话服务 (Server.py)----
+SERVER_HOST = "127.0.0.1"       # 监听地址
+SERVER_PORT = 8080              # 监听端口
+SERVER_MAX_CONCURRENCY = MAX_WORKERS   # 同时处理的会话上限 (不超过工具线程数)，超出的请求在入口排队等待
+SERVER_MAX_BODY_BYTES = 65536   # 单个请求体的最大字节数
+SERVER_READ_TIMEOUT = 10        # 读取请求头和请求体的总时限 (秒)，超时的慢连接直接断开
+SERVER_MAX_ITERATIONS = 10      # 单个请求可指定的 max_iterations 上限 (每轮都是一次付费模型调用)
+
+
+#---流式输出----
+STREAM_OUTPUT = True    # 命令行模式下是否边生成边打印回答 (stream=True)
+
+
+#---教务系统会话复用----
+JIAOWU_BROWSER_POOL_SIZE = 2                        # 常驻的无头浏览器实例上限
+JIAOWU_SESSION_DIR = "./data/cache/jiaowu_sessions"  # 加密 Cookie 缓存目录 (按用户分文件)
+JIAOWU_SESSION_TTL = 1800                           # Cookie 缓存的最长复用时间 (秒)，过期后重新登录
+JIAOWU_PAGE_LOAD_TIMEOUT = 20                       # 浏览器打开页面 / 执行脚本的超时 (秒)，避免卡住的页面一直占着工具线程
+JIAOWU_BROWSER_WAIT = 30                            # 浏览器池已满时等待空闲实例的最长时间 (秒)，超时则本次调用失败
+# 归还浏览器前清空这些站点的 localStorage / IndexedDB 等存储，避免登录状态留给下一个用户
+JIAOWU_STORAGE_ORIGINS = ["https://auth.sztu.edu.cn", "https://jwxt.sztu.edu.cn"]
+
+
+#---HTTP 连接----
+HTTP_TIMEOUT = 10          # 所有工具网络请求的默认超时 (秒)
+HTTP_RETRIES = 2           # 连接失败 / 429 / 5xx 时的重试次数 (POST 只重试连接失败)
+HTTP_BACKOFF = 0.5         # 重试退避基数 (秒)，第 n 次重试前等待 HTTP_BACKOFF * 2^(n-1)
+HTTP_POOL_MAXSIZE = 10     # 每个主机保持的长连接上限
+
+
+#---图书馆接口----
+LIBRARY_ENDPOINT_TIMEOUT = 5   # 一次查询等待各接口返回的总时限 (秒)，超时的接口结果记为空
+LIBRARY_MAX_WORKERS = 6        # 并发请求图书馆接口的线程数
+LIBRARY_MAX_KEYWORDS = 5       # 一次调用最多查询的关键词个数
+LIBRARY_CACHE_TTL = 3600       # 关键词查询结果的缓存有效期 (秒)
+LIBRARY_CACHE_SIZE = 256       # 最多缓存的关键词条数 (LRU 淘汰)
+
+
+#---联网搜索缓存----
+GOOGLE_CACHE_PATH = "./data/cache/google_search.db"   # 搜索结果缓存 (SQLite)，设为 None 则不缓存
+GOOGLE_CACHE_TTL = 86400               # 缓存结果在该时间内 (秒) 视为新鲜，直接返回
+GOOGLE_CACHE_STALE_TTL = 7 * 86400     # 过期后仍可先返回旧结果并在后台刷新的时长 (秒)，超过则同步重新查询
+GOOGLE_DAILY_QUOTA = 100               # Custom Search API 每日调用上限，用完后只返回缓存结果
+
+
+#---新闻爬虫----
+CRAWL_MAX_WORKERS = 8             # 详情页并发抓取的线程数
+CRAWL_PER_HOST_CONCURRENCY = 4    # 同一主机同时进行的请求上限
+CRAWL_DELAY = 0.2                 # 同一主机相邻两次请求的最小间隔 (秒)
+CRAWL_TIMEOUT = 10                # 单次请求超时 (秒)
+JIAODIAN_MAX_LIST_PAGES = 200     # 列表页数量上限 (遇到空列表页会提前结束)
+
+
+#---日志----
+LOG_ASYNC = True                 # 日志经队列交给后台线程写盘，请求路径上不做磁盘 IO
+LOG_ROTATION = "size"            # 日志轮转方式: "size" 按大小 / "time" 按天 (午夜)
+LOG_MAX_BYTES = 10 * 1024 * 1024 # 按大小轮转时单个日志文件的上限 (字节)
+LOG_BACKUP_COUNT = 7             # 保留的历史日志文件个数
+LOG_FIELD_MAX_CHARS = 2000       # 单个日志参数 (及消息本身) 的最大字符数，超出部分截断
+LOG_FORMAT = "text"              # "text" 为原有文本格式，"json" 为每行一个 JSON 对象 (JSON Lines)
+
+
+#---链路追踪----
+TRACE_ENABLED = True                          # 是否记录各环节耗时 (span)
+TRACE_JSONL_PATH = "./Logs/trace/spans.jsonl"  # span 以 JSON Lines 追加写入该文件，设为 None 则不落盘
+TRACE_MAX_BYTES = 10 * 1024 * 1024            # span 文件超过该大小 (字节) 时轮转为 spans.jsonl.1 ...
+TRACE_BACKUP_COUNT = 7                        # 保留的历史 span 文件个数
+TRACE_OTLP_ENDPOINT = None                    # 本地 OTLP/HTTP 收集器，例如 "http://127.0.0.1:4318/v1/traces"
+TRACE_STATS_WINDOW = 5000                     # 每个 span 名称保留最近多少条耗时用于计算分位数
+
+
+#---上下文压缩----
+CONTEXT_TOKEN_BUDGET = 12000            # 每次调用模型时消息列表的 token 上限 (估算值)，超出后压缩旧的工具结果
+CONTEXT_KEEP_RECENT_ROUNDS = 1          # 最近几轮的工具结果优先保持原样
+CONTEXT_TOOL_RESULT_MAX_TOKENS = 4000   # 单条工具结果的 token 上限，超出部分在加入时截断
+CONTEXT_EXCERPT_CHARS = 80              # 压缩后每条结果保留的正文摘录长度 (字符)
+
+
+#---工具结果编码----
+# 发送给模型前每个工具结果保留的字段 (作用于结果中的每条记录)，未列出的工具保留全部字段
+TOOL_RESULT_FIELDS = {
+    "search_jiaodian_news": ["title", "date", "url", "content"],
+    "search_school_card_text": ["title", "url", "content"],
+    "google_search": ["title", "link", "snippet"],
+}
+TOOL_LOG_PREVIEW_CHARS = 300   # 日志中工具结果预览的最大字符数
+
 
+#---工具预取----
+SPECULATIVE_PREFETCH = True     # 第一轮模型调用的同时，按关键词预测并提前执行可能用到的本地检索工具
+# 可预取的工具及其触发关键词；只放无副作用、不消耗外部配额的本地检索工具
+PREFETCH_RULES = {
+    "search_school_card_text": ["一卡通", "校园卡", "饭卡", "充值", "挂失", "补卡", "圈存", "消费"],
+    "search_jiaodian_news": ["新闻", "活动", "举办", "讲座", "比赛", "大赛", "获奖", "运动会", "典礼", "会议"],
+}
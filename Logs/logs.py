@@ -1,13 +1,167 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from Config.config import (
+    LOG_ASYNC,
+    LOG_BACKUP_COUNT,
+    LOG_FIELD_MAX_CHARS,
+    LOG_FORMAT,
+    LOG_MAX_BYTES,
+    LOG_ROTATION,
+)
 
 LOG_DIR_STRUCTURE = ["Logs", "log"]
 LOG_LEVEL = logging.INFO
+LOGGER_NAME = 'FileOnlyLogger'   # setup_logging 配置的 logger，其他模块用 logging.getLogger(LOGGER_NAME) 写入同一日志
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+
+# 后台写盘线程 (QueueListener)，同一进程只保留一个
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# 本进程持有的日志文件锁 (日志路径 -> 打开的锁文件)
+_file_locks: Dict[str, Any] = {}
+
+# 这些类型的参数入队后不会再被修改，可以留给后台线程格式化
+IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+class TruncateFilter(logging.Filter):
+    """
+    在调用方线程中截断过大的日志内容：每个参数及消息本身最多 max_chars 个字符。
+    工具结果、成绩表之类的大对象不会被完整格式化，也不会整段写进日志文件。
+    """
+
+    def __init__(self, max_chars: int = LOG_FIELD_MAX_CHARS):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def _truncate(self, value: Any) -> Any:
+        if isinstance(value, (int, float, bool)) or value is None:
+            return value
+        text = value if isinstance(value, str) else str(value)
+        if len(text) <= self.max_chars:
+            return value
+        return f"{text[:self.max_chars]}……(截断，共 {len(text)} 字符)"
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = self._truncate(record.msg)
+        if isinstance(record.args, tuple):
+            record.args = tuple(self._truncate(arg) for arg in record.args)
+        return True
+
+
+class JsonLineFormatter(logging.Formatter):
+    """JSON Lines 格式：每条日志一行 JSON，便于用脚本检索和统计。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "file": record.filename,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    入队时不格式化日志 (标准 QueueHandler.prepare 会在调用方线程中完整格式化一遍)。
+
+    参数都是不可变值时原样入队，消息拼接与格式化都在后台线程完成；
+    参数含可变对象 (dict、list 等) 时先在调用方线程拼好消息，避免写盘前对象被修改；
+    异常堆栈在调用方线程转成文本，不跨线程持有 traceback。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in args)):
+            record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _lock_log_file(log_path: str) -> bool:
+    """
+    尝试独占日志文件 (<日志>.lock 上的非阻塞文件锁)，成功返回 True。
+    多个进程轮转同一个文件会丢失或覆盖日志，因此同一时间只允许一个进程写入它。
+    """
+    if log_path in _file_locks:
+        return True
+    lock_file = open(f"{log_path}.lock", "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _file_locks[log_path] = lock_file
+    return True
+
+
+def _file_handler(log_path: str) -> logging.Handler:
+    """按配置创建带轮转的文件 Handler (delay=True：没有日志时不创建空文件)。"""
+    if LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_path, when="midnight", backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True
+        )
+    handler.setLevel(LOG_LEVEL)
+    handler.setFormatter(JsonLineFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def stop_logging(logger: Optional[logging.Logger] = None) -> List[logging.Handler]:
+    """
+    停止后台写盘线程 (写完队列中剩余的日志)，并移除 logger 上的 Handler，释放日志文件锁。
+    返回被关闭的文件 Handler 列表。
+    """
+    global _listener
+    closed: List[logging.Handler] = []
+    if _listener is not None:
+        _listener.stop()
+        closed.extend(_listener.handlers)
+        _listener = None
+    if logger is not None:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            if not isinstance(handler, logging.handlers.QueueHandler):
+                closed.append(handler)
+    for handler in closed:
+        handler.close()
+        lock_file = _file_locks.pop(getattr(handler, "baseFilename", ""), None)
+        if lock_file is not None:
+            lock_file.close()   # 释放文件锁，其他进程之后可以接管该日志文件
+    return closed
+
 
 def setup_logging(base_script_path: Optional[str] = None) -> logging.Logger:
+    global _listener
+
     # 1. 确定主执行脚本的路径和名称
     if base_script_path is None:
         try:
@@ -20,9 +174,9 @@ def setup_logging(base_script_path: Optional[str] = None) -> logging.Logger:
     # 获取文件名基准：可以根据需要设置为 'logs' 或 SCRIPT_NAME
     SCRIPT_NAME = os.path.basename(sys.argv[0]).replace(".py", "")
 
-    # 2. 构造动态文件名
-    CURRENT_TIME_STR = datetime.now().strftime("%Y-%m-%d_%H_%M")
-    LOG_FILE_NAME = f"{CURRENT_TIME_STR}_{SCRIPT_NAME}.log"
+    # 2. 每个脚本固定一个日志文件，按大小或时间轮转 (不再每次启动新建一个文件)
+    #    日志文件只能由一个进程写入 (轮转不支持多进程)，同一脚本已有进程在运行时改写 <脚本>.<pid>.log
+    LOG_FILE_NAME = f"{SCRIPT_NAME}.log"
 
     # 3. 完整的日志文件路径
     # 使用 *LOG_DIR_STRUCTURE 将 Logs 和 log 目录添加到路径中
@@ -32,29 +186,37 @@ def setup_logging(base_script_path: Optional[str] = None) -> logging.Logger:
     # 4. 确保日志目录存在
     if not os.path.exists(LOG_DIR_ABS):
         os.makedirs(LOG_DIR_ABS)
+    if not _lock_log_file(LOG_PATH):
+        LOG_PATH = os.path.join(LOG_DIR_ABS, f"{SCRIPT_NAME}.{os.getpid()}.log")
 
     # 5. 创建 Logger 对象
-    logger = logging.getLogger('FileOnlyLogger')
+    logger = logging.getLogger(LOGGER_NAME)
     logger.setLevel(LOG_LEVEL)
 
-    # 6. 检查并清理现有的 handlers，防止日志重复记录
-    if logger.hasHandlers():
-        logger.handlers.clear()
+    # 6. 检查并清理现有的 handlers (及上一次的后台线程)，防止日志重复记录
+    stop_logging(logger)
 
-    # 7. 创建 FileHandler
-    file_handler = logging.FileHandler(LOG_PATH, mode='a', encoding='utf-8')
-    file_handler.setLevel(LOG_LEVEL)
+    # 7. 创建写文件的 Handler
+    file_handler = _file_handler(LOG_PATH)
 
-    # 8. 创建 Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-    )
-    file_handler.setFormatter(formatter)
+    # 8. 异步模式：请求路径上只把日志放进队列，由后台线程写盘
+    if LOG_ASYNC:
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        handler: logging.Handler = DeferredQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = file_handler
 
-    # 9. 添加 Handler
-    logger.addHandler(file_handler)
+    # 9. 截断过大的参数后再交给 Handler
+    handler.addFilter(TruncateFilter())
+    logger.addHandler(handler)
 
     # 10. 实现控制台无输出
     logger.propagate = False
 
-    return logger
\ No newline at end of file
+    return logger
+
+
+# 进程退出前把队列中剩余的日志写完
+atexit.register(stop_logging)
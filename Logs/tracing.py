@@ -0,0 +1,316 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from Config.config import (
+    TRACE_BACKUP_COUNT,
+    TRACE_ENABLED,
+    TRACE_JSONL_PATH,
+    TRACE_MAX_BYTES,
+    TRACE_OTLP_ENDPOINT,
+    TRACE_STATS_WINDOW,
+)
+
+MAX_OPEN_TRACES = 1000   # 根 span 未正常结束 (如运行中抛异常) 的 trace 最多保留多少条
+JSONL_BATCH_SIZE = 256   # 后台写线程每次最多合并写入多少条 span
+
+# 当前所在的 span，父子关系靠它传递 (asyncio 任务会自动复制；线程池需要用 bind 显式传递)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """一次计时：名称、所属 trace、父 span、起止时间、状态及附加属性。"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "end_time",
+                 "_start", "duration_ms", "attributes", "error", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.end_time: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": dict(self.attributes),
+        }
+
+
+class Tracer:
+    """
+    收集 span 并导出：
+      - JSON Lines：每个结束的 span 放入队列，由后台线程批量追加到 TRACE_JSONL_PATH，
+        结束 span 的线程不做序列化和文件 IO，也不在持有锁时写文件；文件按大小轮转 (与日志文件一致)；
+      - OTLP/HTTP (可选)：根 span 结束时把整条 trace 以 OTLP JSON 发送到本地收集器；
+      - 分位数：按 span 名称保留最近 TRACE_STATS_WINDOW 条耗时，计算 p50 / p95 / p99。
+    """
+
+    def __init__(self, enabled: bool = TRACE_ENABLED, jsonl_path: Optional[str] = TRACE_JSONL_PATH,
+                 otlp_endpoint: Optional[str] = TRACE_OTLP_ENDPOINT, window: int = TRACE_STATS_WINDOW,
+                 max_bytes: int = TRACE_MAX_BYTES, backup_count: int = TRACE_BACKUP_COUNT):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.otlp_endpoint = otlp_endpoint
+        self._durations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._open_traces: Dict[str, List[Span]] = defaultdict(list)
+        self._file = None
+        self._lock = threading.Lock()
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    # --- span 生命周期 ---
+
+    def start_span(self, name: str, **attributes: Any) -> Span:
+        span = Span(name, _current_span.get(), attributes)
+        if self.enabled:
+            span._token = _current_span.set(span)
+        return span
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> List[Span]:
+        """结束 span；若是根 span，返回整条 trace 的全部 span (含自身)，否则返回空列表。"""
+        span.end_time = time.time()
+        span.duration_ms = (time.perf_counter() - span._start) * 1000
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if not self.enabled:
+            return []
+        try:
+            _current_span.reset(span._token)
+        except ValueError:
+            # 在另一个上下文中结束 (例如跨线程)，无法还原，直接清空
+            _current_span.set(None)
+
+        with self._lock:
+            self._durations[span.name].append(span.duration_ms)
+            self._open_traces[span.trace_id].append(span)
+            finished = self._open_traces.pop(span.trace_id) if span.parent_id is None else []
+            if len(self._open_traces) > MAX_OPEN_TRACES:
+                self._open_traces.pop(next(iter(self._open_traces)))
+        if self.jsonl_path:
+            self._enqueue_jsonl(span)
+
+        if finished and self.otlp_endpoint:
+            threading.Thread(target=self._export_otlp, args=(finished,), daemon=True).start()
+        return finished
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        """
+        with 块结束 (包括抛出异常) 时结束 span。块内已提前调用 end_span 的 span
+        (例如根 span 需要在块内拿到整条 trace) 不会重复结束，只还原当前 span。
+        """
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self._close(span, e)
+            raise
+        self._close(span)
+
+    def _close(self, span: Span, error: Optional[BaseException] = None) -> None:
+        if span.end_time is None:
+            self.end_span(span, error)
+        elif span._token is not None:
+            try:
+                _current_span.reset(span._token)
+            except (ValueError, RuntimeError):
+                # 已在本上下文中还原过
+                pass
+
+    # --- 导出 ---
+
+    def _enqueue_jsonl(self, span: Span) -> None:
+        """在调用线程里只做 to_dict 快照 (属性之后可能被修改)，序列化和写文件交给后台线程。"""
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._jsonl_writer, name="trace-writer", daemon=True)
+                    self._writer.start()
+        self._queue.put(span.to_dict())
+
+    def _jsonl_writer(self) -> None:
+        """后台写线程：阻塞等待第一条，再把队列中已有的 span 一起写入，每批 flush 一次。"""
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < JSONL_BATCH_SIZE:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write_jsonl(batch)
+            if stop:
+                return
+
+    def _write_jsonl(self, records: List[Dict[str, Any]]) -> None:
+        path = self.jsonl_path
+        if not path:
+            return
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._file = open(path, "a", encoding="utf-8")
+            self._file.write("".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records))
+            self._file.flush()
+            if self.max_bytes > 0 and self._file.tell() >= self.max_bytes:
+                self._rotate(path)
+        except OSError as e:
+            print(f"❗ span 写入失败，停止写入 JSONL: {e}")
+            self.jsonl_path = None
+
+    def _rotate(self, path: str) -> None:
+        """与 RotatingFileHandler 相同的轮转方式：spans.jsonl -> .1 -> .2 ...，超过 backup_count 的删除。"""
+        self._file.close()
+        self._file = None
+        if self.backup_count <= 0:
+            os.remove(path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{path}.{index + 1}")
+        os.replace(path, f"{path}.1")
+
+    def flush(self, timeout: Optional[float] = 5.0) -> None:
+        """等待队列中的 span 全部写入并停止写线程 (进程退出时自动调用)，之后结束的 span 会重新启动写线程。"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+            if writer is None:
+                return
+            self._queue.put(None)
+            writer.join(timeout)
+
+    def _export_otlp(self, spans: List[Span]) -> None:
+        import requests
+
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        otlp_spans = [{
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(span.start_time * 1e9)),
+            "endTimeUnixNano": str(int(span.end_time * 1e9)),
+            "attributes": [attribute(k, v) for k, v in span.attributes.items() if v is not None],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        } for span in spans]
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", "sztu-agent")]},
+            "scopeSpans": [{"scope": {"name": "Logs.tracing"}, "spans": otlp_spans}],
+        }]}
+        try:
+            requests.post(self.otlp_endpoint, json=payload, timeout=2)
+        except requests.RequestException as e:
+            print(f"❗ OTLP 导出失败: {e}")
+
+    # --- 统计 ---
+
+    def percentiles(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, float]]:
+        """按 span 名称返回 {count, mean, p50, p95, p99} (毫秒)，统计范围为进程内最近的窗口。"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._durations.items()
+                       if names is None or name in names}
+        return {name: summarize(values) for name, values in samples.items() if values}
+
+
+def summarize(durations_ms: List[float]) -> Dict[str, float]:
+    # numpy 只在统计分位数时用到，延迟导入以免拖慢启动
+    import numpy as np
+
+    values = np.asarray(durations_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def breakdown(spans: List[Span]) -> Dict[str, Dict[str, float]]:
+    """单次运行内按 span 名称汇总：{名称: {"count", "total_ms"}}，按总耗时降序。"""
+    totals: Dict[str, Dict[str, float]] = {}
+    for span in spans:
+        entry = totals.setdefault(span.name, {"count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += span.duration_ms or 0.0
+    return dict(sorted(totals.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def bind(func: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """把当前 trace 上下文绑定到函数上，提交到线程池后 span 仍能挂在正确的父 span 下。"""
+    return functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def load_percentiles(jsonl_path: str = TRACE_JSONL_PATH) -> Dict[str, Dict[str, float]]:
+    """从 JSONL 文件 (含轮转出的历史文件) 读取 span，跨多次运行 (多个进程) 计算各环节耗时分位数。"""
+    samples: Dict[str, List[float]] = defaultdict(list)
+    candidates = [jsonl_path] + [f"{jsonl_path}.{index}" for index in range(1, TRACE_BACKUP_COUNT + 1)]
+    paths = [path for path in candidates if os.path.exists(path)]
+    if not paths:
+        raise FileNotFoundError(jsonl_path)
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("duration_ms") is not None:
+                    samples[record["name"]].append(record["duration_ms"])
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+
+if __name__ == "__main__":
+    # python -m Logs.tracing [spans.jsonl]：打印各环节的耗时分位数
+    path = sys.argv[1] if len(sys.argv) > 1 else TRACE_JSONL_PATH
+    stats = load_percentiles(path)
+    print(f"{'span':<36}{'count':>8}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}")
+    for name, row in sorted(stats.items(), key=lambda item: item[1]["p95"], reverse=True):
+        print(f"{name:<36}{row['count']:>8}{row['p50']:>12.1f}{row['p95']:>12.1f}{row['p99']:>12.1f}")
@@ -1,19 +1,38 @@
 
+import hashlib
 import json
+import logging
+import sys
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import concurrent.futures
 from dotenv import load_dotenv
 from openai import OpenAI
 
-from Config.config import MAX_WORKERS, max_tokens, model_name, temperature
+from Agent.context_manager import ContextManager
+from Agent.prefetch import SpeculativePrefetch
+from Agent.tool_memo import ToolMemo, canonical_arguments
+from Agent.tool_result import encode_tool_result, preview
+from Agent.streaming import StreamAssembler
+from Config.config import (
+    ANSWER_CACHE_ENABLED,
+    MAX_WORKERS,
+    PROMPT_CACHE_DISCOUNT,
+    PROMPT_CACHE_KEY,
+    SPECULATIVE_PREFETCH,
+    STREAM_OUTPUT,
+    TOOL_DEFAULT_TIMEOUT,
+    TOOL_TIMEOUTS,
+    max_tokens,
+    model_name,
+    temperature,
+)
 from Logs.logs import setup_logging
-from Tool.Google_search import google_search
-from Tool.scripty_jiaodian import search_jiaodian_news
-from Tool.scripty_jiaowu_system import search_jiaowu_score
-from Tool.scripty_school_card import search_school_card_text
-from Tool.search_library import search_library_data
+from Logs.tracing import bind, breakdown, tracer
+from Tool.cancellation import CancelScope, raise_if_cancelled, remaining_time, run_cancellable
+from Tool.registry import profile_imports, profile_tool_loads, tool_functions
+from Tool.search_cache import cache_stats as search_cache_stats
 from Tool.tools_description import tools_description
 from prompt.Master_prompt import master_prompt
 
@@ -23,53 +42,134 @@ load_dotenv()
 
 client = OpenAI()
 
-TOOL_FUNCTIONS = {
-    "google_search": google_search,
-    "search_jiaodian_news": search_jiaodian_news,
-    "search_school_card_text": search_school_card_text,
-    "search_library_data": search_library_data,
-    "search_jiaowu_score": search_jiaowu_score,
-}
+# 进程级共享的工具线程池，避免每一轮都新建线程池
+TOOL_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool")
+
+# 工具名 -> 惰性入口 (声明见 Tool/tools_description.py)，工具模块在第一次调用时才导入
+TOOL_FUNCTIONS = tool_functions()
 
 # 调用模型
-def call_openai(messages: List[Dict[str, Any]]):
-    return client.chat.completions.create(
-        model=model_name,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
-        tools=tools_description,
-        tool_choice="auto",
-    )
+def chat_request_kwargs(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    每次模型调用的公共参数。tools 与 system 提示词每次完全相同，构成可被服务端缓存的稳定前缀。
+    """
+    kwargs = {
+        "model": model_name,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "tools": tools_description,
+        "tool_choice": "auto",
+    }
+    if PROMPT_CACHE_KEY:
+        kwargs["prompt_cache_key"] = PROMPT_CACHE_KEY
+    return kwargs
+
+
+def call_openai(messages: List[Dict[str, Any]], on_delta: Optional[Callable[[str], None]] = None,
+                holdback: bool = True):
+    """
+    on_delta 为空时普通调用；否则以 stream=True 调用，结束后拼装成与普通调用相同结构的
+    ChatCompletion (含工具调用与 usage)。holdback=True 时以工具调用开头的轮次不回调 on_delta
+    (见 StreamAssembler)；已知是最终回答的轮次传 False，文本增量到达即回调。
+    """
+    with tracer.span("llm.call", model=model_name, stream=on_delta is not None, messages=len(messages)) as span:
+        if on_delta is None:
+            response = client.chat.completions.create(**chat_request_kwargs(messages))
+        else:
+            stream = client.chat.completions.create(
+                **chat_request_kwargs(messages),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            assembler = StreamAssembler(on_delta, holdback=holdback)
+            for chunk in stream:
+                assembler.add_chunk(chunk)
+            response = assembler.build()
+        record_llm_span(span, response)
+        return response
+
+
+def cached_prompt_tokens(usage) -> int:
+    """usage 中命中前缀缓存的输入 token 数 (服务端未返回时为 0)。"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def record_llm_span(span, response) -> None:
+    """把 token 消耗和是否调用工具记到 llm.call span 上。"""
+    if getattr(response, "usage", None):
+        span.set(
+            prompt_tokens=response.usage.prompt_tokens,
+            cached_tokens=cached_prompt_tokens(response.usage),
+            completion_tokens=response.usage.completion_tokens,
+        )
+    span.set(tool_calls=len(response.choices[0].message.tool_calls or []))
 
 
 #  调用工具
-def execute_tool_call(tool_call) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+def _invoke_tool(function_name: str, function_args: Dict[str, Any],
+                 prefetched: Optional[concurrent.futures.Future] = None) -> str:
+    """执行工具 (或取用预取结果) 并编码为紧凑 JSON；预取失败时照常执行工具。"""
+    result_data = None
+    if prefetched is not None:
+        try:
+            with tracer.span(f"tool.{function_name}", prefetched=True):
+                result_data = prefetched.result(timeout=remaining_time())
+            logger.info("• 复用预取结果: %s", function_name)
+        except Exception as e:
+            logger.warning("• 预取失败，重新执行 %s: %s", function_name, e)
+            prefetched = None
+    if prefetched is None:
+        if function_name not in TOOL_FUNCTIONS:
+            raise ValueError(f"未知工具: {function_name}")
+        raise_if_cancelled()   # 排队期间已超时的调用不再执行
+        with tracer.span(f"tool.{function_name}"):
+            result_data = TOOL_FUNCTIONS[function_name](**function_args)
+    return encode_tool_result(function_name, result_data)
+
+
+def execute_tool_call(tool_call, prefetched: Optional[concurrent.futures.Future] = None,
+                      memo: Optional[ToolMemo] = None) -> Dict[str, Any]:
     """
-    执行单个工具调用，返回用于 OpenAI 对话的 tool 消息和记录摘要。
+    执行单个工具调用，返回用于 OpenAI 对话的 tool 消息 (内容为紧凑 JSON)。
+    prefetched 为可复用的预取结果；memo 为本次运行的调用记忆表，相同调用只执行一次。
     """
     function_name = tool_call.function.name
     raw_arguments = tool_call.function.arguments or "{}"
     function_args = json.loads(raw_arguments)
 
-    func = TOOL_FUNCTIONS.get(function_name)
     logger.info("• 调用工具: %s", function_name)
     logger.info("• 参数: %s", function_args)
 
-
-    result_data = func(**function_args)
-    result_payload = {
-        "success": True,
-        "data": result_data,
-    }
-
-
-    logger.info("• 结果: %s", result_payload)
+    if memo is None:
+        content = _invoke_tool(function_name, function_args, prefetched)
+    else:
+        key = (function_name, canonical_arguments(TOOL_FUNCTIONS.get(function_name), function_args))
+        future, owner, source = memo.claim(key)
+        if owner:
+            try:
+                content = _invoke_tool(function_name, function_args, prefetched)
+            except BaseException as e:
+                memo.resolve(key, error=e)
+                raise
+            memo.resolve(key, content)
+        else:
+            # 等待执行中的相同调用，最多等到本次调用自己的截止时间
+            try:
+                content = future.result(timeout=remaining_time())
+            except concurrent.futures.TimeoutError:
+                raise TimeoutError(f"等待相同调用 {function_name} 的结果超时") from None
+            logger.info("• 复用%s相同调用的结果: %s", "同批" if source == "batch" else "之前轮次", function_name)
+
+    # 只记录截断后的预览，完整结果可能是整篇文章
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("• 结果 (%s 字符): %s", len(content), preview(content))
 
     tool_message = {
         "role": "tool",
         "tool_call_id": tool_call.id,
-        "content":f"{result_payload}"
+        "content": content,
     }
 
     return tool_message
@@ -82,61 +182,210 @@ def _log_execution_summary(
     total_prompt_tokens: int,
     total_completion_tokens: int,
     total_tokens: int,
+    total_cached_tokens: int = 0,
+    answer_cache_hit: bool = False,
+    first_token_latency: Optional[float] = None,
+    trace_spans: Optional[list] = None,
 ) -> None:
     logger.info("==" * 60)
     logger.info("• 执行统计报告:")
     logger.info("• 执行用时: %.2f秒", execution_time)
+    if first_token_latency is not None:
+        logger.info("• 首字延迟: %.2f秒", first_token_latency)
     logger.info("• 总迭代轮数: %s", iterations)
     logger.info("• API调用次数: %s", api_call_count)
     logger.info("• Token消耗统计:")
     logger.info("• 输入Token: %s", f"{total_prompt_tokens:,}")
+    if total_prompt_tokens:
+        logger.info(
+            "• 前缀缓存命中: %s (命中率 %.1f%%，输入成本约节省 %.1f%%)",
+            f"{total_cached_tokens:,}",
+            total_cached_tokens / total_prompt_tokens * 100,
+            total_cached_tokens * PROMPT_CACHE_DISCOUNT / total_prompt_tokens * 100,
+        )
     logger.info("• 输出Token: %s", f"{total_completion_tokens:,}")
     logger.info("• 总Token: %s", f"{total_tokens:,}")
     if api_call_count:
         logger.info("• 平均每次调用: %.1f tokens", total_tokens / api_call_count if total_tokens else 0)
-    logger.info("==" * 60)
+    # 延迟导入：查询向量缓存依赖 numpy，未用到检索工具的进程不必加载
+    from Tool.embedding_cache import cache_stats as embedding_cache_stats
 
-# 主逻辑
-def run_master_agent(user_input: str, max_iterations: int = 10) -> str:
-    """
-    执行面向深圳技术大学场景的智能助手循环，直到获得最终回答或达到迭代上限。
-    """
-    start_time = time.time()
-    total_prompt_tokens = 0
-    total_completion_tokens = 0
-    total_tokens = 0
-    api_call_count = 0
+    embedding_stats = embedding_cache_stats()
+    if embedding_stats:
+        logger.info(
+            "• 查询向量缓存(进程累计): 内存命中%s + 磁盘命中%s / 未命中%s，命中率 %.1f%%，当前 %s 条",
+            embedding_stats["hits"],
+            embedding_stats["disk_hits"],
+            embedding_stats["misses"],
+            embedding_stats["hit_rate"] * 100,
+            embedding_stats["size"],
+        )
+    search_stats = search_cache_stats()
+    if search_stats:
+        logger.info(
+            "• 联网搜索缓存(今日): 命中%s + 过期复用%s / 未命中%s，命中率 %.1f%%，API调用%s次，剩余配额%s",
+            search_stats["hits"],
+            search_stats["stale_hits"],
+            search_stats["misses"],
+            search_stats["hit_rate"] * 100,
+            search_stats["api_calls"],
+            search_stats["quota_left"],
+        )
+    if ANSWER_CACHE_ENABLED:
+        from Agent.answer_cache import answer_cache
 
-    logger.info("• 用户查询: %s", user_input)
+        answer_stats = answer_cache.stats()
+        logger.info(
+            "• 语义答案缓存: 本次%s，累计命中%s / 未命中%s，累计节省 %.2f秒",
+            "命中" if answer_cache_hit else "未命中",
+            answer_stats["hits"],
+            answer_stats["misses"],
+            answer_stats["saved_seconds"],
+        )
+    if trace_spans:
+        _log_latency_breakdown(trace_spans)
     logger.info("==" * 60)
 
-    message = [{"role": "user", "content": f"用户问题:{user_input}"},{"role": "system", "content": master_prompt}]
 
+def _log_latency_breakdown(trace_spans: list) -> None:
+    """按环节输出本次运行的耗时分解，并附上进程内累计的 p50 / p95 / p99。"""
+    totals = breakdown([span for span in trace_spans if span.parent_id is not None])
+    if not totals:
+        return
+    history = tracer.percentiles(totals.keys())
+    logger.info("• 耗时分解 (本次合计 | 进程累计 p50 / p95 / p99):")
+    for name, entry in totals.items():
+        stats = history.get(name)
+        logger.info(
+            "•   %-32s %3s次 %9.1fms | %.0f / %.0f / %.0f ms",
+            name,
+            entry["count"],
+            entry["total_ms"],
+            stats["p50"] if stats else 0,
+            stats["p95"] if stats else 0,
+            stats["p99"] if stats else 0,
+        )
 
-    for iteration in range(1, max_iterations + 1):
-        logger.info("• 第 %s 轮工具调用:", iteration)
+# 单次运行的状态
+class AgentRunState:
+    """
+    一次智能体运行的共享状态：消息列表、token 统计、用过的工具及答案缓存信息。
+    同步循环 run_master_agent 与异步循环 (Server.py) 共用，保证两边的统计口径一致。
+    """
 
+    def __init__(self, user_input: str, trace):
+        self.user_input = user_input
+        self.start_time = time.time()
+        self.total_prompt_tokens = 0
+        self.total_cached_tokens = 0
+        self.total_completion_tokens = 0
+        self.total_tokens = 0
+        self.api_call_count = 0
+        self.used_tools = set()
+        self.question_vector = None
+        self.first_token_time = None
+        self.trace = trace   # 根 span，由 run_master_agent 的 with 块负责结束
+        # system 提示词放在最前，与 tools 一起构成每次请求都相同的前缀，才能命中服务端的前缀缓存
+        self.message = [{"role": "system", "content": master_prompt}, {"role": "user", "content": f"用户问题:{user_input}"}]
+        self.context = ContextManager(self.message)
+        self.prefetch: Optional[SpeculativePrefetch] = None
+        self.memo = ToolMemo()
+
+        logger.info("• 用户查询: %s", user_input)
+        logger.info("==" * 60)
 
-        response = call_openai(message)
+    def lookup_answer_cache(self) -> Optional[str]:
+        """语义答案缓存：命中时直接返回历史回答，不调用模型。"""
+        if not ANSWER_CACHE_ENABLED:
+            return None
+        # 答案缓存默认关闭，仅在启用时导入 (依赖 numpy 与 Embedding 客户端)
+        from Agent.answer_cache import answer_cache
 
-        # 打印运行日志
-        api_call_count += 1
+        cached, self.question_vector = answer_cache.lookup(self.user_input)
+        if not cached:
+            return None
+        logger.info(
+            "• 命中语义答案缓存 (相似度 %.4f，节省约 %.2f秒): %s",
+            cached["similarity"],
+            cached["latency"],
+            cached["question"],
+        )
+        self.trace.set(answer_cache_hit=True)
+        _log_execution_summary(time.time() - self.start_time, 0, 0, 0, 0, 0, answer_cache_hit=True,
+                               first_token_latency=time.time() - self.start_time,
+                               trace_spans=tracer.end_span(self.trace))
+        return cached["answer"]
+
+    def start_prefetch(self) -> None:
+        """与第一轮模型调用并行，提前执行按关键词预测出的本地检索工具。"""
+        if not SPECULATIVE_PREFETCH:
+            return
+        self.prefetch = SpeculativePrefetch(self.user_input, TOOL_FUNCTIONS)
+        started = self.prefetch.start()
+        if started:
+            logger.info("• 预取工具: %s", ", ".join(started))
+
+    def take_prefetched(self, tool_calls) -> List[Optional[concurrent.futures.Future]]:
+        """
+        第一轮模型回复后调用：为每个工具调用取出可复用的预取结果 (不能复用为 None)，
+        未被认领的预取随即丢弃。之后的轮次不再有预取。
+        """
+        if self.prefetch is None:
+            return [None] * len(tool_calls)
+        claimed = [self.prefetch.claim(tool_call) for tool_call in tool_calls]
+        wasted = self.prefetch.discard()
+        self.prefetch = None
+        hits = sum(future is not None for future in claimed)
+        if hits or wasted:
+            logger.info("• 预取命中 %s 个，丢弃 %s 个%s", hits, len(wasted), f" ({', '.join(wasted)})" if wasted else "")
+        self.trace.set(prefetch_hits=hits, prefetch_wasted=len(wasted))
+        return claimed
+
+    def stream_callback(self, on_delta: Optional[Callable[[str], None]]) -> Optional[Callable[[str], None]]:
+        """包装调用方的 on_delta，记录首个文本增量到达的时间 (首字延迟)。"""
+        if on_delta is None:
+            return None
+
+        def _on_delta(text: str) -> None:
+            if self.first_token_time is None:
+                self.first_token_time = time.time()
+                logger.info("• 首字延迟: %.2f秒", self.first_token_time - self.start_time)
+            on_delta(text)
+
+        return _on_delta
+
+    def record_usage(self, response, final: bool = False) -> None:
+        """累计一次模型调用的 token 消耗并打印运行日志。"""
+        self.api_call_count += 1
         if getattr(response, "usage", None):
             prompt_tokens = response.usage.prompt_tokens
             completion_tokens = response.usage.completion_tokens
             tokens_used = response.usage.total_tokens
-            total_prompt_tokens += prompt_tokens
-            total_completion_tokens += completion_tokens
-            total_tokens += tokens_used
-            logger.info(
-                "• API调用 %s: 输入%s + 输出%s = %s tokens",
-                api_call_count,
-                prompt_tokens,
-                completion_tokens,
-                tokens_used,
-            )
-
-
+            cached_tokens = cached_prompt_tokens(response.usage)
+            self.total_prompt_tokens += prompt_tokens
+            self.total_cached_tokens += cached_tokens
+            self.total_completion_tokens += completion_tokens
+            self.total_tokens += tokens_used
+            if final:
+                logger.info(
+                    "• 最终回答API调用: 输入%s + 输出%s = %s tokens，缓存命中 %s",
+                    prompt_tokens,
+                    completion_tokens,
+                    tokens_used,
+                    cached_tokens,
+                )
+            else:
+                logger.info(
+                    "• API调用 %s: 输入%s + 输出%s = %s tokens，缓存命中 %s",
+                    self.api_call_count,
+                    prompt_tokens,
+                    completion_tokens,
+                    tokens_used,
+                    cached_tokens,
+                )
+
+    def append_response(self, response) -> list:
+        """把模型回复加入消息列表，返回其中的工具调用 (没有则为空列表)。"""
         conversation = {
             "role": response.choices[0].message.role,
             "content": response.choices[0].message.content,
@@ -145,79 +394,244 @@ def run_master_agent(user_input: str, max_iterations: int = 10) -> str:
             conversation["tool_calls"] = response.choices[0].message.tool_calls
 
         # 添加消息列表
-        message.append(conversation)
+        self.message.append(conversation)
 
         tool_calls = response.choices[0].message.tool_calls or []
-
-        if not tool_calls:
-            final_content = response.choices[0].message.content or ""
-            execution_time = time.time() - start_time
-            _log_execution_summary(
-                execution_time,
-                iteration,
-                api_call_count,
-                total_prompt_tokens,
-                total_completion_tokens,
-                total_tokens,
+        if tool_calls:
+            logger.info("• 识别到需要调用 %s 个工具:", len(tool_calls))
+            self.used_tools.update(tool_call.function.name for tool_call in tool_calls)
+        return tool_calls
+
+    def add_tool_results(self, tool_messages: List[Dict[str, Any]]) -> None:
+        """加入本轮工具结果；消息总量超出预算时压缩较早的工具结果，保持下一次调用的输入有界。"""
+        self.context.add_tool_results(tool_messages)
+        stats = self.context.compact()
+        if stats:
+            logger.info(
+                "• 上下文压缩: %s → %s tokens (压缩 %s 条工具结果，预算 %s)",
+                stats["before"],
+                stats["after"],
+                stats["compacted"],
+                self.context.budget,
             )
-            return final_content
-
-        logger.info("• 识别到需要调用 %s 个工具:", len(tool_calls))
-
-        max_workers = min(MAX_WORKERS, len(tool_calls)) or 1
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_tool_call = {
-                executor.submit(execute_tool_call, tool_call): tool_call
-                for tool_call in tool_calls
-            }
-            for future in concurrent.futures.as_completed(future_to_tool_call):
-                tool_message = future.result()
-                message.append(tool_message)
-
-
-    logger.info("• 达到最大迭代次数 (%s)，请求最终回答。", max_iterations)
-    message.append({"role": "user", "content": "请基于以上工具调用结果，为用户提供准确、完整的回答。"})
-
-    final_response = call_openai(message)
-
-    api_call_count += 1
-    if getattr(final_response, "usage", None):
-        prompt_tokens = final_response.usage.prompt_tokens
-        completion_tokens = final_response.usage.completion_tokens
-        tokens_used = final_response.usage.total_tokens
-        total_prompt_tokens += prompt_tokens
-        total_completion_tokens += completion_tokens
-        total_tokens += tokens_used
-        logger.info(
-            "• 最终回答API调用: 输入%s + 输出%s = %s tokens",
-            prompt_tokens,
-            completion_tokens,
-            tokens_used,
+
+    def request_final_answer(self, max_iterations: int) -> None:
+        logger.info("• 达到最大迭代次数 (%s)，请求最终回答。", max_iterations)
+        self.message.append({"role": "user", "content": "请基于以上工具调用结果，为用户提供准确、完整的回答。"})
+
+    def finish(self, final_content: str, iterations: int) -> str:
+        """写入答案缓存并打印执行统计，返回最终回答。"""
+        execution_time = time.time() - self.start_time
+        if ANSWER_CACHE_ENABLED:
+            from Agent.answer_cache import answer_cache
+
+            answer_cache.store(self.user_input, self.question_vector, final_content, execution_time, self.used_tools)
+        self.trace.set(iterations=iterations, total_tokens=self.total_tokens,
+                       memo_hits=self.memo.hits, memo_coalesced=self.memo.coalesced)
+        if self.memo.hits or self.memo.coalesced:
+            logger.info("• 重复工具调用: 复用之前轮次结果 %s 次，同批合并 %s 次", self.memo.hits, self.memo.coalesced)
+        _log_execution_summary(
+            execution_time,
+            iterations,
+            self.api_call_count,
+            self.total_prompt_tokens,
+            self.total_completion_tokens,
+            self.total_tokens,
+            self.total_cached_tokens,
+            first_token_latency=self.first_token_time - self.start_time if self.first_token_time else None,
+            trace_spans=tracer.end_span(self.trace),
         )
+        return final_content
+
+
+# 并行执行一批工具调用
+def tool_timeout(function_name: str) -> float:
+    return TOOL_TIMEOUTS.get(function_name, TOOL_DEFAULT_TIMEOUT)
+
 
-    execution_time = time.time() - start_time
-    _log_execution_summary(
-        execution_time,
-        max_iterations,
-        api_call_count,
-        total_prompt_tokens,
-        total_completion_tokens,
-        total_tokens,
+def wait_tool_result(future: concurrent.futures.Future, scope: CancelScope, submitted_at: float):
+    """
+    等待工具结果：截止时间为开始执行后的 scope.timeout 秒 (排队时间不计入)，
+    提交后 scope.timeout 秒仍未开始执行的调用同样按超时处理。
+    """
+    try:
+        return future.result(timeout=max(submitted_at + scope.timeout - time.perf_counter(), 0))
+    except concurrent.futures.TimeoutError:
+        remaining = scope.remaining()
+        if future.done() or not remaining:
+            raise
+        return future.result(timeout=remaining)
+
+
+def tool_timeout_detail(scope: CancelScope) -> str:
+    """超时失败信息：区分执行超时与在线程池中排队超时。"""
+    if scope.started_at is None:
+        return f"工具在队列中等待超过 {scope.timeout} 秒仍未开始执行，已放弃。请基于其他结果回答，或稍后重试。"
+    return f"工具执行超过 {scope.timeout} 秒，已放弃。请基于其他结果回答，或稍后重试。"
+
+
+def tool_failure_message(tool_call, reason: str, detail: str) -> Dict[str, Any]:
+    """工具超时 / 出错时返回给模型的结构化失败信息，不中断整个运行。"""
+    content = json.dumps(
+        {"error": reason, "tool": tool_call.function.name, "message": detail},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return {"role": "tool", "tool_call_id": tool_call.id, "content": content}
+
+
+def log_round_latency(durations: List[Tuple[str, float]], span) -> None:
+    """输出本轮工具的耗时，并指出决定本轮耗时的最慢工具。"""
+    if not durations:
+        return
+    round_seconds = max(seconds for _, seconds in durations)
+    slowest_name, slowest_seconds = max(durations, key=lambda item: item[1])
+    logger.info(
+        "• 本轮工具耗时 %.2f秒，最慢: %s (%.2f秒)%s",
+        round_seconds,
+        slowest_name,
+        slowest_seconds,
+        "；" + "，".join(f"{name} {seconds:.2f}秒" for name, seconds in durations) if len(durations) > 1 else "",
     )
+    span.set(dominant_tool=slowest_name, round_ms=round(round_seconds * 1000, 3))
+
+
+def run_tool_calls(tool_calls, prefetched: Optional[list] = None,
+                   memo: Optional[ToolMemo] = None) -> List[Dict[str, Any]]:
+    """
+    在进程级共享线程池中并行执行同一轮的工具调用，按 tool_calls 的顺序返回 tool 消息。
+
+    每个工具有独立的截止时间 (TOOL_TIMEOUTS，从开始执行时算起)：超时的调用发出取消信号
+    (工具在耗时步骤之间自行检查，网络请求和浏览器操作也各有超时，工作线程随后释放)，
+    与抛出异常的调用一样以结构化失败信息返回，不影响同一轮的其他工具。
+    prefetched 与 tool_calls 一一对应，为可复用的预取结果 (或 None)；memo 用于合并重复调用。
+    """
+    prefetched = prefetched or [None] * len(tool_calls)
+    if memo is not None:
+        memo.begin_round()
+
+    round_start = time.perf_counter()
+    finished_at: Dict[concurrent.futures.Future, float] = {}
+    with tracer.span("tools.round", calls=len(tool_calls)) as span:
+        pending = []
+        for tool_call, prefetch_future in zip(tool_calls, prefetched):
+            scope = CancelScope(tool_timeout(tool_call.function.name))
+            future = TOOL_EXECUTOR.submit(
+                bind(run_cancellable, scope, execute_tool_call, tool_call, prefetch_future, memo)
+            )
+            future.add_done_callback(lambda done: finished_at.setdefault(done, time.perf_counter()))
+            pending.append((tool_call, future, scope))
+
+        messages: List[Dict[str, Any]] = []
+        durations: List[Tuple[str, float]] = []
+        for tool_call, future, scope in pending:
+            function_name = tool_call.function.name
+            try:
+                messages.append(wait_tool_result(future, scope, round_start))
+            except concurrent.futures.TimeoutError:
+                if future.done():   # 工具自身抛出的 TimeoutError
+                    logger.error("• 工具执行失败: %s: %s", function_name, future.exception())
+                    messages.append(tool_failure_message(tool_call, "error", f"TimeoutError: {future.exception()}"))
+                else:
+                    scope.set()
+                    future.cancel()
+                    logger.warning("• 工具超时 (%s秒)，已放弃: %s", scope.timeout, function_name)
+                    messages.append(tool_failure_message(tool_call, "timeout", tool_timeout_detail(scope)))
+            except Exception as e:
+                logger.error("• 工具执行失败: %s: %s: %s", function_name, type(e).__name__, e)
+                messages.append(tool_failure_message(tool_call, "error", f"{type(e).__name__}: {e}"))
+            durations.append((function_name, finished_at.get(future, time.perf_counter()) - round_start))
+
+        log_round_latency(durations, span)
+    return messages
+
+
+def trace_query_attributes(user_input: str) -> Dict[str, Any]:
+    """根 span 只记录问题的长度和哈希 (可用于关联同一问题的多次运行)，不把原文写入 trace 文件。"""
+    return {
+        "query_chars": len(user_input),
+        "query_sha256": hashlib.sha256(user_input.encode("utf-8")).hexdigest()[:16],
+    }
+
+
+# 主逻辑
+def run_master_agent(user_input: str, max_iterations: int = 10,
+                     on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """
+    执行面向深圳技术大学场景的智能助手循环，直到获得最终回答或达到迭代上限。
+
+    传入 on_delta 时进入流式模式：每轮模型调用都以 stream=True 发起 (事先无法知道哪一轮是最终回答)。
+    普通轮次的文本在确认没有工具调用后才交给 on_delta，调用工具前的铺垫文字不会发给用户；
+    达到迭代上限后的最终回答轮次边生成边回调。on_delta 收到的文本与返回的完整最终回答一致。
+    """
+    with tracer.span("agent.run", **trace_query_attributes(user_input)) as trace:
+        state = AgentRunState(user_input, trace)
+        stream_delta = state.stream_callback(on_delta)
+
+        cached_answer = state.lookup_answer_cache()
+        if cached_answer is not None:
+            if on_delta:
+                on_delta(cached_answer)
+            return cached_answer
+
+        state.start_prefetch()
+        for iteration in range(1, max_iterations + 1):
+            logger.info("• 第 %s 轮工具调用:", iteration)
+
+            response = call_openai(state.message, stream_delta)
+            state.record_usage(response)
+
+            tool_calls = state.append_response(response)
+            prefetched = state.take_prefetched(tool_calls)
+            if not tool_calls:
+                return state.finish(response.choices[0].message.content or "", iteration)
+
+            state.add_tool_results(run_tool_calls(tool_calls, prefetched, state.memo))
+
+        state.request_final_answer(max_iterations)
+        final_response = call_openai(state.message, stream_delta, holdback=False)
+        state.record_usage(final_response, final=True)
+
+        return state.finish(final_response.choices[0].message.content or "", max_iterations)
+
+
+def print_delta(text: str) -> None:
+    print(text, end="", flush=True)
+
 
-    return final_response.choices[0].message.content or ""
+def profile_startup() -> None:
+    """--profile-startup：冷启动耗时、导入耗时分解，以及各工具第一次调用时的加载耗时。"""
+    wall, import_seconds, rows = profile_imports("Run")
+    print(f"• 冷启动 (新进程 import Run): 进程总耗时 {wall:.2f}秒，其中导入 {import_seconds:.2f}秒")
+    print("• 导入耗时分解 (Run 的直接依赖，按累计耗时排序):")
+    for name, self_seconds, cumulative in rows:
+        print(f"•   {name:<40}{cumulative * 1000:>9.1f}ms (自身 {self_seconds * 1000:.1f}ms)")
+    print("• 工具第一次调用时的加载耗时 (惰性导入):")
+    for name, seconds in profile_tool_loads().items():
+        if isinstance(seconds, Exception):
+            print(f"•   {name:<40} ❌ 加载失败: {seconds}")
+        else:
+            print(f"•   {name:<40}{seconds * 1000:>9.1f}ms")
 
 
 def main():
     """主函数 - 测试循环工具调用的校园助手"""
+    if "--profile-startup" in sys.argv[1:]:
+        profile_startup()
+        return
 
     index = 1
     while   True:
         query = input("输入问题：")
         print(f"• 正在测试 {index}: {query}")
         logger.info("• 正在测试 %s: %s", index, query)
-        result = run_master_agent(query, max_iterations=8)
-        print(f"• 最终结果:\n{result}")
+        if STREAM_OUTPUT:
+            print("• 最终结果:")
+            result = run_master_agent(query, max_iterations=8, on_delta=print_delta)
+            print()
+        else:
+            result = run_master_agent(query, max_iterations=8)
+            print(f"• 最终结果:\n{result}")
         logger.info("• 最终结果:\n%s", result)
         logger.info("==" * 60)
         index += 1
@@ -0,0 +1,349 @@
+
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from Config.config import (
+    MAX_WORKERS,
+    SERVER_HOST,
+    SERVER_MAX_BODY_BYTES,
+    SERVER_MAX_CONCURRENCY,
+    SERVER_MAX_ITERATIONS,
+    SERVER_PORT,
+    SERVER_READ_TIMEOUT,
+    model_name,
+)
+from Agent.streaming import StreamAssembler
+from Logs.tracing import bind, tracer
+from Run import (
+    TOOL_EXECUTOR,
+    AgentRunState,
+    chat_request_kwargs,
+    execute_tool_call,
+    log_round_latency,
+    logger,
+    record_llm_span,
+    tool_failure_message,
+    tool_timeout,
+    tool_timeout_detail,
+    trace_query_attributes,
+)
+from Tool.cancellation import CancelScope, run_cancellable
+
+async_client = AsyncOpenAI()
+
+
+# 调用模型 (异步)
+async def call_openai_async(messages: List[Dict[str, Any]], on_delta: Optional[Callable[[str], None]] = None,
+                            holdback: bool = True):
+    """call_openai 的异步版本，holdback 的含义相同。"""
+    with tracer.span("llm.call", model=model_name, stream=on_delta is not None, messages=len(messages)) as span:
+        if on_delta is None:
+            response = await async_client.chat.completions.create(**chat_request_kwargs(messages))
+        else:
+            stream = await async_client.chat.completions.create(
+                **chat_request_kwargs(messages),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            assembler = StreamAssembler(on_delta, holdback=holdback)
+            async for chunk in stream:
+                assembler.add_chunk(chunk)
+            response = assembler.build()
+        record_llm_span(span, response)
+        return response
+
+
+# 调用工具 (异步适配)
+async def execute_tool_call_async(tool_call, prefetched=None, memo=None,
+                                  scope: Optional[CancelScope] = None) -> Dict[str, Any]:
+    """
+    工具本身是阻塞的 (requests / Selenium / 文件读取)，统一放到共享线程池执行。
+    截止时间与 wait_tool_result 相同：从开始执行时算起，提交后 scope.timeout 秒仍在排队也按超时处理。
+    超时时先发出取消信号 (scope.set()) 再抛出 asyncio.TimeoutError；工具自身抛出的 TimeoutError 不会 set。
+    """
+    loop = asyncio.get_running_loop()
+    scope = scope or CancelScope(tool_timeout(tool_call.function.name))
+    future = loop.run_in_executor(
+        TOOL_EXECUTOR, bind(run_cancellable, scope, execute_tool_call, tool_call, prefetched, memo)
+    )
+    try:
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), scope.timeout)
+        except asyncio.TimeoutError:
+            remaining = scope.remaining()
+            if future.done() or not remaining:
+                raise
+            return await asyncio.wait_for(asyncio.shield(future), remaining)
+    except asyncio.TimeoutError:
+        if not future.done():
+            scope.set()
+            future.cancel()   # 仍在排队的调用直接移出队列
+        raise
+
+
+async def run_tool_calls_async(tool_calls, prefetched: Optional[list] = None, memo=None) -> List[Dict[str, Any]]:
+    """与 run_tool_calls 相同的语义：每个工具独立超时、失败隔离，按 tool_calls 的顺序返回。"""
+    prefetched = prefetched or [None] * len(tool_calls)
+    if memo is not None:
+        memo.begin_round()
+    round_start = time.perf_counter()
+
+    async def run_one(tool_call, prefetch_future) -> Tuple[Dict[str, Any], Tuple[str, float]]:
+        function_name = tool_call.function.name
+        scope = CancelScope(tool_timeout(function_name))
+        try:
+            message = await execute_tool_call_async(tool_call, prefetch_future, memo, scope)
+        except asyncio.TimeoutError as e:
+            if scope.is_set():
+                logger.warning("• 工具超时 (%s秒)，已放弃: %s", scope.timeout, function_name)
+                message = tool_failure_message(tool_call, "timeout", tool_timeout_detail(scope))
+            else:   # 工具自身抛出的 TimeoutError
+                logger.error("• 工具执行失败: %s: TimeoutError: %s", function_name, e)
+                message = tool_failure_message(tool_call, "error", f"TimeoutError: {e}")
+        except Exception as e:
+            logger.error("• 工具执行失败: %s: %s: %s", function_name, type(e).__name__, e)
+            message = tool_failure_message(tool_call, "error", f"{type(e).__name__}: {e}")
+        return message, (function_name, time.perf_counter() - round_start)
+
+    with tracer.span("tools.round", calls=len(tool_calls)) as span:
+        outcomes = await asyncio.gather(*(
+            run_one(tool_call, future) for tool_call, future in zip(tool_calls, prefetched)
+        ))
+        log_round_latency([duration for _, duration in outcomes], span)
+    return [message for message, _ in outcomes]
+
+
+# 主逻辑 (异步)
+async def run_master_agent_async(user_input: str, max_iterations: int = 10,
+                                 on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """
+    run_master_agent 的异步版本：模型调用走 AsyncOpenAI，工具调用在共享线程池中执行，
+    等待期间事件循环可以继续处理其他会话。on_delta 的含义与同步版本相同。
+    """
+    with tracer.span("agent.run", **trace_query_attributes(user_input)) as trace:
+        state = AgentRunState(user_input, trace)
+        stream_delta = state.stream_callback(on_delta)
+        loop = asyncio.get_running_loop()
+
+        # 答案缓存需要生成 Embedding (阻塞调用)
+        cached_answer = await loop.run_in_executor(TOOL_EXECUTOR, bind(state.lookup_answer_cache))
+        if cached_answer is not None:
+            if on_delta:
+                on_delta(cached_answer)
+            return cached_answer
+
+        state.start_prefetch()
+        for iteration in range(1, max_iterations + 1):
+            logger.info("• 第 %s 轮工具调用:", iteration)
+
+            response = await call_openai_async(state.message, stream_delta)
+            state.record_usage(response)
+
+            tool_calls = state.append_response(response)
+            prefetched = state.take_prefetched(tool_calls)
+            if not tool_calls:
+                return state.finish(response.choices[0].message.content or "", iteration)
+
+            state.add_tool_results(await run_tool_calls_async(tool_calls, prefetched, state.memo))
+
+        state.request_final_answer(max_iterations)
+        final_response = await call_openai_async(state.message, stream_delta, holdback=False)
+        state.record_usage(final_response, final=True)
+
+        return state.finish(final_response.choices[0].message.content or "", max_iterations)
+
+
+# --- 本地 HTTP 服务 ---
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 408: "Request Timeout",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class AgentServer:
+    """
+    基于 asyncio 的轻量 HTTP 服务，一个事件循环同时服务多个学生会话。
+
+    接口:
+      POST /chat   请求体 {"query": "...", "session_id": "可选", "max_iterations": 可选, "stream": 可选}
+                   返回 {"session_id": ..., "answer": ..., "elapsed": 秒}
+                   stream 为 true 时以分块传输返回 NDJSON：逐行 {"delta": "..."}，最后一行为上述完整结果
+      GET  /health 返回当前排队与处理中的会话数
+    """
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                 max_concurrency: int = SERVER_MAX_CONCURRENCY):
+        self.host = host
+        self.port = port
+        # 所有会话共用 MAX_WORKERS 个工具线程：会话数超过线程数时，请求会在线程池里排队直到工具超时，
+        # 因此并发上限不超过线程数，多出的请求在入口处等待
+        self.max_concurrency = min(max_concurrency, MAX_WORKERS)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.served = 0
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        method, path, _ = request_line.split(" ", 2)
+
+        content_length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                content_length = int(value.strip())
+
+        if content_length > SERVER_MAX_BODY_BYTES:
+            raise OverflowError(content_length)
+        body = await reader.readexactly(content_length) if content_length else b""
+        return method.upper(), path, body
+
+    @staticmethod
+    async def _write_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, payload: Dict[str, Any]) -> None:
+        """写出一行 NDJSON 作为 HTTP 分块传输的一个块。"""
+        data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+
+    async def _chat(self, body: bytes, writer: asyncio.StreamWriter) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """处理 /chat；流式模式下直接写出响应并返回 None。"""
+        try:
+            request = json.loads(body or b"{}")
+            query = str(request["query"]).strip()
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "请求体需要是包含 query 字段的 JSON"}
+        if not query:
+            return 400, {"error": "query 不能为空"}
+
+        try:
+            max_iterations = int(request.get("max_iterations", 8))
+        except (ValueError, TypeError):
+            return 400, {"error": "max_iterations 需要是整数"}
+        if max_iterations < 1:
+            return 400, {"error": "max_iterations 需要大于 0"}
+        max_iterations = min(max_iterations, SERVER_MAX_ITERATIONS)
+
+        session_id: Optional[str] = request.get("session_id")
+        stream = bool(request.get("stream", False))
+
+        on_delta = None
+        if stream:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/x-ndjson; charset=utf-8\r\n"
+                b"Transfer-Encoding: chunked\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            await writer.drain()
+
+            def on_delta(text: str) -> None:
+                self._write_chunk(writer, {"delta": text})
+
+        self.waiting += 1
+        async with self._semaphore:
+            self.waiting -= 1
+            self.active += 1
+            start = time.time()
+            try:
+                logger.info("• 会话 %s 开始处理", session_id)
+                answer = await run_master_agent_async(query, max_iterations=max_iterations, on_delta=on_delta)
+            except Exception as e:
+                if not stream:
+                    raise
+                # 响应头已经发出，只能在流里报告错误
+                logger.exception("• 会话 %s 流式处理失败: %s", session_id, e)
+                self._write_chunk(writer, {"session_id": session_id, "error": str(e)})
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+                return None
+            finally:
+                self.active -= 1
+                self.served += 1
+
+        result = {"session_id": session_id, "answer": answer, "elapsed": round(time.time() - start, 3)}
+        if not stream:
+            return 200, result
+        self._write_chunk(writer, result)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(self._read_request(reader), SERVER_READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self._write_json(writer, 408, {"error": "读取请求超时"})
+                return
+            except OverflowError:
+                await self._write_json(writer, 413, {"error": "请求体过大"})
+                return
+            except (ValueError, asyncio.IncompleteReadError):
+                await self._write_json(writer, 400, {"error": "无法解析的 HTTP 请求"})
+                return
+
+            if method == "POST" and path == "/chat":
+                response = await self._chat(body, writer)
+                if response is None:
+                    return
+                status, payload = response
+            elif method == "GET" and path == "/health":
+                status, payload = 200, {
+                    "status": "ok",
+                    "active": self.active,
+                    "waiting": self.waiting,
+                    "served": self.served,
+                    "max_concurrency": self.max_concurrency,
+                }
+            else:
+                status, payload = 404, {"error": f"未知接口: {method} {path}"}
+            await self._write_json(writer, status, payload)
+        except Exception as e:
+            logger.exception("• 请求处理失败: %s", e)
+            try:
+                await self._write_json(writer, 500, {"error": str(e)})
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self) -> None:
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"• 校园助手服务已启动: http://{self.host}:{self.port} (最大并发会话 {self.max_concurrency})")
+        logger.info("• 服务启动: %s:%s，最大并发会话 %s", self.host, self.port, self.max_concurrency)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """主函数 - 启动异步多会话服务 (及语料定时更新)"""
+    # 语料更新依赖检索索引 (numpy)，只在真正启动服务时导入
+    from Tool.corpus_refresh import corpus_refresher
+
+    corpus_refresher.warm_up()
+    corpus_refresher.start()
+    try:
+        asyncio.run(AgentServer().serve_forever())
+    finally:
+        corpus_refresher.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
 from googleapiclient.discovery import build
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
+from Config.config import HTTP_RETRIES, HTTP_TIMEOUT
+from Logs.logs import LOGGER_NAME
+from Logs.tracing import bind, tracer
+from Tool.search_cache import SearchResultCache, get_search_cache
+from Tool.text_utils import normalize_query
+
 # 加载环境变量 (用于安全存储 API 密钥)
 load_dotenv()
 
@@ -11,46 +22,127 @@ load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 CSE_ID = os.getenv("GOOGLE_CSE_ID")
 
+_service = None
+_service_lock = threading.Lock()
+_thread_local = threading.local()
 
-def google_search(query: str, num_results: int = 5) -> List[Dict]:
-    """
-    使用 Google Custom Search JSON API 执行网络搜索。
+_refreshing_lock = threading.Lock()
+_refreshing = set()   # 正在后台刷新的 (归一化查询, 条数)
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="google-refresh")
+
+logger = logging.getLogger(LOGGER_NAME)
 
-    该函数依赖于环境变量 GOOGLE_API_KEY 和 GOOGLE_CSE_ID。
 
+def get_service():
     """
-    if not API_KEY or not CSE_ID:
-        print("❌ 错误：GOOGLE_API_KEY 或 GOOGLE_CSE_ID 环境变量未设置。")
-        return []
+    进程内只构建一次 Custom Search 服务对象 (build 需要加载并解析 discovery 文档，开销不小)。
+    服务对象只用来构造请求，真正发送时使用 _thread_http() 的线程私有连接。
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = build("customsearch", "v1", developerKey=API_KEY, cache_discovery=False)
+    return _service
 
-    try:
-        # 1. 构建服务对象
-        service = build(
-            "customsearch",
-            "v1",
-            developerKey=API_KEY
-        )
-
-        # 2. 执行搜索请求
+
+def _thread_http() -> httplib2.Http:
+    """httplib2.Http 不是线程安全的，每个工具线程保留一个，线程内复用长连接。"""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _thread_local.http = httplib2.Http(timeout=HTTP_TIMEOUT)
+    return http
+
+
+def _call_api(query: str, num: int) -> List[Dict]:
+    """调用一次 Custom Search API 并整理结果，失败时抛出异常。"""
+    # 1. 获取缓存的服务对象
+    service = get_service()
+
+    # 2. 执行搜索请求
+    with tracer.span("http.google_search"):
         result = service.cse().list(
             q=query,
             cx=CSE_ID,
-            num=min(num_results, 10)  # 确保不超过 API 限制的最大值 10
-        ).execute()
+            num=num
+        ).execute(http=_thread_http(), num_retries=HTTP_RETRIES)
 
-        # 3. 提取和格式化结果
-        search_items = result.get('items', [])
+    # 3. 提取和格式化结果
+    search_items = result.get('items', [])
 
-        formatted_results = []
-        for item in search_items:
-            formatted_results.append({
-                "title": item.get("title"),
-                "link": item.get("link"),
-                "snippet": item.get("snippet")
-            })
+    formatted_results = []
+    for item in search_items:
+        formatted_results.append({
+            "title": item.get("title"),
+            "link": item.get("link"),
+            "snippet": item.get("snippet")
+        })
 
-        return formatted_results
+    return formatted_results
 
+
+def _fetch_and_store(query: str, num: int, cache: Optional[SearchResultCache]) -> Optional[List[Dict]]:
+    """未达配额时调用 API 并写入缓存；配额用完或调用失败返回 None。"""
+    if cache is not None and not cache.try_reserve_call():
+        cache.count("quota_blocked")
+        print(f"❗ 今日 Google Search API 配额 ({cache.daily_quota} 次) 已用完。")
+        return None
+    try:
+        results = _call_api(query, num)
     except Exception as e:
         print(f"❌ Google Search API 调用失败: {e}")
+        return None
+    if cache is not None:
+        cache.store(query, num, results)
+    return results
+
+
+def _refresh(query: str, num: int, cache: SearchResultCache) -> None:
+    try:
+        _fetch_and_store(query, num, cache)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard((normalize_query(query), num))
+
+
+def _schedule_refresh(query: str, num: int, cache: SearchResultCache) -> None:
+    """在后台刷新过期结果，同一查询同时只刷新一次。"""
+    key = (normalize_query(query), num)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _REFRESH_EXECUTOR.submit(bind(_refresh, query, num, cache))
+
+
+def google_search(query: str, num_results: int = 5) -> List[Dict]:
+    """
+    使用 Google Custom Search JSON API 执行网络搜索。
+
+    该函数依赖于环境变量 GOOGLE_API_KEY 和 GOOGLE_CSE_ID。
+    结果按 (归一化查询, 条数) 缓存：新鲜的直接返回；过期但在可复用期内的先返回旧结果，
+    同时在后台刷新 (刷新失败或配额用完时继续沿用旧结果，直到超出可复用期)。
+    超出可复用期的记录会被删除，此时只能同步调用 API，API 失败或当日配额用完时返回空列表。
+    """
+    if not API_KEY or not CSE_ID:
+        print("❌ 错误：GOOGLE_API_KEY 或 GOOGLE_CSE_ID 环境变量未设置。")
         return []
+
+    num = min(num_results, 10)  # 确保不超过 API 限制的最大值 10
+    cache = get_search_cache()
+    cached, status = cache.lookup(query, num) if cache is not None else (None, "miss")
+
+    if status == "fresh":
+        cache.count("hits")
+        logger.info("• 联网搜索命中缓存: %s", query)
+        return cached
+    if status == "stale":
+        cache.count("stale_hits")
+        logger.info("• 联网搜索命中过期缓存，后台刷新: %s", query)
+        _schedule_refresh(query, num, cache)
+        return cached
+
+    if cache is not None:
+        cache.count("misses")
+    results = _fetch_and_store(query, num, cache)
+    return results if results is not None else []
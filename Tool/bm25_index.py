@@ -0,0 +1,81 @@
+from collections import Counter, defaultdict
+from itertools import count
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+from Config.config import BM25_B, BM25_K1, RRF_K
+from Tool.embedding_index import top_k_indices
+from Tool.text_utils import tokenize_ngrams
+
+
+class BM25Index:
+    """
+    内存中的 BM25 倒排索引。
+
+    倒排表按 CSR 方式连续存放：词项 -> [start, end) 区间，区间内是命中的文档下标与
+    预先算好的权重 (已包含 idf 与文档长度归一化)。查询时只需把命中词项的权重累加到
+    分数向量上，无需任何网络请求。
+    """
+
+    def __init__(self, keys: Sequence[Hashable], texts: Sequence[str],
+                 k1: float = BM25_K1, b: float = BM25_B):
+        self.keys = list(keys)
+
+        # 1. 统计 (词项, 文档, 词频) 三元组
+        posting_terms: List[int] = []
+        posting_docs: List[int] = []
+        posting_freqs: List[int] = []
+        lengths: List[int] = []
+        term_ids: Dict[str, int] = defaultdict(count().__next__)  # 首次出现的词项自动分配编号
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize_ngrams(text)
+            tf = Counter(tokens)
+            lengths.append(len(tokens))
+            posting_terms.extend(map(term_ids.__getitem__, tf))
+            posting_docs.extend([doc_id] * len(tf))
+            posting_freqs.extend(tf.values())
+
+        self.term_ids = dict(term_ids)
+        doc_lengths = np.array(lengths, dtype=np.float32)
+        terms = np.array(posting_terms, dtype=np.int32)
+        docs = np.array(posting_docs, dtype=np.int32)
+        freqs = np.array(posting_freqs, dtype=np.float32)
+
+        # 2. 向量化计算每条倒排记录的 BM25 权重
+        n_docs = len(self.keys)
+        doc_freq = np.bincount(terms, minlength=len(self.term_ids)).astype(np.float32)
+        idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        avg_length = float(doc_lengths.mean()) if n_docs and doc_lengths.mean() > 0 else 1.0
+        norm = k1 * (1.0 - b + b * doc_lengths[docs] / avg_length)
+        weights = idf[terms] * freqs * (k1 + 1.0) / (freqs + norm)
+
+        # 3. 按词项排序，整理为 CSR 结构
+        order = np.argsort(terms, kind="stable")
+        self.doc_ids = docs[order]
+        self.weights = weights[order].astype(np.float32)
+        self.offsets = np.concatenate([[0], np.cumsum(doc_freq.astype(np.int64))])
+
+    def search(self, query_text: str, top_k: int) -> List[Tuple[Hashable, float]]:
+        """返回 (文档键, BM25 分数) 列表，按分数降序，只包含至少命中一个词项的文档。"""
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        for term, query_freq in Counter(tokenize_ngrams(query_text)).items():
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                scores[self.doc_ids[start:end]] += query_freq * self.weights[start:end]
+
+        ranked = top_k_indices(scores, top_k)
+        return [(self.keys[i], float(scores[i])) for i in ranked if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Tuple[Hashable, float]]],
+                           k: int = RRF_K) -> List[Tuple[Hashable, float]]:
+    """
+    倒数排名融合 (RRF)：score(d) = Σ 1 / (k + rank_i(d))，只看名次，不要求各路分数同量纲。
+    """
+    fused: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, (key, _) in enumerate(ranking, start=1):
+            fused[key] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,57 @@
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# 当前工具调用的取消信号 (由执行器在超时后 set)，工具在耗时步骤之间自行检查
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("cancel_event", default=None)
+
+
+class ToolCancelled(Exception):
+    """工具调用已超时并被执行器放弃，后续步骤不再执行。"""
+
+
+class CancelScope(threading.Event):
+    """
+    一次工具调用的取消信号 (set 即取消) 与截止时间。
+    截止时间从工作线程真正开始执行时算起，在共享线程池中排队的时间不计入。
+    """
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+        self.started_at: Optional[float] = None
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的秒数 (不小于 0)，尚未开始执行时为 None。"""
+        if self.started_at is None:
+            return None
+        return max(self.started_at + self.timeout - time.monotonic(), 0.0)
+
+
+def run_cancellable(cancel_event: threading.Event, func: Callable, *args, **kwargs) -> Any:
+    """在带取消信号的上下文中执行 func (在工作线程内调用)，cancel_event 为 CancelScope 时从此刻开始计时。"""
+    if isinstance(cancel_event, CancelScope) and cancel_event.started_at is None:
+        cancel_event.started_at = time.monotonic()
+    token = _cancel_event.set(cancel_event)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _cancel_event.reset(token)
+
+
+def is_cancelled() -> bool:
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def remaining_time() -> Optional[float]:
+    """当前工具调用距截止时间的秒数，不在带截止时间的调用中时为 None (不限时)。"""
+    event = _cancel_event.get()
+    return event.remaining() if isinstance(event, CancelScope) else None
+
+
+def raise_if_cancelled() -> None:
+    """协作式取消：执行器已放弃本次调用时抛出 ToolCancelled。"""
+    if is_cancelled():
+        raise ToolCancelled("工具调用已超时取消")
@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from Config.config import CORPUS_REFRESH_INTERVAL, CORPUS_REFRESH_JOBS
+from Logs.tracing import tracer
+from Tool.registry import resolve_entry
+from Tool.retriever import build_corpus_index, get_retriever
+
+
+class CorpusRefresher:
+    """
+    语料定时更新：后台线程每隔 interval 秒依次增量运行各语料的爬虫。
+
+    爬虫保存了新文章时会自己调用 build_corpus_index 并返回新增的标题数；爬虫没有更新索引 (返回 None，
+    例如没有新文章) 时，这里再调用一次 build_corpus_index 补齐标题 / 段落 / BM25 索引
+    (新检出的仓库因此也会在这里完成首次构建，而不是在查询路径上)。索引都在新版本上构建后再替换，
+    正在进行的查询继续使用它们已拿到的旧版本，服务无需重启，旧版本文件在构建结束时清理。
+    """
+
+    def __init__(self, jobs: Optional[Dict[str, str]] = None, interval: float = CORPUS_REFRESH_INTERVAL):
+        self.jobs = dict(CORPUS_REFRESH_JOBS if jobs is None else jobs)   # 语料目录 -> 爬虫入口 "模块:函数"
+        self.interval = interval
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self, corpus_dir: str) -> Dict[str, Any]:
+        """运行一个语料的爬虫并补齐索引，返回 {"ok", "seconds", "added", "error"}。"""
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"ok": True, "added": 0, "error": None}
+        with tracer.span("corpus.refresh", corpus=corpus_dir) as span:
+            added = None
+            try:
+                added = resolve_entry(self.jobs[corpus_dir])()
+            except Exception as e:
+                result.update(ok=False, error=f"{type(e).__name__}: {e}")
+                print(f"❌ 语料更新失败 ({corpus_dir}): {result['error']}")
+            try:
+                # 爬虫已经构建过索引时直接使用它的新增数，同一批文章只构建一次
+                result["added"] = added if isinstance(added, int) else build_corpus_index(corpus_dir, with_passages=True)
+            except Exception as e:
+                result.update(ok=False, error=f"{type(e).__name__}: {e}")
+                print(f"❌ 索引构建失败 ({corpus_dir}): {result['error']}")
+            span.set(ok=result["ok"], added=result["added"])
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        self.last_results[corpus_dir] = result
+        return result
+
+    def warm_up(self) -> None:
+        """在后台为各语料构建 BM25 数据，服务启动后的首个查询不必等待构建。"""
+        for corpus_dir in self.jobs:
+            get_retriever(corpus_dir).warm_up()
+
+    def run_once(self) -> Dict[str, Dict[str, Any]]:
+        """按顺序更新全部语料；某个语料失败不影响其他语料。"""
+        return {corpus_dir: self.refresh(corpus_dir) for corpus_dir in self.jobs if not self._stop.is_set()}
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self) -> bool:
+        """启动后台线程 (interval <= 0 或已在运行时不启动)，第一轮在 interval 秒后执行。"""
+        if self.interval <= 0 or not self.jobs or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="corpus-refresh", daemon=True)
+        self._thread.start()
+        print(f"• 语料定时更新已启动: 每 {self.interval:.0f} 秒更新 {len(self.jobs)} 个语料")
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台线程；正在运行的爬虫会先跑完当前语料。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+corpus_refresher = CorpusRefresher()
+
+
+if __name__ == '__main__':
+    # 手动触发一轮更新
+    for corpus, outcome in corpus_refresher.run_once().items():
+        print(f"{corpus}: {outcome}")
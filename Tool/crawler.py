@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from Config.config import CRAWL_DELAY, CRAWL_PER_HOST_CONCURRENCY, CRAWL_TIMEOUT
+from Logs.tracing import tracer
+from Tool.http_client import http_client
+
+
+class PoliteFetcher:
+    """
+    爬虫共用的 HTTP 抓取器：一个 requests.Session 供所有线程复用 (连接池与重试由 http_client 提供)，
+    并按主机限制同时进行的请求数以及相邻两次请求的最小间隔，避免给学校网站造成压力。
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None,
+                 per_host_concurrency: int = CRAWL_PER_HOST_CONCURRENCY,
+                 delay: float = CRAWL_DELAY, timeout: float = CRAWL_TIMEOUT):
+        self.delay = delay
+        self.timeout = timeout
+        self.session = http_client.isolated_session(headers)
+
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(per_host_concurrency))
+        self._next_time: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def _wait_turn(self, host: str) -> None:
+        """为该主机预约下一个请求时间点，必要时等待。"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time[host])
+            self._next_time[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def get(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> requests.Response:
+        """
+        GET 请求。传入 etag / last_modified 时发送条件请求，内容未变化时返回 304 响应。
+        4xx / 5xx 抛出 requests.HTTPError。
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots[host]
+        with slot:
+            self._wait_turn(host)
+            with tracer.span("http.get", host=host) as span:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                span.set(status=response.status_code)
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        return response
+
+
+class CrawlManifest:
+    """
+    爬取清单 (JSON)，记录:
+      pages    列表页 URL -> {"etag", "last_modified"}，用于条件请求判断列表页是否变化
+      articles 详情页 URL -> {"title", "fetched_at"}，已记录的文章不会再次下载
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages: Dict[str, Dict] = {}
+        self.articles: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.pages = data.get("pages", {})
+                self.articles = data.get("articles", {})
+            except (OSError, ValueError) as e:
+                print(f"❗ 爬取清单读取失败，将重新建立: {e}")
+
+    def page_validators(self, url: str) -> Dict[str, Optional[str]]:
+        entry = self.pages.get(url, {})
+        return {"etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
+
+    def record_page(self, url: str, response: requests.Response) -> None:
+        with self._lock:
+            self.pages[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+
+    def has_article(self, url: str) -> bool:
+        return url in self.articles
+
+    def record_article(self, url: str, title: str, fetched_at: Optional[float] = None) -> None:
+        with self._lock:
+            self.articles[url] = {"title": title, "fetched_at": fetched_at}
+
+    def save(self) -> None:
+        """原子写入：先写临时文件再替换，中途中断不会留下损坏的清单。"""
+        with self._lock:
+            data = {"pages": self.pages, "articles": self.articles}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,175 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Config.config import DOC_STORE_FILE
+from Tool.embedding_index import TITLE_LIST_FILE, read_title_list
+from Tool.text_utils import split_article
+
+# SQLite 单条语句的参数个数有上限，批量查询按该大小分批
+QUERY_BATCH_SIZE = 500
+
+
+def legacy_file_name(title: str) -> str:
+    """旧版爬虫保存正文时使用的文件名：去掉标题中的非法字符后拼接 .txt。"""
+    safe_title = re.sub(r'[\\/:*?"<>|]', '', title).strip()
+    return f"{safe_title}.txt"
+
+
+class DocumentStore:
+    """
+    一个语料目录的文档库：所有文章存放在 `<corpus_dir>/documents.db` 一个 SQLite 文件中。
+
+    每篇文章有稳定的整数编号，并分别保存标题、日期、网址和正文。爬虫按 add 返回的编号写标题列表，
+    标题列表、标题向量索引与文档库因此使用同一套编号，检索时按编号批量取出，
+    无需再由标题拼接文件名、逐个 exists + open。
+    使用 WAL 模式：爬虫写入新文章时，检索进程仍可并发读取。
+    """
+
+    def __init__(self, corpus_dir: str, file_name: str = DOC_STORE_FILE):
+        self.corpus_dir = corpus_dir
+        self.db_path = os.path.join(corpus_dir, file_name)
+        self._lock = threading.Lock()
+        os.makedirs(corpus_dir, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE, date TEXT, url TEXT, "
+            "body TEXT NOT NULL DEFAULT '', fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    # --- 写入 ---
+
+    def add(self, title: str, body: str = "", date: Optional[str] = None, url: Optional[str] = None,
+            doc_id: Optional[int] = None, replace: bool = False) -> Optional[int]:
+        """
+        写入一篇文章，返回其编号；标题已存在时默认跳过并返回 None，replace=True 时更新内容但保留原编号。
+        """
+        row = (doc_id, title, date, url, body or "", time.time())
+        with self._lock:
+            if replace:
+                cursor = self._db.execute(
+                    "INSERT INTO documents (id, title, date, url, body, fetched_at) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(title) DO UPDATE SET date = excluded.date, url = excluded.url, "
+                    "body = excluded.body, fetched_at = excluded.fetched_at",
+                    row,
+                )
+            else:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO documents (id, title, date, url, body, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+            self._db.commit()
+            if cursor.rowcount <= 0:
+                return None
+            if replace:
+                # upsert 更新已有行时 lastrowid 不可靠，按标题取回原编号
+                return self._db.execute("SELECT id FROM documents WHERE title = ?", (title,)).fetchone()[0]
+            return cursor.lastrowid
+
+    def import_text_files(self) -> int:
+        """
+        一次性迁移旧版的 .txt 正文文件：按标题列表的顺序和编号入库，
+        列表之外的文件排在后面。返回导入的篇数。
+        """
+        title_list_path = os.path.join(self.corpus_dir, TITLE_LIST_FILE)
+        entries = read_title_list(title_list_path) if os.path.exists(title_list_path) else []
+        listed = {legacy_file_name(title) for _, title in entries}
+        with os.scandir(self.corpus_dir) as scanned:
+            extra = sorted(
+                entry.name for entry in scanned
+                if entry.is_file() and entry.name.endswith(".txt")
+                and entry.name != TITLE_LIST_FILE and entry.name not in listed
+            )
+
+        rows = []
+        for doc_id, title in entries + [(None, name[:-len(".txt")]) for name in extra]:
+            path = os.path.join(self.corpus_dir, legacy_file_name(title))
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                meta, body = split_article(f.read())
+            if doc_id is None:
+                title = meta.get("title") or title
+            rows.append((doc_id, title, meta.get("date"), meta.get("url"), body, os.path.getmtime(path)))
+
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO documents (id, title, date, url, body, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            return self._db.total_changes - before
+
+    # --- 读取 ---
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def contains(self, title: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM documents WHERE title = ?", (title,)).fetchone() is not None
+
+    def titles(self) -> List[Tuple[int, str]]:
+        """全部文章的 (编号, 标题)，按编号排序。"""
+        with self._lock:
+            return self._db.execute("SELECT id, title FROM documents ORDER BY id").fetchall()
+
+    def fetch(self, doc_ids: Iterable[int]) -> Dict[int, Tuple[Dict[str, str], str]]:
+        """按编号批量读取：编号 -> (元信息, 正文)，元信息只含非空的 title / date / url。库中没有的编号不出现在结果中。"""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        documents = {}
+        with self._lock:
+            for start in range(0, len(doc_ids), QUERY_BATCH_SIZE):
+                batch = doc_ids[start:start + QUERY_BATCH_SIZE]
+                rows = self._db.execute(
+                    f"SELECT id, title, date, url, body FROM documents WHERE id IN ({', '.join('?' * len(batch))})",
+                    batch,
+                )
+                for doc_id, title, date, url, body in rows:
+                    meta = {key: value for key, value in (("title", title), ("date", date), ("url", url)) if value}
+                    documents[doc_id] = (meta, body)
+        return documents
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# --- 进程级文档库注册表 ---
+
+_STORES: Dict[str, DocumentStore] = {}
+_registry_lock = threading.Lock()
+
+
+def get_document_store(corpus_dir: str) -> DocumentStore:
+    """
+    获取语料目录对应的文档库 (进程内只打开一次)。
+    文档库为空而目录下还有旧版 .txt 文件时，首次打开会自动迁移。
+    """
+    key = os.path.abspath(corpus_dir)
+    with _registry_lock:
+        store = _STORES.get(key)
+        if store is None:
+            store = DocumentStore(corpus_dir)
+            if store.count() == 0:
+                imported = store.import_text_files()
+                if imported:
+                    print(f"✅ 已将 {imported} 篇旧版 .txt 文章迁移到文档库: {store.db_path}")
+            _STORES[key] = store
+        return store
+
+
+if __name__ == '__main__':
+    from Config.config import JIAODIAN_DIR, SCHOOL_CARD_DIR
+
+    for corpus in (JIAODIAN_DIR, SCHOOL_CARD_DIR):
+        print(f"{corpus}: {get_document_store(corpus).count()} 篇")
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from Config.config import EMBEDDING_CACHE_DISK_MAX, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE
+from Tool.text_utils import normalize_query
+
+
+class EmbeddingCache:
+    """
+    查询向量缓存：内存中按 LRU 淘汰，可选地落盘到 SQLite，进程重启后仍可命中。
+
+    键为 (模型名, 归一化后的查询文本)。hits / disk_hits / misses 计数用于评估缓存容量是否合适。
+    """
+
+    def __init__(self, capacity: int = EMBEDDING_CACHE_SIZE, db_path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 disk_capacity: int = EMBEDDING_CACHE_DISK_MAX):
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self._memory: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, text))"
+            )
+            self._db.commit()
+
+    # --- 内存 LRU ---
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = (model, normalize_query(text))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text = ?", key
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._db.execute(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text = ?", (time.time(), *key)
+                    )
+                    self._db.commit()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, vector: np.ndarray, persist: bool = True) -> None:
+        """写入缓存；persist=False 时只放进内存，原文不落盘 (用于可能含个人信息的文本)。"""
+        key = (model, normalize_query(text))
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if persist and self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text, vector, last_used) VALUES (?, ?, ?, ?)",
+                    (*key, vector.tobytes(), time.time()),
+                )
+                # 磁盘上同样只保留最近使用的 disk_capacity 条
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_capacity,),
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """进程内共享的查询向量缓存。"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+def cache_stats() -> Optional[Dict[str, float]]:
+    """进程累计的缓存统计；本进程尚未用过查询向量缓存时返回 None。"""
+    return _cache.stats() if _cache is not None else None
@@ -0,0 +1,479 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import openai
+from dotenv import load_dotenv
+
+from Config.config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL,
+    EMBEDDING_TIMEOUT,
+    HTTP_RETRIES,
+    INDEX_DIR_NAME,
+    INDEX_VERSION_GRACE,
+)
+from Logs.tracing import tracer
+from Tool.cancellation import raise_if_cancelled
+from Tool.embedding_cache import get_embedding_cache
+
+load_dotenv()
+
+EMBEDDINGS_FILE = "embeddings.npy"   # 标题向量矩阵 (float32, 已归一化)
+SIDECAR_FILE = "titles.json"         # 标题 / 编号 sidecar
+CHUNK_EMBEDDINGS_FILE = "chunks.npy"  # 正文段落向量矩阵
+CHUNK_SIDECAR_FILE = "chunks.json"    # 段落原文 / 所属文章 sidecar
+TITLE_LIST_FILE = "text_title_list.txt"
+
+# 向量矩阵按版本写成 embeddings.<版本>.npy / chunks.<版本>.npy (旧版本目录中为不带版本号的文件名)
+VERSION_FILE_PATTERN = re.compile(r"^(embeddings|chunks)(\.\d+)?\.npy$")
+
+# embed_query 未显式指定 persist 时是否把查询原文写入磁盘向量缓存 (transient_queries 内为 False)
+_persist_queries: contextvars.ContextVar[bool] = contextvars.ContextVar("persist_queries", default=True)
+
+_client: Optional[openai.OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client() -> openai.OpenAI:
+    """进程内共享的 OpenAI 客户端，避免每次检索都重新创建连接。请求设置超时 (SDK 默认长达 10 分钟)。"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=EMBEDDING_TIMEOUT, max_retries=HTTP_RETRIES)
+        return _client
+
+
+def embed_texts(texts: List[str], model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """
+    批量生成 Embedding，返回按行归一化后的 float32 矩阵。
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    client = get_openai_client()
+    vectors = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+        with tracer.span("embedding.create", model=model, batch=len(batch)):
+            response = client.embeddings.create(input=batch, model=model)
+        vectors.extend(item.embedding for item in response.data)
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+@contextmanager
+def transient_queries():
+    """在该上下文中调用的检索工具，查询原文 (如用户原话) 只缓存在内存中，不写入磁盘。"""
+    token = _persist_queries.set(False)
+    try:
+        yield
+    finally:
+        _persist_queries.reset(token)
+
+
+def embed_query(query_text: str, model: str = EMBEDDING_MODEL, persist: Optional[bool] = None) -> np.ndarray:
+    """
+    对单条查询语句生成归一化向量，重复的查询直接命中向量缓存。
+    persist=False 时新生成的向量只缓存在内存中，查询原文不写入磁盘；不指定时由 transient_queries 决定。
+    """
+    if persist is None:
+        persist = _persist_queries.get()
+    cache = get_embedding_cache()
+    with tracer.span("embedding.query", model=model) as span:
+        vector = cache.get(model, query_text)
+        span.set(cache_hit=vector is not None)
+        if vector is None:
+            raise_if_cancelled()   # 调用已被放弃时不再发起网络请求
+            vector = embed_texts([query_text], model=model)[0]
+            cache.put(model, query_text, vector, persist=persist)
+    return vector
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    取分数最高的 top_k 个下标 (降序)。先用 argpartition 做 O(n) 选择，只对选中的 k 个排序。
+    """
+    n = len(scores)
+    if top_k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if top_k >= n:
+        return np.argsort(scores)[::-1]
+    candidates = np.argpartition(scores, n - top_k)[n - top_k:]
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def read_title_list(title_list_path: str) -> List[Tuple[int, str]]:
+    """读取标题列表文件，返回 (编号, 标题) 列表，跳过表头等非编号行。"""
+    entries = []
+    with open(title_list_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r"^(\d+)\.\s*(.+)$", line.strip())
+            if match:
+                entries.append((int(match.group(1)), match.group(2).strip()))
+    return entries
+
+
+def load_vectors(index_dir: str, embeddings_file: str, sidecar_file: str,
+                 model: str) -> Optional[Tuple[np.ndarray, Dict]]:
+    """
+    以内存映射方式加载 sidecar 指向的向量矩阵版本，文件缺失或模型不一致时返回 None。
+    sidecar 中的 "matrix" 字段记录矩阵文件名，没有该字段的旧索引使用 embeddings_file。
+    """
+    sidecar_path = os.path.join(index_dir, sidecar_file)
+    if not os.path.exists(sidecar_path):
+        return None
+
+    with open(sidecar_path, 'r', encoding='utf-8') as f:
+        sidecar = json.load(f)
+    embeddings_path = os.path.join(index_dir, sidecar.setdefault("matrix", embeddings_file))
+    if sidecar.get("model") != model or not os.path.exists(embeddings_path):
+        return None
+    return np.load(embeddings_path, mmap_mode='r'), sidecar
+
+
+def save_vectors(index_dir: str, embeddings_file: str, sidecar_file: str,
+                 matrix: np.ndarray, sidecar: Dict) -> None:
+    """
+    把矩阵写成一个新的版本文件，再原子替换 sidecar 使其指向新版本。
+    已加载 (内存映射) 的旧版本文件不会被覆盖，正在使用它的查询不受影响，
+    之后由 prune_index_versions 清理。
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    stem, ext = os.path.splitext(embeddings_file)
+    matrix_file = f"{stem}.{time.time_ns()}{ext}"
+    sidecar_path = os.path.join(index_dir, sidecar_file)
+
+    tmp_embeddings = os.path.join(index_dir, matrix_file + ".tmp.npy")
+    np.save(tmp_embeddings, matrix.astype(np.float32))
+    os.replace(tmp_embeddings, os.path.join(index_dir, matrix_file))
+
+    sidecar = dict(sidecar, matrix=matrix_file, dim=int(matrix.shape[1]) if matrix.size else 0)
+    tmp_sidecar = sidecar_path + ".tmp"
+    with open(tmp_sidecar, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, ensure_ascii=False)
+    os.replace(tmp_sidecar, sidecar_path)
+
+
+def append_rows(matrix: Optional[np.ndarray], new_matrix: np.ndarray) -> np.ndarray:
+    """在已有矩阵 (可能是只读的内存映射) 之后追加新行。"""
+    if matrix is not None and len(matrix):
+        return np.vstack([np.asarray(matrix), new_matrix])
+    return new_matrix
+
+
+class EmbeddingIndex:
+    """
+    持久化的标题向量索引。
+
+    索引保存在 `<corpus_dir>/index/` 下：`embeddings.npy` 为归一化后的向量矩阵，
+    `titles.json` 记录每一行对应的标题编号与标题文本。查询时只需对查询语句做一次
+    Embedding，标题向量以内存映射方式加载并在进程内复用。
+
+    已发布到进程缓存的对象视为只读快照：更新时在新对象上 sync，完成后再替换缓存
+    (见 refresh_embedding_index)，正在进行的查询继续使用旧对象，行号与标题始终一致。
+    """
+
+    def __init__(self, corpus_dir: str, model: str = EMBEDDING_MODEL):
+        self.corpus_dir = corpus_dir
+        self.model = model
+        self.index_dir = os.path.join(corpus_dir, INDEX_DIR_NAME)
+        self.title_list_path = os.path.join(corpus_dir, TITLE_LIST_FILE)
+        self.ids: List[int] = []
+        self.titles: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+        self.matrix_file: Optional[str] = None
+        self.source_mtime: float = 0.0
+        self._lock = threading.Lock()
+
+    # --- 持久化 ---
+
+    def load(self) -> bool:
+        """从磁盘加载索引，模型不一致或文件缺失时返回 False。"""
+        loaded = load_vectors(self.index_dir, EMBEDDINGS_FILE, SIDECAR_FILE, self.model)
+        if loaded is None:
+            return False
+
+        matrix, sidecar = loaded
+        self.ids = [item["id"] for item in sidecar["items"]]
+        self.titles = [item["title"] for item in sidecar["items"]]
+        self.source_mtime = sidecar.get("source_mtime", 0.0)
+        self.matrix, self.matrix_file = matrix, sidecar["matrix"]
+        _LIVE_INDEXES.add(self)
+        return True
+
+    # --- 构建与增量更新 ---
+
+    def sync(self) -> int:
+        """
+        将索引与标题列表文件同步：只为新出现的标题生成 Embedding，返回新增条数。
+        """
+        with self._lock:
+            if self.matrix is None:
+                self.load()
+
+            entries = read_title_list(self.title_list_path)
+            source_mtime = os.path.getmtime(self.title_list_path)
+            known = set(self.titles)
+            new_entries = [(i, t) for i, t in entries if t not in known]
+
+            if not new_entries:
+                self.source_mtime = source_mtime
+                return 0
+
+            matrix = append_rows(self.matrix, embed_texts([t for _, t in new_entries], model=self.model))
+            ids = self.ids + [i for i, _ in new_entries]
+            titles = self.titles + [t for _, t in new_entries]
+
+            save_vectors(self.index_dir, EMBEDDINGS_FILE, SIDECAR_FILE, matrix, {
+                "model": self.model,
+                "source_mtime": source_mtime,
+                "items": [{"id": i, "title": t} for i, t in zip(ids, titles)],
+            })
+            self.load()
+            print(f"✅ 向量索引已更新: 新增 {len(new_entries)} 条，共 {len(titles)} 条 ({self.index_dir})")
+            return len(new_entries)
+
+    def is_stale(self) -> bool:
+        """标题列表文件在索引构建之后被修改过。"""
+        try:
+            return os.path.getmtime(self.title_list_path) > self.source_mtime
+        except OSError:
+            return False
+
+    # --- 检索 ---
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """返回 (行号, 相似度) 列表，按相似度降序排列。"""
+        if self.matrix is None or not len(self.matrix):
+            return []
+        scores = self.matrix @ query_vector
+        ranked = top_k_indices(scores, top_k)
+        return [(int(i), float(scores[i])) for i in ranked]
+
+
+class ChunkIndex:
+    """
+    持久化的正文段落向量索引。
+
+    每篇文章的正文被切分为若干段落片段，片段连同所属标题一起生成 Embedding，
+    保存在 `<corpus_dir>/index/chunks.npy` 与 `chunks.json` 中。sidecar 同时保存
+    片段原文，检索时无需再读取文章文件。与 EmbeddingIndex 一样，已发布的对象只读，
+    更新在新对象上进行 (见 Retriever.sync_passages)。
+    """
+
+    def __init__(self, corpus_dir: str, model: str = EMBEDDING_MODEL):
+        self.corpus_dir = corpus_dir
+        self.model = model
+        self.index_dir = os.path.join(corpus_dir, INDEX_DIR_NAME)
+        self.chunks: List[Dict] = []          # {"title", "seq", "text"}
+        self.doc_meta: Dict[str, Dict] = {}   # 标题 -> 文章元信息 (日期、网址)
+        self.matrix: Optional[np.ndarray] = None
+        self.matrix_file: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        loaded = load_vectors(self.index_dir, CHUNK_EMBEDDINGS_FILE, CHUNK_SIDECAR_FILE, self.model)
+        if loaded is None:
+            return False
+
+        matrix, sidecar = loaded
+        self.chunks = sidecar["chunks"]
+        self.doc_meta = sidecar["docs"]
+        self.matrix, self.matrix_file = matrix, sidecar["matrix"]
+        _LIVE_INDEXES.add(self)
+        return True
+
+    def missing_titles(self, titles: List[str]) -> List[str]:
+        """尚未切分入库的文章标题。"""
+        return [t for t in titles if t not in self.doc_meta]
+
+    def add_documents(self, documents: List[Tuple[str, Dict, List[str]]]) -> int:
+        """
+        增量加入文章：documents 为 (标题, 元信息, 段落列表)，返回新增片段数。
+        没有正文的文章也会记录在 docs 中，避免每次同步都重复读取。
+        """
+        with self._lock:
+            if self.matrix is None:
+                self.load()
+
+            new_chunks = [
+                {"title": title, "seq": seq, "text": text}
+                for title, _, passages in documents
+                for seq, text in enumerate(passages)
+            ]
+            doc_meta = dict(self.doc_meta)
+            for title, meta, _ in documents:
+                doc_meta[title] = meta
+
+            matrix = self.matrix
+            if new_chunks:
+                new_matrix = embed_texts(
+                    [f"{chunk['title']}\n{chunk['text']}" for chunk in new_chunks], model=self.model
+                )
+                matrix = append_rows(self.matrix, new_matrix)
+            if matrix is None:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+
+            save_vectors(self.index_dir, CHUNK_EMBEDDINGS_FILE, CHUNK_SIDECAR_FILE, matrix, {
+                "model": self.model,
+                "docs": doc_meta,
+                "chunks": self.chunks + new_chunks,
+            })
+            self.load()
+            if new_chunks:
+                print(f"✅ 段落索引已更新: 新增 {len(new_chunks)} 个片段，共 {len(self.chunks)} 个 ({self.index_dir})")
+            return len(new_chunks)
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """返回 (片段行号, 相似度) 列表，按相似度降序排列。"""
+        if self.matrix is None or not len(self.matrix):
+            return []
+        scores = self.matrix @ query_vector
+        ranked = top_k_indices(scores, top_k)
+        return [(int(i), float(scores[i])) for i in ranked]
+
+
+# --- 进程级索引缓存 ---
+
+_INDEX_CACHE: Dict[str, EmbeddingIndex] = {}
+_CHUNK_INDEX_CACHE: Dict[str, ChunkIndex] = {}
+_BUILDER_LOCKS: Dict[Tuple[str, str], threading.Lock] = {}
+_cache_lock = threading.Lock()
+
+# 当前进程中已加载的索引对象 (弱引用)：对象不再被引用后自动移出，其矩阵文件随之可以清理
+_LIVE_INDEXES: "weakref.WeakSet" = weakref.WeakSet()
+
+# 查询发现索引过期时，在后台构建新版本，查询本身继续使用旧版本
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="index-refresh")
+_refreshing: Set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+def index_builder(corpus_dir: str, kind: str) -> threading.Lock:
+    """同一语料的同一类索引 ("titles" / "chunks" / "lexical") 同一时间只由一个线程构建。"""
+    key = (os.path.abspath(corpus_dir), kind)
+    with _cache_lock:
+        return _BUILDER_LOCKS.setdefault(key, threading.Lock())
+
+
+def refresh_in_background(key: str, func: Callable, *args) -> None:
+    """在后台线程中执行索引构建，同一 key 同时只执行一次；失败只打印原因，下次查询会再次尝试。"""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run() -> None:
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"❌ 后台索引更新失败 ({key}): {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _REFRESH_EXECUTOR.submit(run)
+
+
+def refresh_embedding_index(corpus_dir: str) -> int:
+    """
+    在新的 EmbeddingIndex 对象上与标题列表增量同步，完成后替换进程缓存中的当前版本，返回新增条数。
+    构建期间 (包括生成 Embedding 的网络请求) 查询继续使用旧版本。
+    """
+    with index_builder(corpus_dir, "titles"):
+        index = EmbeddingIndex(corpus_dir)
+        index.load()
+        added = index.sync()
+        with _cache_lock:
+            _INDEX_CACHE[os.path.abspath(corpus_dir)] = index
+    return added
+
+
+def publish_chunk_index(corpus_dir: str, index: ChunkIndex) -> None:
+    """将构建好的段落索引替换为进程缓存中的当前版本。"""
+    with _cache_lock:
+        _CHUNK_INDEX_CACHE[os.path.abspath(corpus_dir)] = index
+
+
+def get_embedding_index(corpus_dir: str) -> EmbeddingIndex:
+    """
+    获取语料目录对应的向量索引：同一进程内只从磁盘加载一次，查询路径上从不生成 Embedding。
+    索引尚未构建 (返回空索引) 或标题列表更新后，在后台增量同步出新版本再替换，当前查询直接使用已有版本。
+    """
+    key = os.path.abspath(corpus_dir)
+    with _cache_lock:
+        index = _INDEX_CACHE.get(key)
+        if index is None:
+            index = EmbeddingIndex(corpus_dir)
+            index.load()
+            _INDEX_CACHE[key] = index
+
+    if index.matrix is None or index.is_stale():
+        refresh_in_background(f"{key}:titles", refresh_embedding_index, corpus_dir)
+    return index
+
+
+def get_chunk_index(corpus_dir: str) -> ChunkIndex:
+    """获取语料目录对应的段落向量索引 (进程内只加载一次)，新文章由 Retriever 负责补齐。"""
+    key = os.path.abspath(corpus_dir)
+    with _cache_lock:
+        index = _CHUNK_INDEX_CACHE.get(key)
+        if index is None:
+            index = ChunkIndex(corpus_dir)
+            index.load()
+            _CHUNK_INDEX_CACHE[key] = index
+    return index
+
+
+def prune_index_versions(index_dir: str, grace: float = INDEX_VERSION_GRACE) -> int:
+    """
+    删除索引目录中不再被引用的矩阵版本文件，返回删除的个数。
+
+    仍被引用的版本：两个 sidecar 当前指向的文件，以及本进程中仍存活的索引对象正在映射的文件。
+    修改时间在 grace 秒以内的文件也保留 (可能是其他进程刚写入、尚未发布的新版本)。
+    删除失败 (例如 Windows 上仍被其他进程映射) 的文件留到下一次清理。
+    """
+    if not os.path.isdir(index_dir):
+        return 0
+
+    referenced = set()
+    for sidecar_file, default_file in ((SIDECAR_FILE, EMBEDDINGS_FILE), (CHUNK_SIDECAR_FILE, CHUNK_EMBEDDINGS_FILE)):
+        try:
+            with open(os.path.join(index_dir, sidecar_file), 'r', encoding='utf-8') as f:
+                referenced.add(json.load(f).get("matrix", default_file))
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError):
+            return 0  # 无法确定当前版本时不做任何删除
+    index_dir_abs = os.path.abspath(index_dir)
+    referenced.update(
+        index.matrix_file for index in list(_LIVE_INDEXES)
+        if index.matrix_file and os.path.abspath(index.index_dir) == index_dir_abs
+    )
+
+    removed = 0
+    now = time.time()
+    with os.scandir(index_dir) as entries:
+        for entry in entries:
+            if not VERSION_FILE_PATTERN.match(entry.name) or entry.name in referenced:
+                continue
+            try:
+                if now - entry.stat().st_mtime < grace:
+                    continue
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                continue
+    return removed
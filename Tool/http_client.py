@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from Config.config import HTTP_BACKOFF, HTTP_POOL_MAXSIZE, HTTP_RETRIES, HTTP_TIMEOUT
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpClient:
+    """
+    进程级共享的 HTTP 层，所有工具 (图书馆接口、爬虫、教务成绩查询) 通过它发请求：
+
+      - 每个主机一个常驻 requests.Session，连接保持 keep-alive，避免每次调用都重新握手 TCP + TLS；
+      - 所有 Session 挂载同一个带连接池的 HTTPAdapter，连接失败 / 429 / 5xx 按指数退避重试；
+      - 请求未指定 timeout 时使用 HTTP_TIMEOUT。
+
+    带个人 Cookie 的请求 (如教务系统) 使用 isolated_session()：独立的 Cookie，共享连接池。
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, retries: int = HTTP_RETRIES,
+                 backoff: float = HTTP_BACKOFF, pool_maxsize: int = HTTP_POOL_MAXSIZE):
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,   # 重试耗尽后返回最后一次响应，由调用方 raise_for_status
+        )
+        self.adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=retry)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        return session
+
+    def session(self, url: str) -> requests.Session:
+        """该 URL 所在主机的共享 Session (首次使用时创建)。"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._new_session()
+        return session
+
+    def isolated_session(self, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+        """Cookie / 请求头独立、连接池共享的 Session，用于携带个人登录态或固定请求头的场景。"""
+        session = self._new_session()
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+        self.adapter.close()
+
+
+http_client = HttpClient()
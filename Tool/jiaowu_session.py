@@ -0,0 +1,213 @@
+import atexit
+import base64
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from selenium import webdriver
+
+from Config.config import (
+    JIAOWU_BROWSER_POOL_SIZE,
+    JIAOWU_BROWSER_WAIT,
+    JIAOWU_PAGE_LOAD_TIMEOUT,
+    JIAOWU_SESSION_DIR,
+    JIAOWU_SESSION_TTL,
+    JIAOWU_STORAGE_ORIGINS,
+)
+from Tool.cancellation import raise_if_cancelled
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # 未安装 cryptography 时只在本次调用内使用 Cookie，不落盘
+    Fernet = None
+
+KDF_ITERATIONS = 200_000
+POOL_POLL_INTERVAL = 0.5   # 等待空闲浏览器时检查取消信号的间隔 (秒)
+
+
+# --- 1. 无头浏览器池 ---
+
+class BrowserPool:
+    """
+    常驻的无头 Chrome 实例池：按需创建，最多 max_size 个，用完归还而不是 quit。
+    归还前清空所有 Cookie、当前页面的 localStorage / sessionStorage 以及教务相关站点的存储，
+    并回到 about:blank，保证下一个用户拿到的是干净的浏览器。
+    """
+
+    def __init__(self, max_size: int = JIAOWU_BROWSER_POOL_SIZE):
+        self.max_size = max_size
+        self._idle: "queue.Queue[webdriver.Chrome]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_driver() -> webdriver.Chrome:
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--window-size=1280,800")
+        driver = webdriver.Chrome(options=options)
+        # 页面加载和脚本都有超时，调用超时被放弃后线程不会卡在 driver.get 上
+        driver.set_page_load_timeout(JIAOWU_PAGE_LOAD_TIMEOUT)
+        driver.set_script_timeout(JIAOWU_PAGE_LOAD_TIMEOUT)
+        return driver
+
+    def acquire(self, timeout: float = JIAOWU_BROWSER_WAIT) -> webdriver.Chrome:
+        """
+        借出一个浏览器实例。池已满时最多等待 timeout 秒，超时抛出 TimeoutError；
+        等待期间调用被执行器取消时抛出 ToolCancelled，不再占着工具线程。
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._new_driver()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # 池已满，等待其他调用归还
+        deadline = time.monotonic() + timeout
+        while True:
+            raise_if_cancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"等待空闲浏览器超过 {timeout} 秒")
+            try:
+                return self._idle.get(timeout=min(remaining, POOL_POLL_INTERVAL))
+            except queue.Empty:
+                continue
+
+    def release(self, driver: webdriver.Chrome, broken: bool = False) -> None:
+        if not broken:
+            try:
+                # delete_all_cookies 只清当前域名，统一认证跨多个域名，用 CDP 清空全部
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                # sessionStorage 只能在所属页面上清空；其余站点存储用 CDP 按站点清空
+                driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+                for origin in JIAOWU_STORAGE_ORIGINS:
+                    driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+                driver.get("about:blank")
+                self._idle.put(driver)
+                return
+            except Exception as e:
+                print(f"❗ 浏览器实例状态异常，将被丢弃: {e}")
+        self.discard(driver)
+
+    def discard(self, driver: webdriver.Chrome) -> None:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(driver)
+
+
+browser_pool = BrowserPool()
+atexit.register(browser_pool.shutdown)
+
+
+# --- 2. 加密 Cookie 缓存 ---
+
+class SessionCache:
+    """
+    按用户保存登录后的 Cookie，文件内容用 Fernet 加密，密钥由用户密码 + 随机盐经 PBKDF2 派生。
+    不单独保存密钥：只有提供正确密码的调用才能解密，密码错误时视为未命中。
+
+    Cookie 在以下情况视为过期：超过 JIAOWU_SESSION_TTL，或任一 Cookie 自带的 expiry 已过。
+    服务端拒绝 (被踢下线等) 由调用方发现后调用 invalidate。
+    """
+
+    def __init__(self, cache_dir: str = JIAOWU_SESSION_DIR, ttl: float = JIAOWU_SESSION_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.enabled = Fernet is not None
+        if not self.enabled:
+            print("❗ 未安装 cryptography，教务系统 Cookie 不会被缓存。")
+
+    def _path(self, username: str) -> str:
+        user_hash = hashlib.sha256(username.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{user_hash}.json")
+
+    @staticmethod
+    def _fernet(password: str, salt: bytes) -> "Fernet":
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+        return Fernet(base64.urlsafe_b64encode(kdf.derive(password.encode("utf-8"))))
+
+    def load(self, username: str, password: str) -> Optional[List[Dict]]:
+        """返回仍然有效的 Cookie 列表，缓存不存在 / 过期 / 无法解密时返回 None。"""
+        if not self.enabled:
+            return None
+        path = self._path(username)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            salt = base64.b64decode(record["salt"])
+            payload = json.loads(self._fernet(password, salt).decrypt(record["token"].encode("ascii")))
+        except FileNotFoundError:
+            return None
+        except InvalidToken:
+            print("❗ Cookie 缓存无法用当前密码解密，忽略。")
+            return None
+        except (ValueError, KeyError) as e:
+            print(f"❗ Cookie 缓存已损坏，忽略: {e}")
+            return None
+
+        now = time.time()
+        cookies = payload["cookies"]
+        if now - payload["saved_at"] > self.ttl:
+            print("❗ Cookie 缓存已超过有效期，需要重新登录。")
+            self.invalidate(username)
+            return None
+        if any("expiry" in cookie and cookie["expiry"] <= now for cookie in cookies):
+            print("❗ Cookie 已过期，需要重新登录。")
+            self.invalidate(username)
+            return None
+        return cookies
+
+    def save(self, username: str, password: str, cookies: List[Dict]) -> None:
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        salt = os.urandom(16)
+        token = self._fernet(password, salt).encrypt(
+            json.dumps({"saved_at": time.time(), "cookies": cookies}).encode("utf-8")
+        )
+        path = self._path(username)
+        tmp_path = f"{path}.tmp"
+        # 仅当前用户可读写
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"salt": base64.b64encode(salt).decode("ascii"), "token": token.decode("ascii")}, f)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, username: str) -> None:
+        try:
+            os.remove(self._path(username))
+        except FileNotFoundError:
+            pass
+
+
+session_cache = SessionCache()
@@ -0,0 +1,141 @@
+import importlib
+import inspect
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ToolSpec:
+    """一个工具的声明：名称、入口 ("模块:函数")、描述与参数 JSON Schema。"""
+
+    def __init__(self, name: str, entry: str, description: str, parameters: Dict[str, Any]):
+        self.name = name
+        self.entry = entry
+        self.description = description
+        self.parameters = parameters
+
+    def schema(self) -> Dict[str, Any]:
+        """发送给模型的 function 描述。"""
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters},
+        }
+
+
+def resolve_entry(entry: str) -> Callable:
+    """导入 "模块:函数" 形式的入口并返回对应的函数。"""
+    module_name, _, attribute = entry.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class LazyTool:
+    """
+    工具入口的惰性代理：第一次调用 (或查询函数签名) 时才导入工具模块，
+    selenium、googleapiclient、BeautifulSoup 等重量级依赖因此不会拖慢启动。
+    """
+
+    def __init__(self, spec: ToolSpec):
+        self.spec = spec
+        self.__name__ = spec.name
+        self.load_seconds: Optional[float] = None
+        self._func: Optional[Callable] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def load(self) -> Callable:
+        if self._func is None:
+            with self._lock:
+                if self._func is None:
+                    start = time.perf_counter()
+                    func = resolve_entry(self.spec.entry)
+                    self.load_seconds = time.perf_counter() - start
+                    self._func = func
+        return self._func
+
+    @property
+    def __signature__(self) -> inspect.Signature:
+        # 预取、调用去重按参数默认值补全参数，需要真实函数的签名
+        return inspect.signature(self.load())
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+_registry: Dict[str, LazyTool] = {}
+
+
+def register_tool(name: str, entry: str, description: str, parameters: Dict[str, Any]) -> LazyTool:
+    """注册 (或覆盖) 一个工具，返回其惰性入口。新工具只需在这里声明，无需修改 Run.py。"""
+    tool = LazyTool(ToolSpec(name, entry, description, parameters))
+    _registry[name] = tool
+    return tool
+
+
+def tool_functions() -> Dict[str, LazyTool]:
+    """工具名 -> 惰性入口 (按注册顺序)。"""
+    return dict(_registry)
+
+
+def tool_schemas() -> List[Dict[str, Any]]:
+    """全部工具的 function 描述 (按注册顺序)。"""
+    return [tool.spec.schema() for tool in _registry.values()]
+
+
+# --- 启动耗时分析 ---
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def profile_imports(module: str, top: int = 15) -> Tuple[float, float, List[Tuple[str, float, float]]]:
+    """
+    在新进程中用 python -X importtime 冷启动导入 module，返回
+    (进程总耗时秒, 导入 module 的累计秒, 直接依赖 [(模块, 自身秒, 累计秒)] 按累计耗时降序取前 top 个)。
+    """
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "startup-profile")   # 只导入不调用，无需真实密钥
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.getcwd(),
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "导入失败")
+
+    # importtime 按后序输出：子模块在父模块之前，缩进每深一层多 2 个空格
+    children: List[Tuple[str, float, float]] = []
+    rows: List[Tuple[str, float, float]] = []
+    import_seconds = 0.0
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if not match:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        row = (match.group(4), int(match.group(1)) / 1e6, int(match.group(2)) / 1e6)
+        if depth == 1:
+            children.append(row)
+        elif depth == 0:
+            if row[0] == module:
+                rows, import_seconds = children, row[2]
+            children = []
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return wall, import_seconds, rows[:top]
+
+
+def profile_tool_loads() -> Dict[str, Any]:
+    """逐个加载工具，返回各工具首次调用时的导入耗时 (秒)；加载失败的工具返回异常对象。"""
+    timings: Dict[str, Any] = {}
+    for name, tool in _registry.items():
+        try:
+            tool.load()
+            timings[name] = tool.load_seconds or 0.0
+        except Exception as e:
+            timings[name] = e
+    return timings
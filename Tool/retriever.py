@@ -0,0 +1,354 @@
+import os
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from Config.config import CHUNK_MAX_CHARS, INDEX_DIR_NAME, PASSAGE_TOKEN_BUDGET, RETRIEVAL_CANDIDATES, RETRIEVAL_MODE
+from Tool.bm25_index import BM25Index, reciprocal_rank_fusion
+from Tool.doc_store import DocumentStore, get_document_store
+from Tool.embedding_index import (
+    TITLE_LIST_FILE,
+    ChunkIndex,
+    EmbeddingIndex,
+    embed_query,
+    get_chunk_index,
+    get_embedding_index,
+    index_builder,
+    prune_index_versions,
+    publish_chunk_index,
+    read_title_list,
+    refresh_embedding_index,
+    refresh_in_background,
+)
+from Tool.text_utils import chunk_paragraphs, estimate_tokens, format_article
+
+MISSING_CONTENT = "内容文件读取失败或不存在。"
+
+
+def fuse_rankings(rankings: List[List[Tuple[Hashable, float]]]) -> List[Tuple[Hashable, float]]:
+    """单路检索直接返回原排序，多路检索用 RRF 融合。"""
+    if len(rankings) <= 1:
+        return rankings[0] if rankings else []
+    return reciprocal_rank_fusion(rankings)
+
+
+class LexicalCorpus:
+    """
+    读取整个语料目录后在内存中构建的字面检索数据：
+    标题级 BM25 (标题 + 正文，按文章编号检索) 与段落级 BM25 (按 (标题, 段落序号) 检索，
+    段落切分方式与向量段落索引一致)。
+    """
+
+    def __init__(self, entries: List[Tuple[int, str]], documents: Dict[int, Tuple[Dict, str]]):
+        self.titles = [title for _, title in entries]
+        self.doc_titles: Dict[int, str] = dict(entries)   # 文章编号 -> 标题
+        self.doc_meta: Dict[str, Dict] = {}
+        self.passages: Dict[Tuple[str, int], str] = {}
+        doc_texts = []
+        for doc_id, title in entries:
+            meta, body = documents.get(doc_id, ({}, ""))
+            self.doc_meta[title] = meta
+            doc_texts.append(f"{title}\n{body}")
+            for seq, text in enumerate(chunk_paragraphs(body, CHUNK_MAX_CHARS)):
+                self.passages[(title, seq)] = text
+
+        self.doc_index = BM25Index([doc_id for doc_id, _ in entries], doc_texts)
+        self.passage_index = BM25Index(
+            list(self.passages),
+            [f"{title}\n{text}" for (title, _), text in self.passages.items()],
+        )
+
+
+class Retriever:
+    """
+    本地语料库的通用检索引擎。
+
+    一个 Retriever 对应一个语料目录 (目录下有 text_title_list.txt 和存放全部正文的文档库)。
+    标题 / 段落向量索引、本地 BM25 索引、文档库连接都在进程内缓存，各个检索工具只需做一层薄封装。
+    语料更新后各索引在新对象上构建、完成后整体替换，查询每次只读取一个版本，不会看到构建到一半的数据。
+    """
+
+    def __init__(self, corpus_dir: str):
+        self.corpus_dir = corpus_dir
+        self._lexical: Optional[LexicalCorpus] = None
+        self._lexical_mtime: float = -1.0
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> EmbeddingIndex:
+        return get_embedding_index(self.corpus_dir)
+
+    @property
+    def chunk_index(self) -> ChunkIndex:
+        return get_chunk_index(self.corpus_dir)
+
+    @property
+    def store(self) -> DocumentStore:
+        return get_document_store(self.corpus_dir)
+
+    # --- 文档读取 ---
+
+    def load_documents(self, doc_ids: List[int]) -> List[str]:
+        """按编号批量读取全文 (含标题、日期、网址行)，文档库中没有的文章返回对应的提示信息。"""
+        try:
+            documents = self.store.fetch(doc_ids)
+        except Exception as e:
+            return [f"读取 {self.corpus_dir} 文档库时发生错误: {e}"] * len(doc_ids)
+        return [
+            format_article(*documents[doc_id]) if doc_id in documents else MISSING_CONTENT
+            for doc_id in doc_ids
+        ]
+
+    def parse_documents(self, doc_ids: List[int]) -> Dict[int, Tuple[Dict, str]]:
+        """按编号批量读取文章：编号 -> (元信息, 正文)，文档库中没有的文章正文为空。"""
+        documents = self.store.fetch(doc_ids)
+        return {doc_id: documents.get(doc_id, ({}, "")) for doc_id in doc_ids}
+
+    # --- 索引构建 ---
+
+    def sync_passages(self) -> int:
+        """
+        为标题列表中尚未切分的文章补齐段落向量索引，返回新增片段数。
+        在新的 ChunkIndex 对象上构建，完成后替换当前版本。
+        """
+        if not self.chunk_index.missing_titles(self.index.titles):
+            return 0
+
+        with index_builder(self.corpus_dir, "chunks"):
+            chunk_index = ChunkIndex(self.corpus_dir)
+            chunk_index.load()
+            index = self.index
+            missing = chunk_index.missing_titles(index.titles)
+            if not missing:
+                # 等待期间已由其他线程补齐
+                return 0
+            doc_ids = dict(zip(index.titles, index.ids))
+            parsed = self.parse_documents([doc_ids[title] for title in missing])
+            documents = [
+                (title, meta, chunk_paragraphs(body, CHUNK_MAX_CHARS))
+                for title, (meta, body) in zip(missing, (parsed[doc_ids[title]] for title in missing))
+            ]
+            added = chunk_index.add_documents(documents)
+            publish_chunk_index(self.corpus_dir, chunk_index)
+        return added
+
+    def refresh_lexical(self) -> LexicalCorpus:
+        """重新读取标题列表与文档库构建 BM25 数据，完成后替换当前版本 (标题列表未变化时直接返回当前版本)。"""
+        title_list_path = os.path.join(self.corpus_dir, TITLE_LIST_FILE)
+        with index_builder(self.corpus_dir, "lexical"):
+            source_mtime = os.path.getmtime(title_list_path)
+            if self._lexical is not None and source_mtime == self._lexical_mtime:
+                return self._lexical
+            entries = read_title_list(title_list_path)
+            lexical = LexicalCorpus(entries, self.parse_documents([doc_id for doc_id, _ in entries]))
+            with self._lock:
+                self._lexical, self._lexical_mtime = lexical, source_mtime
+        return lexical
+
+    def warm_up(self) -> None:
+        """在后台构建 BM25 数据 (服务启动时调用)，首个查询不必等待构建。"""
+        refresh_in_background(f"{os.path.abspath(self.corpus_dir)}:lexical", self.refresh_lexical)
+
+    @property
+    def lexical(self) -> Optional[LexicalCorpus]:
+        """
+        本地 BM25 数据，不依赖任何网络请求。由 build_corpus_index / warm_up 构建，不在查询路径上构建：
+        尚未构建时在后台开始构建并返回 None；标题列表文件更新后在后台重建，重建完成前的查询继续使用旧版本。
+        """
+        lexical = self._lexical
+        if lexical is None or os.path.getmtime(os.path.join(self.corpus_dir, TITLE_LIST_FILE)) != self._lexical_mtime:
+            self.warm_up()
+        return lexical
+
+    def _load_index(self) -> Optional[EmbeddingIndex]:
+        """获取标题向量索引 (不在查询路径上构建)，不可用时打印原因并返回 None。"""
+        try:
+            index = self.index
+        except FileNotFoundError:
+            print(f"错误：标题列表文件未找到: {os.path.join(self.corpus_dir, TITLE_LIST_FILE)}")
+            return None
+        except Exception as e:
+            print(f"向量索引加载失败: {e}")
+            return None
+
+        if not index.titles:
+            print("警告：标题向量索引尚未构建 (已在后台构建) 或标题列表为空。")
+            return None
+        return index
+
+    def _load_lexical(self) -> Optional[LexicalCorpus]:
+        try:
+            lexical = self.lexical
+        except FileNotFoundError:
+            print(f"错误：标题列表文件未找到: {os.path.join(self.corpus_dir, TITLE_LIST_FILE)}")
+            return None
+
+        if lexical is None:
+            print("警告：BM25 索引尚未构建 (已在后台构建)。")
+            return None
+        if not lexical.titles:
+            print("警告：标题列表为空。")
+            return None
+        return lexical
+
+    # --- 检索 ---
+
+    def search(self, query_text: str, top_k: int = 3, mode: str = RETRIEVAL_MODE) -> List[Dict]:
+        """
+        检索与查询最相关的文章并读取全文。
+
+        mode 为 "embedding" 时按标题向量相似度排序，"bm25" 时完全在本地按字面匹配排序，
+        "hybrid" 时两路结果做 RRF 融合 (向量检索失败时自动退化为 BM25，BM25 数据尚未构建时只用向量检索)。
+        """
+        rankings = []
+        doc_titles: Dict[int, str] = {}   # 两路检索都以文章编号为键，融合后按编号读取全文
+
+        # 1. 本地 BM25 (标题 + 正文)
+        if mode != "embedding":
+            lexical = self._load_lexical()
+            if lexical is not None:
+                rankings.append(lexical.doc_index.search(query_text, max(top_k, RETRIEVAL_CANDIDATES)))
+                doc_titles.update(lexical.doc_titles)
+            elif mode == "bm25":
+                return []
+
+        # 2. 标题向量检索，仅对查询语句生成 Embedding
+        if mode != "bm25":
+            index = self._load_index()
+            try:
+                if index is None:
+                    raise RuntimeError("标题向量索引不可用")
+                query_vector = embed_query(query_text)
+                hits = index.search(query_vector, max(top_k, RETRIEVAL_CANDIDATES))
+                rankings.append([(index.ids[row], similarity) for row, similarity in hits])
+                doc_titles.update((index.ids[row], index.titles[row]) for row, _ in hits)
+            except Exception as e:
+                print(f"向量检索不可用: {e}")
+                if mode == "embedding":
+                    return []
+
+        hits = fuse_rankings(rankings)[:top_k]
+
+        # 3. 按编号批量读取全文并组装最终结果
+        contents = self.load_documents([doc_id for doc_id, _ in hits])
+        return [
+            {
+                "title": doc_titles[doc_id].strip(),
+                "score": round(score, 4),
+                "content": content,
+            }
+            for (doc_id, score), content in zip(hits, contents)
+        ]
+
+    def search_passages(
+            self,
+            query_text: str,
+            top_k: int = 3,
+            token_budget: int = PASSAGE_TOKEN_BUDGET,
+            mode: str = RETRIEVAL_MODE,
+    ) -> List[Dict]:
+        """
+        在正文段落中检索，只返回与查询最相关的段落 (检索模式同 search)。
+
+        按片段排名从高到低挑选，最多覆盖 top_k 篇文章，所有段落的估算 token 总数
+        不超过 token_budget (第一篇文章的最佳段落总会保留)。同一篇文章的段落按原文顺序拼接。
+        """
+        rankings = []
+        passage_texts: Dict[Tuple[str, int], str] = {}
+        chunk_texts: Dict[Tuple[str, int], str] = {}
+        doc_meta: Dict[str, Dict] = {}
+        n_candidates = max(RETRIEVAL_CANDIDATES, top_k)
+
+        # 1. 本地 BM25 段落检索
+        if mode != "embedding":
+            lexical = self._load_lexical()
+            if lexical is not None:
+                rankings.append(lexical.passage_index.search(query_text, n_candidates))
+                passage_texts = lexical.passages
+                doc_meta = lexical.doc_meta
+            elif mode == "bm25":
+                return []
+
+        # 2. 段落向量检索
+        if mode != "bm25":
+            try:
+                index = self._load_index()
+                if index is None:
+                    raise RuntimeError("标题向量索引不可用")
+                chunk_index = self.chunk_index
+                if chunk_index.matrix is None or chunk_index.missing_titles(index.titles):
+                    # 段落索引在后台补齐，本次查询使用已有版本 (还没有任何段落索引时只用 BM25)
+                    refresh_in_background(f"{os.path.abspath(self.corpus_dir)}:chunks", self.sync_passages)
+                if chunk_index.matrix is None:
+                    raise RuntimeError("段落向量索引尚未构建")
+                query_vector = embed_query(query_text)
+                ranking = []
+                for row, similarity in chunk_index.search(query_vector, n_candidates):
+                    chunk = chunk_index.chunks[row]
+                    key = (chunk["title"], chunk["seq"])
+                    ranking.append((key, similarity))
+                    chunk_texts[key] = chunk["text"]
+                rankings.append(ranking)
+                doc_meta = doc_meta or chunk_index.doc_meta
+            except Exception as e:
+                print(f"向量检索不可用: {e}")
+                if mode == "embedding":
+                    return []
+
+        # 3. 按排名在 token 预算内挑选段落
+        selected: Dict[str, Dict] = {}
+        used_tokens = 0
+        for (title, seq), score in fuse_rankings(rankings):
+            text = chunk_texts.get((title, seq)) or passage_texts.get((title, seq))
+            if text is None:
+                continue
+            chunk_tokens = estimate_tokens(text)
+            doc = selected.get(title)
+            if doc is None:
+                if len(selected) >= top_k or (selected and used_tokens + chunk_tokens > token_budget):
+                    continue
+                doc = selected[title] = {"score": score, "passages": []}
+            elif used_tokens + chunk_tokens > token_budget:
+                continue
+            doc["passages"].append((seq, text))
+            used_tokens += chunk_tokens
+
+        results = []
+        for title, doc in selected.items():
+            meta = doc_meta.get(title, {})
+            result = {"title": title.strip(), "score": round(doc["score"], 4)}
+            result.update({key: meta[key] for key in ("date", "url") if meta.get(key)})
+            result["content"] = "\n\n".join(text for _, text in sorted(doc["passages"]))
+            results.append(result)
+        return results
+
+
+# --- 进程级 Retriever 注册表 ---
+
+_RETRIEVERS: Dict[str, Retriever] = {}
+_registry_lock = threading.Lock()
+
+
+def get_retriever(corpus_dir: str) -> Retriever:
+    """获取语料目录对应的 Retriever，同一目录在进程内只创建一次。"""
+    key = os.path.abspath(corpus_dir)
+    with _registry_lock:
+        retriever: Optional[Retriever] = _RETRIEVERS.get(key)
+        if retriever is None:
+            retriever = Retriever(corpus_dir)
+            _RETRIEVERS[key] = retriever
+        return retriever
+
+
+def build_corpus_index(corpus_dir: str, with_passages: bool = False) -> int:
+    """
+    供爬虫在更新标题列表后调用：增量同步标题索引，按需补齐段落索引，并重建 BM25 数据
+    (标题列表未变化时沿用当前版本)。每一类索引都在新版本上构建后再替换，
+    最后清理不再被引用的旧版本文件。返回新增的标题数。
+    """
+    retriever = get_retriever(corpus_dir)
+    added = refresh_embedding_index(corpus_dir)
+    if with_passages:
+        retriever.sync_passages()
+    retriever.refresh_lexical()
+    prune_index_versions(os.path.join(corpus_dir, INDEX_DIR_NAME))
+    return added
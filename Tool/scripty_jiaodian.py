@@ -3,21 +3,32 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 import os
 import re
-import openai
-import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 from dotenv import load_dotenv
 
+from Config.config import CRAWL_MAX_WORKERS, JIAODIAN_DIR, JIAODIAN_MAX_LIST_PAGES, PASSAGE_TOKEN_BUDGET
+from Tool.crawler import CrawlManifest, PoliteFetcher
+from Tool.doc_store import get_document_store
+from Tool.retriever import build_corpus_index, get_retriever
+
 # 加载环境变量
 load_dotenv()
 
 
 # --- 工具函数：爬虫脚本封装 ---
-def run_sztu_news_spider():
+def run_sztu_news_spider(full_refresh: bool = False):
     """
     爬取深圳技术大学 (sztu.edu.cn) '技大焦点' 板块的新闻内容。
-    将新闻详情保存为单独的 .txt 文件，并生成一个标题列表文件。
-    该函数无任何入参，直接调用即可触发整个爬虫流程。
+    将新闻详情写入语料目录的文档库 (documents.db)，并生成一个标题列表文件。
+
+    列表页从新到旧处理：先是入口页 xyxw.htm (最新)，再从编号最大的 xyxw/N.htm 依次往下，
+    xyxw/1.htm 是最旧的一页。默认增量抓取：遇到第一个全部文章都已抓取过
+    (或条件请求返回 304) 的列表页即停止，更旧的页不再请求。
+    full_refresh=True 时遍历所有列表页，但仍只下载尚未保存的文章。
+    新文章的详情页在线程池中并发下载 (按主机限流)，按从旧到新的顺序保存，标题列表保持时间顺序。
+    有新文章时顺带增量更新索引并返回新增的标题数；没有新文章 (未更新索引) 时返回 None。
     """
 
     # --- 1. 定义常量 ---
@@ -25,17 +36,27 @@ def run_sztu_news_spider():
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36 Edg/141.0.0.0'
     }
-    OUTPUT_DIR = "./data/text_技大焦点"
+    OUTPUT_DIR = JIAODIAN_DIR
     TITLE_LIST_FILE = "text_title_list.txt"  # 标题列表文件名
+    MANIFEST_FILE = "crawl_manifest.json"  # 爬取清单 (URL / ETag / Last-Modified)
+
+    fetcher = PoliteFetcher(HEADERS)
 
     # --- 2. 辅助函数定义 ---
 
-    def fetch_list_page(url, headers):
-        """请求列表页 HTML 内容。"""
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        response.encoding = 'utf-8'
-        return response.text
+    LANDING_URL = urljoin(BASE_URL, "jdjd/xyxw.htm")
+
+    def list_page_url(number):
+        return urljoin(BASE_URL, f"jdjd/xyxw/{number}.htm")
+
+    def last_page_number(html_content):
+        """入口页的分页链接中最大的页码 (即次新的一页)，没有分页链接时返回 0。"""
+        numbers = [int(n) for n in re.findall(r'xyxw/(\d+)\.htm', html_content or "")]
+        return max(numbers) if numbers else 0
+
+    def fetch_list_page(url, validators):
+        """请求列表页，带上次的 ETag / Last-Modified 做条件请求。"""
+        return fetcher.get(url, **validators)
 
     def parse_list_page(html_content):
         """从列表页提取新闻标题、摘要和完整链接。"""
@@ -64,11 +85,9 @@ def run_sztu_news_spider():
                 })
         return extracted_data
 
-    def fetch_detail_page_and_parse(url, headers):
+    def fetch_detail_page_and_parse(url):
         """请求详情页，精确提取并清洗新闻正文。"""
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        response.encoding = 'utf-8'
+        response = fetcher.get(url)
         soup = BeautifulSoup(response.text, 'html.parser')
 
         # 精确地定位新闻正文内容区域的父级容器
@@ -79,6 +98,7 @@ def run_sztu_news_spider():
             return None, "N/A"
 
         # 1. 提取文章发布日期
+        date_str = "未知日期"
         date_p = content_container.find('div', class_='c-ifo')
         if date_p:
             date_match = re.search(r'时间:\s*(\d{4}/\d{2}/\d{2})', date_p.get_text())
@@ -109,181 +129,163 @@ def run_sztu_news_spider():
         full_content = "\n\n".join(cleaned_text_lines)
         return full_content, date_str
 
-    def save_article_file(title, content):
-        """将文章内容保存到以 [日期]_[标题].txt 命名的文件。"""
-        # 清理标题中的非法字符
-        safe_title = re.sub(r'[\\/:*?"<>|]', '', title).strip()
+    def fetch_article(item):
+        """线程池任务：下载并解析单篇文章，失败时返回 None 内容而不是抛出。"""
+        try:
+            return fetch_detail_page_and_parse(item['full_url'])
+        except requests.RequestException as e:
+            print(f"❌ 详情页 {item['full_url']} 请求失败: {e}")
+            return None, "未知日期"
 
-        # 构造文件名和路径
-        filename = f"{safe_title}.txt"
-        filepath = os.path.join(OUTPUT_DIR, filename)
+    def article_exists(title):
+        return store.contains(title)
 
-        # 检查文件是否已存在，如果存在则跳过（避免重复爬取）
-        if os.path.exists(filepath):
-            print(f"⚠️ 文章已存在，跳过爬取: {filename}")
-            return False  # 返回 False 表示未进行新的保存
+    def save_article(title, content, date_str, url):
+        """将文章的标题、日期、网址和正文写入文档库，返回文章编号 (未保存时为 None)。"""
+        # 同名文章已存在则跳过（避免重复保存）
+        doc_id = store.add(title, content, date=date_str, url=url)
+        if doc_id is None:
+            print(f"⚠️ 文章已存在，跳过保存: {title}")
+            return None
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            # 在文件开头添加标题和日期，保持清晰结构
-            f.write(f"【标题】: {title}\n")
-            f.write(f"【日期】: {date_str}\n\n")
-            f.write(content)
-        print(f"🎉 文章文件已成功保存: {filepath}")
-        return True  # 返回 True 表示进行了新的保存
+        print(f"🎉 文章已保存到文档库: {title}")
+        return doc_id
 
 
-    def update_title_list(new_titles):
-        """将新提取到的标题追加保存到 text_title_list.txt 文件中。"""
+    def update_title_list(new_entries):
+        """将新文章的 (编号, 标题) 追加保存到 text_title_list.txt 文件中，编号与文档库一致。"""
         filepath = os.path.join(OUTPUT_DIR, TITLE_LIST_FILE)
 
-        # 确定起始编号 (用于追加时的正确序号)
-        current_titles_count = 0
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                # 简单计算当前文件已有的标题数量，以便从正确的序号开始追加
-                for line in f:
-                    if re.match(r'^\d+\.', line.strip()):
-                        current_titles_count += 1
+        # 文件不存在或为空时需要先写入头部
+        has_header = os.path.exists(filepath) and os.path.getsize(filepath) > 0
 
         # 核心：使用追加模式 'a' 打开文件
         with open(filepath, 'a', encoding='utf-8') as f:
-            # 如果文件是空的或不存在，则添加头部
-            if current_titles_count == 0:
+            if not has_header:
                 f.write("--- 文章标题列表 ---\n\n")
 
-            start_index = current_titles_count + 1
-            for index, title in enumerate(new_titles):
-                f.write(f"{start_index + index}. {title}\n")
+            for doc_id, title in new_entries:
+                f.write(f"{doc_id}. {title}\n")
 
-        print(f"\n✅ {len(new_titles)} 个新标题已追加到列表文件: {filepath}")
+        print(f"\n✅ {len(new_entries)} 个新标题已追加到列表文件: {filepath}")
 
     # --- 主执行逻辑 ---
 
     # 确保输出目录存在
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+    store = get_document_store(OUTPUT_DIR)
+    manifest = CrawlManifest(os.path.join(OUTPUT_DIR, MANIFEST_FILE))
+
     # 用于保存本次运行中成功新增的文章标题
     newly_processed_titles = []
 
-    # 1. 爬取列表页 (修正循环逻辑，避免覆盖)
+    # 1. 从最新的列表页开始往旧的方向处理，收集尚未抓取过的文章
     print("✨ 开始爬取新闻列表页，处理新的文章...")
+    started = time.time()
 
-    for i in range(1, 108):
-        try:
-            TARGET_URL = urljoin(BASE_URL, f"jdjd/xyxw/{i}.htm")
-            print(f"--- 正在处理列表页: {TARGET_URL} ---")
+    pending_pages = []   # [(列表页 URL, 响应, 新文章列表)]，从新到旧
+    page_queue = [LANDING_URL]
+    while page_queue:
+        TARGET_URL = page_queue.pop(0)
+        print(f"--- 正在处理列表页: {TARGET_URL} ---")
+        validators = {} if full_refresh else manifest.page_validators(TARGET_URL)
 
-            list_html = fetch_list_page(TARGET_URL, HEADERS)
-            news_list = parse_list_page(list_html)
+        try:
+            list_response = fetch_list_page(TARGET_URL, validators)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                print("🚫 列表页不存在，已达列表末尾。")
+                break
+            print(f"❌ 列表页 {TARGET_URL} 请求失败，跳过: {e}")
+            continue
+        except requests.RequestException as e:
+            print(f"❌ 列表页 {TARGET_URL} 请求失败，跳过: {e}")
+            continue
 
-            if not news_list:
-                print("🚫 未提取到任何新闻数据或已达列表末尾。")
-                break  # 列表为空，可能爬取完毕，退出循环
+        if list_response.status_code == 304:
+            print("✅ 列表页自上次抓取以来没有变化，增量抓取结束。")
+            break
+
+        if TARGET_URL == LANDING_URL:
+            # 入口页之后从编号最大的一页依次往下
+            last_page = last_page_number(list_response.text)
+            lowest_page = max(last_page - JIAODIAN_MAX_LIST_PAGES, 0)
+            page_queue = [list_page_url(n) for n in range(last_page, lowest_page, -1)]
+
+        news_list = parse_list_page(list_response.text)
+        if not news_list:
+            print("🚫 未提取到任何新闻数据或已达列表末尾。")
+            break  # 列表为空，可能爬取完毕，退出循环
+
+        # 2. 只保留尚未抓取过的文章 (清单中没有记录，且文档库中也没有同名文章)
+        new_items = []
+        for item in news_list:
+            if manifest.has_article(item['full_url']):
+                continue
+            if article_exists(item['title']):
+                # 旧版本爬虫保存的文章 (已迁移到文档库)：补记到清单中，不再下载
+                manifest.record_article(item['full_url'], item['title'])
+                continue
+            new_items.append(item)
 
-            # 2. 遍历并处理所有新闻
-            for item in news_list:
+        if not new_items:
+            manifest.record_page(TARGET_URL, list_response)
+            if full_refresh:
+                continue
+            print("✅ 该列表页的文章均已抓取，增量抓取结束。")
+            break
+        pending_pages.append((TARGET_URL, list_response, new_items))
+
+    # 3. 并发爬取详情页，从旧到新保存 (新文章追加在标题列表末尾，保持时间顺序)
+    pending_pages.reverse()
+    with ThreadPoolExecutor(max_workers=CRAWL_MAX_WORKERS, thread_name_prefix="crawl") as pool:
+        for TARGET_URL, list_response, new_items in pending_pages:
+            items = new_items[::-1]
+            page_complete = True
+            for item, (content, date_str) in zip(items, pool.map(fetch_article, items)):
                 title = item['title']
-                full_url = item['full_url']
-
-                # 3. 爬取详情页并提取纯文本内容及日期
-                content, date_str = fetch_detail_page_and_parse(full_url, HEADERS)
-
-                # 4. 保存文件并记录标题 (save_article_file 内部会检查重复)
                 if content and content.strip():
-                    if save_article_file(title, content):
+                    doc_id = save_article(title, content, date_str, item['full_url'])
+                    if doc_id is not None:
                         # 只有成功保存的新文章才加入列表
-                        newly_processed_titles.append(title)
+                        newly_processed_titles.append((doc_id, title))
+                    manifest.record_article(item['full_url'], title, time.time())
                 else:
+                    page_complete = False
                     print(f"⚠️ 跳过保存 ({title})：详情页内容提取失败或为空。")
 
-        except requests.RequestException as e:
-            print(f"❌ 列表页 {TARGET_URL} 请求失败，跳过: {e}")
-            continue
+            # 4. 整页处理成功后才记录列表页的 ETag，避免失败的文章下次被条件请求跳过
+            if page_complete:
+                manifest.record_page(TARGET_URL, list_response)
+            manifest.save()
+
+    manifest.save()
+    print(f"⏱️ 抓取用时 {time.time() - started:.1f} 秒")
 
     # 5. 统一更新标题列表文件 (使用追加模式)
     if newly_processed_titles:
         update_title_list(newly_processed_titles)
+        # 6. 增量更新标题与段落向量索引，只为新文章生成 Embedding
+        added = build_corpus_index(OUTPUT_DIR, with_passages=True)
         print(f"\n🎉 爬虫流程结束，共新增 {len(newly_processed_titles)} 篇文章。")
-    else:
-        print("\n🎉 爬虫流程结束，本次运行未发现新的文章需要保存。")
+        return added
+    print("\n🎉 爬虫流程结束，本次运行未发现新的文章需要保存。")
+    return None
 
 
-# --- 语义搜索工具函数 (保持不变) ---
-
-EMBEDDING_MODEL = "text-embedding-3-small"
-api_key = os.getenv("OPENAI_API_KEY")
-TITLE_LIST_FILE = "./data/text_技大焦点/text_title_list.txt"
-CONTENT_BASE_DIR = os.path.dirname(TITLE_LIST_FILE)
+# --- 语义搜索工具函数 ---
 
 def search_jiaodian_news(
         query_text: str,
-        top_k: int = 3
+        top_k: int = 3,
+        token_budget: int = PASSAGE_TOKEN_BUDGET
 ) -> List[Dict]:
     """
-    通过语义搜索从标题列表中检索最相似的标题，并读取对应文件的全文内容。
+    从“技大焦点”新闻正文中检索最相关的段落 (默认向量 + BM25 混合检索)，
+    返回段落所属新闻的标题、日期以及在 token 预算内裁剪后的相关段落。
     """
-
-    # 1. 初始化客户端和读取标题列表
-    client = openai.OpenAI(api_key=api_key)
-
-    try:
-        with open(TITLE_LIST_FILE, 'r', encoding='utf-8') as f:
-            titles_list = [line.strip() for line in f if line.strip()]
-    except FileNotFoundError:
-        print(f"错误：标题列表文件未找到: {TITLE_LIST_FILE}")
-        return []
-
-    if not titles_list:
-        print("警告：标题列表为空。")
-        return []
-
-    # 2. 生成 Embedding 并计算相似度 (检索步骤)
-    all_texts = titles_list + [query_text]
-    try:
-        response = client.embeddings.create(
-            input=all_texts,
-            model=EMBEDDING_MODEL
-        )
-    except Exception as e:
-        print(f"Embedding API 调用失败: {e}")
-        return []
-
-    title_embeddings = np.array([item.embedding for item in response.data[:-1]])
-    query_vector = np.array(response.data[-1].embedding)
-    similarity_scores = np.dot(title_embeddings, query_vector)
-    ranked_indices = np.argsort(similarity_scores)[::-1]
-
-    # 3. 遍历检索结果，读取全文并组装最终结果
-    final_results = []
-
-    for i in range(min(top_k, len(titles_list))):
-        index = ranked_indices[i]
-        title = titles_list[index]
-        score = round(float(similarity_scores[index]), 4)
-
-        cleaned_title = re.sub(r"^\d+\.\s*", "", title)
-        # --- 全文读取逻辑 (内联) ---
-        file_name = f"{cleaned_title.strip()}.txt"
-        full_path = os.path.join(CONTENT_BASE_DIR, file_name)
-        print()
-        full_content = "内容文件读取失败或不存在。"
-        try:
-            if os.path.exists(full_path):
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    full_content = f.read()
-            # 否则保持默认错误信息
-        except Exception as e:
-            full_content = f"读取文件 {file_name} 时发生错误: {e}"
-        # --- 全文读取逻辑结束 ---
-
-        # 组装最终字典
-        final_results.append({
-            "title": cleaned_title.strip(),
-            "score": score,
-            "content": full_content
-        })
-
-    return final_results
+    return get_retriever(JIAODIAN_DIR).search_passages(query_text, top_k, token_budget)
 
 
 # --- 示例调用 ---
@@ -303,7 +305,7 @@ if __name__ == '__main__':
         for i, res in enumerate(results_with_content):
             print(f"Ranking {i + 1}: (相似度: {res['score']})")
             print(f"  标题: {res['title']}")
-            print(f"  全文内容 (前100字): {res['content'][:100]}...")
+            print(f"  相关段落 (前100字): {res['content'][:100]}...")
             print("-" * 35)
     else:
         print("未能找到相似内容或发生错误。")
\ No newline at end of file
@@ -1,12 +1,14 @@
-import requests
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
-import time  # 引入 time 库用于可能的等待
 from typing import Dict, List, Optional
 
+from Logs.tracing import tracer
+from Tool.cancellation import ToolCancelled, is_cancelled, raise_if_cancelled
+from Tool.http_client import http_client
+from Tool.jiaowu_session import browser_pool, session_cache
+
 # --- 1. 配置信息 ---
 YOUR_LOGIN_URL = "https://auth.sztu.edu.cn/idp/authcenter/ActionAuthChain?entityId=jiaowu"
 SCORE_URL = "https://jwxt.sztu.edu.cn/jsxsd/kscj/cjcx_list?ccc=0&ss="  # 成绩查询接口
@@ -21,6 +23,7 @@ def get_login_cookies(driver, login_url, username, password):
     """
     print(f"打开登录页面: {login_url}")
     driver.get(login_url)
+    raise_if_cancelled()
 
     try:
         # 显式等待用户名输入框出现
@@ -39,6 +42,8 @@ def get_login_cookies(driver, login_url, username, password):
         LOGIN_BUTTON_XPATH = "//button[contains(@onclick, 'authen1Form')]"
         login_button = driver.find_element(By.XPATH, LOGIN_BUTTON_XPATH)
 
+        # 调用已被放弃时不再提交登录
+        raise_if_cancelled()
         print("尝试点击登录...")
         login_button.click()
 
@@ -46,8 +51,10 @@ def get_login_cookies(driver, login_url, username, password):
         WebDriverWait(driver, 20).until(
             EC.url_contains("jsxsd")
         )
-        # 增加一个短暂的隐式等待，确保页面完全稳定，特别是 Cookie 完全加载
-        time.sleep(2)
+        # 等待页面加载完成，确保 Cookie 已经写入 (替代固定的 sleep)
+        WebDriverWait(driver, 10).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
 
         # 提取 Cookies
         cookies = driver.get_cookies()
@@ -63,9 +70,10 @@ def get_login_cookies(driver, login_url, username, password):
 
 def get_scores_via_requests(cookies_list):
     """
-    将 Selenium Cookies 注入到 requests.Session，并发送 POST 请求获取成绩。
+    将 Selenium Cookies 注入到独立的 requests.Session (Cookie 独立、连接池共享)，并发送 POST 请求获取成绩。
+    会话被服务端拒绝 (跳转回统一认证或页面中没有成绩表格) 时返回 None。
     """
-    s = requests.Session()
+    s = http_client.isolated_session()
 
     # 1. 转换 Cookies 格式并注入到 Session (保持不变)
     for cookie in cookies_list:
@@ -99,9 +107,14 @@ def get_scores_via_requests(cookies_list):
         'Sec-Fetch-Dest': 'iframe',
     }
 
-    response = s.post(SCORE_URL, data=payload, headers=headers)
+    with tracer.span("http.jiaowu_scores") as span:
+        response = s.post(SCORE_URL, data=payload, headers=headers, timeout=http_client.timeout)
+        span.set(status=response.status_code)
 
     if response.status_code == 200:
+        if "authcenter" in response.url or "dataList" not in response.text:
+            print("❗ 会话已失效，成绩接口返回了登录页面。")
+            return None
         print("✅ 成绩查询成功！")
         return response.text
     else:
@@ -153,21 +166,58 @@ def parse_score_table(score_html: str) -> List[Dict[str, str]]:
 
 
 # --- 5. 主执行流程 ---
-def search_jiaowu_score(username: str, password: str) -> Optional[List[Dict[str, str]]]:
-    # 初始化 WebDriver
-    driver = webdriver.Chrome()
+def login_via_pool(username: str, password: str) -> Optional[List[Dict]]:
+    """从浏览器池借一个常驻的无头浏览器完成登录，用完归还。"""
+    try:
+        with tracer.span("selenium.acquire"):
+            driver = browser_pool.acquire()
+    except (TimeoutError, ToolCancelled):
+        # 浏览器池繁忙：作为工具错误抛给执行器，而不是当成登录失败
+        raise
+    except Exception as e:
+        print(f"❌ 无法启动浏览器: {e}")
+        return None
 
-    # 1. 使用 Selenium 登录并获取 Cookies
-    cookies = get_login_cookies(driver, YOUR_LOGIN_URL, username, password)
+    broken = False
+    try:
+        # 排队等浏览器期间调用可能已超时，此时不再登录
+        if is_cancelled():
+            return None
+        with tracer.span("selenium.login"):
+            return get_login_cookies(driver, YOUR_LOGIN_URL, username, password)
+    except ToolCancelled:
+        # 调用已超时：浏览器本身没有问题，清理后归还，线程尽快释放
+        return None
+    except Exception as e:
+        broken = True
+        print(f"❌ 浏览器登录过程异常: {e}")
+        return None
+    finally:
+        browser_pool.release(driver, broken=broken)
+
+
+def search_jiaowu_score(username: str, password: str) -> Optional[List[Dict[str, str]]]:
+    # 1. 优先复用缓存的会话，完全跳过浏览器
+    cookies = session_cache.load(username, password)
+    if cookies:
+        score_html = get_scores_via_requests(cookies)
+        if score_html:
+            return parse_score_table(score_html)
+        # 会话被拒绝，清除缓存后重新登录
+        session_cache.invalidate(username)
 
-    driver.quit()
+    # 2. 使用 Selenium 登录并获取 Cookies (调用已超时则不再启动耗时的登录)
+    raise_if_cancelled()
+    cookies = login_via_pool(username, password)
 
     if cookies:
-        # 2. 使用 Cookies 发送 Requests 请求获取成绩 HTML
+        raise_if_cancelled()
+        # 3. 使用 Cookies 发送 Requests 请求获取成绩 HTML
         score_html = get_scores_via_requests(cookies)
 
         if score_html:
-            # 3. 解析成绩 HTML
+            session_cache.save(username, password, cookies)
+            # 4. 解析成绩 HTML
             return parse_score_table(score_html)
 
     return None
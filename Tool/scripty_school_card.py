@@ -2,12 +2,14 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 import os
-import re
-import openai
-import numpy as np
 from typing import List, Dict, Optional
 from dotenv import load_dotenv  # 导入 dotenv 库
 
+from Config.config import SCHOOL_CARD_DIR
+from Tool.doc_store import get_document_store
+from Tool.http_client import http_client
+from Tool.retriever import build_corpus_index, get_retriever
+
 load_dotenv()
 
 
@@ -15,8 +17,9 @@ load_dotenv()
 def run_sztu_news_spider():
     """
     爬取深圳技术大学 (sztu.edu.cn) '校园一卡通' 板块的文章内容。
-    将文章详情保存为单独的 .txt 文件，并生成一个标题列表文件。
+    将文章的标题和网址写入语料目录的文档库 (documents.db)，并生成一个标题列表文件。
     该函数无任何入参，直接调用即可触发整个爬虫流程。
+    保存了文章时顺带增量更新索引并返回新增的标题数；未更新索引时返回 None。
     """
 
     # --- 1. 配置常量 (集中管理) ---
@@ -26,7 +29,7 @@ def run_sztu_news_spider():
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36 Edg/141.0.0.0'
     }
-    OUTPUT_DIR = "../data/text_校园一卡通"
+    OUTPUT_DIR = SCHOOL_CARD_DIR
     TITLE_LIST_FILE = "text_title_list.txt"
 
     print(f"✅ 目标URL: {TARGET_URL}")
@@ -37,7 +40,7 @@ def run_sztu_news_spider():
     def fetch_list_page(url, headers):
         """请求列表页 HTML 内容，处理网络异常。"""
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = http_client.get(url, headers=headers)
             response.raise_for_status()
             response.encoding = 'utf-8'
             print("💡 成功获取列表页内容.")
@@ -76,33 +79,25 @@ def run_sztu_news_spider():
         return extracted_data
 
 
-    def save_article_file(title,url):
-        """将文章内容保存到 [日期]_[清理后的标题].txt 文件。"""
-        # 清理标题中的非法字符
-        safe_title = re.sub(r'[\\/:*?"<>|]', '', title).strip()
-        filename = f"{safe_title}.txt"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-
+    def save_article(title, url):
+        """将文章的标题和网址写入文档库 (已存在的文章更新网址，编号不变)，返回文章编号，失败时为 None。"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"【标题】: {title}\n")
-                f.write(f"【网址】: {url}\n\n")
-
-            print(f"🎉 文件已保存: {filepath.replace(OUTPUT_DIR + os.path.sep, '')}")
-            return True
+            doc_id = store.add(title, url=url, replace=True)
+            print(f"🎉 文章已保存到文档库: {title}")
+            return doc_id
         except Exception as e:
-            print(f"❌ 文件保存失败 ({filename}): {e}")
-            return False
+            print(f"❌ 文章保存失败 ({title}): {e}")
+            return None
 
-    def update_title_list(all_titles):
-        """将所有成功处理的文章标题保存到列表文件。"""
+    def update_title_list(all_entries):
+        """将所有成功处理的文章 (编号, 标题) 按爬取顺序保存到列表文件，编号与文档库一致。"""
         filepath = os.path.join(OUTPUT_DIR, TITLE_LIST_FILE)
 
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write("--- 文章标题列表 (按爬取顺序) ---\n\n")
-                for index, title in enumerate(all_titles):
-                    f.write(f"{index + 1}. {title}\n")  # 从 1 开始编号
+                for doc_id, title in all_entries:
+                    f.write(f"{doc_id}. {title}\n")
             print(f"\n✅ 标题列表文件已更新: {filepath}")
         except Exception as e:
             print(f"❌ 标题列表保存失败: {e}")
@@ -111,6 +106,7 @@ def run_sztu_news_spider():
 
     # 确保输出目录存在
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    store = get_document_store(OUTPUT_DIR)
 
     # 1. 爬取并解析列表页
     list_html = fetch_list_page(TARGET_URL, HEADERS)
@@ -130,93 +126,30 @@ def run_sztu_news_spider():
         title = item['title']
         url = item['full_url']
         # 仅保存成功提取到正文的文章
-        if save_article_file(title, url):
-            processed_titles.append(title)
+        doc_id = save_article(title, url)
+        if doc_id is not None:
+            processed_titles.append((doc_id, title))
         else:
             print(f"⚠️ 跳过保存 ({title})：未提取到有效正文内容。")
 
     # 3. 更新标题列表文件
     if processed_titles:
         update_title_list(processed_titles)
+        # 4. 增量更新向量索引
+        return build_corpus_index(OUTPUT_DIR)
+    return None
 
 
 # 查询工具
 
-EMBEDDING_MODEL = "text-embedding-3-small"
-api_key = os.getenv("OPENAI_API_KEY")
-TITLE_LIST_FILE = "../data/text_校园一卡通/text_title_list.txt"
-CONTENT_BASE_DIR = os.path.dirname(TITLE_LIST_FILE)
-
 def search_school_card_text(
         query_text: str,
         top_k: int = 3
 ) -> List[Dict]:
     """
-    通过语义搜索从标题列表中检索最相似的标题，并读取对应文件的全文内容。
+    从“校园一卡通”文章中检索最相关的办事指南 (默认向量 + BM25 混合检索)，并返回对应文件的全文内容。
     """
-
-    # 1. 初始化客户端和读取标题列表
-    client = openai.OpenAI(api_key=api_key)
-
-    try:
-        with open(TITLE_LIST_FILE, 'r', encoding='utf-8') as f:
-            titles_list = [line.strip() for line in f if line.strip()]
-    except FileNotFoundError:
-        print(f"错误：标题列表文件未找到: {TITLE_LIST_FILE}")
-        return []
-
-    if not titles_list:
-        print("警告：标题列表为空。")
-        return []
-
-    # 2. 生成 Embedding 并计算相似度 (检索步骤)
-    all_texts = titles_list + [query_text]
-    try:
-        response = client.embeddings.create(
-            input=all_texts,
-            model=EMBEDDING_MODEL
-        )
-    except Exception as e:
-        print(f"Embedding API 调用失败: {e}")
-        return []
-
-    title_embeddings = np.array([item.embedding for item in response.data[:-1]])
-    query_vector = np.array(response.data[-1].embedding)
-    similarity_scores = np.dot(title_embeddings, query_vector)
-    ranked_indices = np.argsort(similarity_scores)[::-1]
-
-    # 3. 遍历检索结果，读取全文并组装最终结果
-    final_results = []
-
-    for i in range(min(top_k, len(titles_list))):
-        index = ranked_indices[i]
-        title = titles_list[index]
-        score = round(float(similarity_scores[index]), 4)
-
-        cleaned_title = re.sub(r"^\d+\.\s*", "", title)
-
-        # --- 全文读取逻辑 (内联) ---
-        file_name = f"{cleaned_title.strip()}.txt"
-        full_path = os.path.join(CONTENT_BASE_DIR, file_name)
-        print()
-        full_content = "内容文件读取失败或不存在。"
-        try:
-            if os.path.exists(full_path):
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    full_content = f.read()
-            # 否则保持默认错误信息
-        except Exception as e:
-            full_content = f"读取文件 {file_name} 时发生错误: {e}"
-        # --- 全文读取逻辑结束 ---
-
-        # 组装最终字典
-        final_results.append({
-            "title": cleaned_title.strip(),
-            "score": score,
-            "content": full_content
-        })
-
-    return final_results
+    return get_retriever(SCHOOL_CARD_DIR).search(query_text, top_k)
 
 
 # --- 示例调用 ---
@@ -0,0 +1,153 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from Config.config import GOOGLE_CACHE_PATH, GOOGLE_CACHE_STALE_TTL, GOOGLE_CACHE_TTL, GOOGLE_DAILY_QUOTA
+from Tool.text_utils import normalize_query
+
+COUNTERS = ("api_calls", "hits", "stale_hits", "misses", "quota_blocked")
+COUNTER_FLUSH_EVERY = 50      # 内存中累计多少次计数后写入 SQLite
+COUNTER_FLUSH_INTERVAL = 60   # 距上次写入超过该秒数时也写入一次 (进程退出时写入剩余计数)
+
+
+class SearchResultCache:
+    """
+    联网搜索结果的持久化缓存 (SQLite)，键为 (归一化查询, 结果条数)。
+
+      lookup 返回缓存结果及其状态：fresh (未过 ttl)、stale (过期但未超过 ttl + stale_ttl)，
+      更旧的记录视为不存在；
+      另按天记录 API 调用、命中、过期复用、未命中、因配额被拦截的次数，跨进程累计，
+      用于观察缓存效果和控制每日配额。日期按本地时间划分。命中等计数先在内存中累加，
+      攒够一批或间隔一段时间后再一次写入，查询路径上不必每次都提交事务；
+      API 调用次数关系到配额，仍然每次立即写入。
+    """
+
+    def __init__(self, db_path: str = GOOGLE_CACHE_PATH, ttl: float = GOOGLE_CACHE_TTL,
+                 stale_ttl: float = GOOGLE_CACHE_STALE_TTL, daily_quota: int = GOOGLE_DAILY_QUOTA):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.daily_quota = daily_quota
+        self._lock = threading.Lock()
+        self._pending: Counter = Counter()   # (日期, 计数名) -> 尚未写入 SQLite 的次数
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "query TEXT NOT NULL, num INTEGER NOT NULL, results TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (query, num))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS usage (day TEXT PRIMARY KEY, "
+            + ", ".join(f"{name} INTEGER NOT NULL DEFAULT 0" for name in COUNTERS) + ")"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _today() -> str:
+        return time.strftime("%Y-%m-%d")
+
+    def lookup(self, query: str, num: int) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+        """返回 (结果, 状态)，状态为 "fresh" / "stale" / "miss"。"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT results, fetched_at FROM results WHERE query = ? AND num = ?", (normalize_query(query), num)
+            ).fetchone()
+        if row is None:
+            return None, "miss"
+        age = time.time() - row[1]
+        if age <= self.ttl:
+            return json.loads(row[0]), "fresh"
+        if age <= self.ttl + self.stale_ttl:
+            return json.loads(row[0]), "stale"
+        return None, "miss"
+
+    def store(self, query: str, num: int, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (query, num, results, fetched_at) VALUES (?, ?, ?, ?)",
+                (normalize_query(query), num, json.dumps(results, ensure_ascii=False), time.time()),
+            )
+            # 顺带清理超过可复用期限的记录
+            self._db.execute("DELETE FROM results WHERE fetched_at < ?", (time.time() - self.ttl - self.stale_ttl,))
+            self._db.commit()
+
+    def count(self, counter: str) -> None:
+        """计数加一 (只在内存中累加，按批写入)。"""
+        with self._lock:
+            self._pending[(self._today(), counter)] += 1
+            if (sum(self._pending.values()) >= COUNTER_FLUSH_EVERY
+                    or time.monotonic() - self._last_flush >= COUNTER_FLUSH_INTERVAL):
+                self._flush_locked()
+
+    def flush_counters(self) -> None:
+        """把内存中累加的计数写入 SQLite。"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        for (day, counter), amount in self._pending.items():
+            self._db.execute(
+                f"INSERT INTO usage (day, {counter}) VALUES (?, ?) "
+                f"ON CONFLICT(day) DO UPDATE SET {counter} = {counter} + excluded.{counter}",
+                (day, amount),
+            )
+        self._db.commit()
+        self._pending.clear()
+
+    def try_reserve_call(self) -> bool:
+        """今日 API 调用未达配额时记一次调用并返回 True；已达配额返回 False。"""
+        with self._lock:
+            row = self._db.execute("SELECT api_calls FROM usage WHERE day = ?", (self._today(),)).fetchone()
+            if row is not None and row[0] >= self.daily_quota:
+                return False
+            self._db.execute(
+                "INSERT INTO usage (day, api_calls) VALUES (?, 1) "
+                "ON CONFLICT(day) DO UPDATE SET api_calls = api_calls + 1",
+                (self._today(),),
+            )
+            self._db.commit()
+            return True
+
+    def stats(self, day: Optional[str] = None) -> Dict[str, Any]:
+        """某天 (默认今天) 的计数 (含尚未写入的部分)，以及命中率与剩余配额。"""
+        day = day or self._today()
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(COUNTERS)} FROM usage WHERE day = ?", (day,)).fetchone()
+            pending = {counter: self._pending[(day, counter)] for counter in COUNTERS}
+        stats: Dict[str, Any] = {
+            counter: value + pending[counter]
+            for counter, value in zip(COUNTERS, row or (0,) * len(COUNTERS))
+        }
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["day"] = day
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        stats["quota_left"] = max(self.daily_quota - stats["api_calls"], 0)
+        return stats
+
+
+_cache: Optional[SearchResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """进程内共享的搜索结果缓存，首次使用时打开；GOOGLE_CACHE_PATH 为 None 时返回 None。"""
+    global _cache
+    with _cache_lock:
+        if _cache is None and GOOGLE_CACHE_PATH:
+            _cache = SearchResultCache()
+            atexit.register(_cache.flush_counters)
+        return _cache
+
+
+def cache_stats() -> Optional[Dict[str, Any]]:
+    """今日的缓存与配额统计；本进程尚未用过联网搜索时返回 None。"""
+    return _cache.stats() if _cache is not None else None
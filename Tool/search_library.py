@@ -1,7 +1,22 @@
 import requests
 import json
+import threading
+import time
+import concurrent.futures
+from collections import OrderedDict
 from urllib.parse import quote
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+from Config.config import (
+    LIBRARY_CACHE_SIZE,
+    LIBRARY_CACHE_TTL,
+    LIBRARY_ENDPOINT_TIMEOUT,
+    LIBRARY_MAX_KEYWORDS,
+    LIBRARY_MAX_WORKERS,
+)
+from Logs.tracing import bind, tracer
+from Tool.http_client import http_client
+from Tool.text_utils import normalize_query
 
 # 预设的请求头
 HEADERS = {
@@ -9,60 +24,133 @@ HEADERS = {
     'Accept': 'application/json, text/plain, */*'
 }
 
+# 接口类型 -> (URL 模板, 结果字段名)
+API_ENDPOINTS = {
+    "suggest": ("https://lib-opac.sztu.edu.cn/meta-local/opac/search/_suggest?fieldName=all&query={keyword}&size=7",
+                "suggest_data"),    # 关键词自动补全结果列表
+    "recommend": ("https://lib-opac.sztu.edu.cn/meta-local/opac/commend/subject_loan?subject={keyword}&num=6",
+                  "recommend_data"),  # 主题推荐结果列表
+}
 
-def search_library_data(keyword: str) -> Dict[str, Any]:
+# 各接口、各关键词的请求并发执行，一次查询的耗时约等于最慢的那个接口
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=LIBRARY_MAX_WORKERS, thread_name_prefix="library")
+
+# 关键词 (归一化) -> (过期时间, 查询结果)，按 LRU 淘汰
+_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return entry[1]
+
+
+def _cache_put(key: str, results: Dict[str, Any]) -> None:
+    with _cache_lock:
+        _cache[key] = (time.time() + LIBRARY_CACHE_TTL, results)
+        _cache.move_to_end(key)
+        while len(_cache) > LIBRARY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _fetch_endpoint(api_type: str, keyword: str) -> Optional[List[Any]]:
+    """请求单个接口，返回其中的 data 列表；失败时打印原因并返回 None。"""
+    url_template, _ = API_ENDPOINTS[api_type]
+    url = url_template.format(keyword=quote(keyword))
+    try:
+        with tracer.span("http.library", endpoint=api_type):
+            response = http_client.get(url, headers=HEADERS, timeout=LIBRARY_ENDPOINT_TIMEOUT)
+        response.raise_for_status()  # 检查 HTTP 状态码
+
+        # 提取数据部分
+        extracted_data = response.json().get('data', [])
+        if api_type == "suggest":
+            print(f"  > [{keyword}] 成功获取 {len(extracted_data)} 条自动补全建议。")
+        else:
+            print(f"  > [{keyword}] 成功获取 {len(extracted_data)} 条主题推荐结果。")
+        return extracted_data
+
+    except requests.exceptions.Timeout:
+        print(f"  ❌ [{keyword}] {api_type.upper()} 请求超时。")
+    except requests.exceptions.RequestException as e:
+        print(f"  ❌ [{keyword}] {api_type.upper()} 请求失败: 网络或 HTTP 错误: {e}")
+    except json.JSONDecodeError:
+        print(f"  ❌ [{keyword}] {api_type.upper()} 响应不是有效的 JSON 格式。")
+    except Exception as e:
+        print(f"  ❌ [{keyword}] {api_type.upper()} 发生未知错误: {e}")
+    return None
+
+
+def _lookup_keywords(keywords: List[str]) -> Dict[str, Dict[str, Any]]:
     """
-    根据关键词获取图书馆系统的自动补全建议和主题推荐数据。
+    查询一批关键词 (按用户输入原样请求，缓存键为归一化后的形式)：先查缓存，未命中的 (关键词, 接口) 组合全部并发请求，
+    总共最多等待 LIBRARY_ENDPOINT_TIMEOUT 秒。两个接口都成功的关键词才写入缓存。
     """
+    results: Dict[str, Dict[str, Any]] = {}
+    futures = {}
+    for keyword in keywords:
+        cached = _cache_get(normalize_query(keyword))
+        if cached is not None:
+            print(f"  > [{keyword}] 命中缓存。")
+            results[keyword] = cached
+            continue
+        results[keyword] = {field: None for _, field in API_ENDPOINTS.values()}
+        for api_type in API_ENDPOINTS:
+            futures[_EXECUTOR.submit(bind(_fetch_endpoint, api_type, keyword))] = (keyword, api_type)
+
+    if not futures:
+        return results
+
+    done, not_done = concurrent.futures.wait(futures, timeout=LIBRARY_ENDPOINT_TIMEOUT)
+    for future in not_done:
+        keyword, api_type = futures[future]
+        future.cancel()
+        print(f"  ❌ [{keyword}] {api_type.upper()} 超过 {LIBRARY_ENDPOINT_TIMEOUT} 秒未返回，已跳过。")
+    for future in done:
+        keyword, api_type = futures[future]
+        results[keyword][API_ENDPOINTS[api_type][1]] = future.result()
+
+    for keyword in {keyword for keyword, _ in futures.values()}:
+        if all(value is not None for value in results[keyword].values()):
+            _cache_put(normalize_query(keyword), results[keyword])
+    return results
 
-    # 1. 对关键词进行 URL 编码
-    encoded_keyword = quote(keyword)
-
-    # 2. 构造 API 接口 URL
-    suggest_url = f"https://lib-opac.sztu.edu.cn/meta-local/opac/search/_suggest?fieldName=all&query={encoded_keyword}&size=7"
-    recommend_url = f"https://lib-opac.sztu.edu.cn/meta-local/opac/commend/subject_loan?subject={encoded_keyword}&num=6"
-
-    api_endpoints = {
-        "suggest": suggest_url,
-        "recommend": recommend_url
-    }
-
-    results: Dict[str, Any] = {
-        "suggest_data": None,  # 关键词自动补全结果列表
-        "recommend_data": None  # 主题推荐结果列表
-    }
-
-    print(f"--- 开始查询关键词: {keyword} ---")
-
-    # 3. 循环执行请求
-    for api_type, url in api_endpoints.items():
-        try:
-            print(f"正在请求 {api_type} 接口...")
-            response = requests.get(url, headers=HEADERS, timeout=10)
-            response.raise_for_status()  # 检查 HTTP 状态码
-
-            data = response.json()
-
-            # 提取数据部分并存储到结果字典中
-            extracted_data = data.get('data', [])
-
-            if api_type == "suggest":
-                results["suggest_data"] = extracted_data
-                print(f"  > 成功获取 {len(extracted_data)} 条自动补全建议。")
-            elif api_type == "recommend":
-                results["recommend_data"] = extracted_data
-                print(f"  > 成功获取 {len(extracted_data)} 条主题推荐结果。")
-
-        except requests.exceptions.Timeout:
-            print(f"  ❌ {api_type.upper()} 请求超时。")
-        except requests.exceptions.RequestException as e:
-            print(f"  ❌ {api_type.upper()} 请求失败: 网络或 HTTP 错误: {e}")
-        except json.JSONDecodeError:
-            print(f"  ❌ {api_type.upper()} 响应不是有效的 JSON 格式。")
-        except Exception as e:
-            print(f"  ❌ {api_type.upper()} 发生未知错误: {e}")
 
+def search_library_data(keyword: str = "", keywords: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    根据关键词获取图书馆系统的自动补全建议和主题推荐数据。
+
+    只传 keyword 时返回 {"suggest_data": [...], "recommend_data": [...]}；
+    传入 keywords (可同时带 keyword) 时批量查询，返回 {关键词: 上述结果}。
+    关键词按用户输入原样 (只去掉首尾空白) 发给图书馆接口；缓存以归一化后的关键词 (全角转半角、转小写、
+    合并空白) 为键，归一化后相同的关键词只查询一次，结果以第一次出现的写法为键。
+    两个接口并发请求，结果缓存 LIBRARY_CACHE_TTL 秒。
+    """
+    batch = [k.strip() for k in ([keyword] if keyword else []) + list(keywords or []) if k and k.strip()]
+    unique: Dict[str, str] = {}
+    for k in batch:
+        unique.setdefault(normalize_query(k), k)
+    batch = list(unique.values())
+    if not batch:
+        print("❌ 未提供查询关键词。")
+        return {"error": "未提供查询关键词"}
+    if len(batch) > LIBRARY_MAX_KEYWORDS:
+        print(f"❗ 关键词过多，只查询前 {LIBRARY_MAX_KEYWORDS} 个。")
+        batch = batch[:LIBRARY_MAX_KEYWORDS]
+
+    print(f"--- 开始查询关键词: {', '.join(batch)} ---")
+    results = _lookup_keywords(batch)
     print("--- 查询完成 ---\n")
+
+    if keywords is None:
+        return results[batch[0]]
     return results
 
 
@@ -75,3 +163,6 @@ if __name__ == "__main__":
 
     # 打印返回结果的结构
     print(all_results)
+
+    # 批量查询
+    print(search_library_data(keywords=["机器学习", "深度学习"]))
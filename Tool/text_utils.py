@@ -0,0 +1,107 @@
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+# 文章文件头部的元信息行，例如 "【标题】: xxx"、"【日期】: 2024-01-01"、"【网址】: https://..."
+HEADER_PATTERN = re.compile(r"^【(.+?)】:\s*(.*)$")
+HEADER_KEYS = {"标题": "title", "日期": "date", "网址": "url"}
+
+# 疑似包含登录凭据的文本：英文凭据字样、"账号:密码" 形式或学号一类的长数字串
+CREDENTIAL_PATTERN = re.compile(
+    r"password|passwd|pwd|username|login|口令|登录|用户名|[A-Za-z0-9_.@-]{4,}\s*[:：/]\s*\S{4,}|\d{8,}",
+    re.IGNORECASE,
+)
+CJK_PATTERN = re.compile(r"[㐀-鿿豈-﫿　-〿＀-￯]")
+
+
+def normalize_query(text: str) -> str:
+    """缓存键的文本归一化：全角转半角 (NFKC)、转小写、合并空白。"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数：中文字符 (含全角标点) 约 1 token/字，其余字符约 4 字符/token。
+    只用于预算控制，不追求与分词器完全一致。
+    """
+    if not text:
+        return 0
+    cjk_count = len(CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def split_article(text: str) -> Tuple[Dict[str, str], str]:
+    """拆分文章文件：返回 (元信息字典, 正文)。"""
+    meta: Dict[str, str] = {}
+    lines = text.splitlines()
+    body_start = 0
+    for i, line in enumerate(lines):
+        match = HEADER_PATTERN.match(line.strip())
+        if match and match.group(1) in HEADER_KEYS:
+            meta[HEADER_KEYS[match.group(1)]] = match.group(2).strip()
+            body_start = i + 1
+        elif line.strip():
+            break
+    return meta, "\n".join(lines[body_start:]).strip()
+
+
+def format_article(meta: Dict[str, str], body: str) -> str:
+    """split_article 的逆操作：按文章文件的格式拼回元信息行与正文。"""
+    header = "\n".join(f"【{label}】: {meta[key]}" for label, key in HEADER_KEYS.items() if meta.get(key))
+    return f"{header}\n\n{body}" if header else body
+
+
+def chunk_paragraphs(body: str, max_chars: int) -> List[str]:
+    """
+    按空行切分段落，将过短的相邻段落合并、过长的段落按句号切开，
+    使每个片段不超过 max_chars 个字符。
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", body) if p.strip()]
+
+    pieces: List[str] = []
+    for paragraph in paragraphs:
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        sentence_buffer = ""
+        for sentence in re.split(r"(?<=[。！？!?；;])", paragraph):
+            if len(sentence_buffer) + len(sentence) > max_chars and sentence_buffer:
+                pieces.append(sentence_buffer)
+                sentence_buffer = ""
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            sentence_buffer += sentence
+        if sentence_buffer:
+            pieces.append(sentence_buffer)
+
+    chunks: List[str] = []
+    buffer = ""
+    for piece in pieces:
+        if buffer and len(buffer) + len(piece) + 1 > max_chars:
+            chunks.append(buffer)
+            buffer = piece
+        else:
+            buffer = f"{buffer}\n{piece}" if buffer else piece
+    if buffer:
+        chunks.append(buffer)
+    return chunks
+
+
+TOKEN_RUN_PATTERN = re.compile(r"[㐀-鿿豈-﫿]+|[a-z0-9]+")
+
+
+def tokenize_ngrams(text: str) -> List[str]:
+    """
+    面向中文的轻量分词：连续汉字切成单字 + 相邻双字 (bigram)，英文和数字按整词保留。
+    不依赖词典，适合标题、通知这类短文本的字面匹配。
+    """
+    tokens: List[str] = []
+    for run in TOKEN_RUN_PATTERN.findall(text.lower()):
+        if run[0].isascii():
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(map(str.__add__, run[:-1], run[1:]))
+    return tokens
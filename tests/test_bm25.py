@@ -0,0 +1,45 @@
+import pytest
+
+from Tool.bm25_index import BM25Index, reciprocal_rank_fusion
+from Tool.doc_store import get_document_store
+from Tool.embedding_index import TITLE_LIST_FILE
+from Tool.retriever import fuse_rankings, get_retriever
+
+
+def test_bm25_ranks_matching_documents_and_skips_misses():
+    index = BM25Index([10, 20, 30], ["图书馆周末开放时间调整", "二食堂推出新菜品", "图书馆新增自习座位 图书馆预约"])
+
+    hits = index.search("图书馆", top_k=5)
+
+    assert [key for key, _ in hits] == [30, 10]
+    assert all(score > 0 for _, score in hits)
+    assert index.search("运动会", top_k=5) == []
+
+
+def test_rrf_rewards_documents_ranked_by_both_lists():
+    fused = reciprocal_rank_fusion([[("a", 9.0), ("b", 5.0)], [("b", 0.9), ("c", 0.8)]], k=60)
+
+    assert [key for key, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_fuse_rankings_keeps_a_single_ranking_as_is():
+    ranking = [("a", 3.0), ("b", 1.0)]
+    assert fuse_rankings([ranking]) == ranking
+    assert fuse_rankings([]) == []
+
+
+def test_bm25_data_is_built_off_the_query_path(tmp_path):
+    corpus_dir = str(tmp_path)
+    store = get_document_store(corpus_dir)
+    library = store.add("图书馆开放时间调整", "图书馆周末开放到晚上十点")
+    canteen = store.add("食堂新菜品", "二食堂推出新菜品")
+    (tmp_path / TITLE_LIST_FILE).write_text(f"{library}. 图书馆开放时间调整\n{canteen}. 食堂新菜品\n", encoding="utf-8")
+    retriever = get_retriever(corpus_dir)
+
+    # 尚未构建时查询不等待构建，后台构建完成后即可检索
+    assert retriever.search("图书馆", mode="bm25") == []
+    retriever.refresh_lexical()
+    results = retriever.search("图书馆", mode="bm25")
+    assert [result["title"] for result in results] == ["图书馆开放时间调整"]
+    assert "晚上十点" in results[0]["content"]
@@ -0,0 +1,46 @@
+import json
+
+from Agent.context_manager import COMPACTED_PREFIX, ContextManager
+
+
+def tool_round(*sizes):
+    call = {"function": {"name": "search_news", "arguments": "{}"}}
+    messages = [{"role": "assistant", "content": "", "tool_calls": [call] * len(sizes)}]
+    for size in sizes:
+        payload = [{"title": f"文章{size}", "url": "https://example.com", "content": "正文" * size}]
+        messages.append({"role": "tool", "content": json.dumps(payload, ensure_ascii=False)})
+    return messages
+
+
+def compacted(messages):
+    return [message["content"].startswith(COMPACTED_PREFIX) for message in messages if message["role"] == "tool"]
+
+
+def test_stale_results_are_compacted_largest_first_across_rounds():
+    messages = [{"role": "user", "content": "问题"}] + tool_round(300) + tool_round(1000) + tool_round(2000)
+    manager = ContextManager(messages, keep_recent_rounds=1)
+    manager.budget = manager.total_tokens() - 1000
+
+    stats = manager.compact()
+
+    # 较早的两轮里先压缩第二轮中更大的结果，第一轮的小结果和最近一轮都保持原样
+    assert compacted(messages) == [False, True, False]
+    assert stats["compacted"] == 1
+    assert stats["after"] <= manager.budget < stats["before"]
+
+
+def test_recent_rounds_are_compacted_only_after_stale_ones():
+    messages = [{"role": "user", "content": "问题"}] + tool_round(300) + tool_round(2000)
+    manager = ContextManager(messages, keep_recent_rounds=1)
+    manager.budget = manager.total_tokens() - 1000
+
+    manager.compact()
+
+    assert compacted(messages) == [True, True]
+
+
+def test_within_budget_nothing_is_compacted():
+    messages = [{"role": "user", "content": "问题"}] + tool_round(300)
+    manager = ContextManager(messages, budget=10 ** 6)
+    assert manager.compact() is None
+    assert compacted(messages) == [False]
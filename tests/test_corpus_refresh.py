@@ -0,0 +1,32 @@
+import Tool.corpus_refresh as corpus_refresh
+from Tool.corpus_refresh import CorpusRefresher
+
+
+def spider_that_indexed():
+    return 3
+
+
+def spider_without_new_articles():
+    return None
+
+
+def test_refresh_uses_the_spider_count_and_builds_once(monkeypatch):
+    builds = []
+    monkeypatch.setattr(corpus_refresh, "build_corpus_index", lambda *args, **kwargs: builds.append(args) or 0)
+    refresher = CorpusRefresher({"corpus": f"{__name__}:spider_that_indexed"}, interval=0)
+
+    result = refresher.refresh("corpus")
+
+    assert result["ok"] and result["added"] == 3
+    assert builds == []
+
+
+def test_refresh_builds_when_the_spider_did_not(monkeypatch):
+    builds = []
+    monkeypatch.setattr(corpus_refresh, "build_corpus_index", lambda *args, **kwargs: builds.append(args) or 5)
+    refresher = CorpusRefresher({"corpus": f"{__name__}:spider_without_new_articles"}, interval=0)
+
+    result = refresher.refresh("corpus")
+
+    assert result["ok"] and result["added"] == 5
+    assert builds == [("corpus",)]
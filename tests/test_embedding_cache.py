@@ -0,0 +1,55 @@
+import numpy as np
+
+from Tool.embedding_cache import EmbeddingCache
+
+
+def vector(value):
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_lru_evicts_the_least_recently_used_query():
+    cache = EmbeddingCache(capacity=2, db_path=None)
+    cache.put("model", "讲座", vector(1))
+    cache.put("model", "食堂", vector(2))
+    assert cache.get("model", "讲座") is not None   # 讲座 变为最近使用
+    cache.put("model", "图书馆", vector(3))
+
+    assert cache.get("model", "食堂") is None
+    assert cache.get("model", "讲座")[0] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_keys_are_normalized():
+    cache = EmbeddingCache(capacity=4, db_path=None)
+    cache.put("model", " ＡＢＣ  讲座 ", vector(1))
+    assert cache.get("model", "abc 讲座") is not None
+    assert cache.get("other-model", "abc 讲座") is None
+
+
+def test_vectors_persist_across_instances(tmp_path):
+    db_path = str(tmp_path / "embeddings.db")
+    EmbeddingCache(capacity=4, db_path=db_path).put("model", "讲座", vector(1))
+
+    reopened = EmbeddingCache(capacity=4, db_path=db_path)
+    assert np.array_equal(reopened.get("model", "讲座"), vector(1))
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_persist_false_keeps_the_text_off_disk(tmp_path):
+    db_path = str(tmp_path / "embeddings.db")
+    cache = EmbeddingCache(capacity=4, db_path=db_path)
+    cache.put("model", "学号20210001", vector(1), persist=False)
+    assert cache.get("model", "学号20210001") is not None
+
+    assert EmbeddingCache(capacity=4, db_path=db_path).get("model", "学号20210001") is None
+
+
+def test_disk_keeps_only_the_most_recent_entries(tmp_path):
+    db_path = str(tmp_path / "embeddings.db")
+    cache = EmbeddingCache(capacity=4, db_path=db_path, disk_capacity=2)
+    for i, text in enumerate(["讲座", "食堂", "图书馆"]):
+        cache.put("model", text, vector(i))
+
+    reopened = EmbeddingCache(capacity=4, db_path=db_path)
+    assert reopened.get("model", "讲座") is None
+    assert reopened.get("model", "图书馆") is not None
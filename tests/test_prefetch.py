@@ -0,0 +1,40 @@
+import json
+from types import SimpleNamespace
+
+from Agent.prefetch import SpeculativePrefetch
+
+
+def search_jiaodian_news(query_text, top_k=3):
+    return [{"title": query_text, "top_k": top_k}]
+
+
+def tool_call(arguments, name="search_jiaodian_news"):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=json.dumps(arguments, ensure_ascii=False)))
+
+
+def started(user_input):
+    prefetch = SpeculativePrefetch(user_input, {"search_jiaodian_news": search_jiaodian_news})
+    assert prefetch.start() == ["search_jiaodian_news"]
+    return prefetch
+
+
+def test_claim_reuses_only_the_same_normalized_query():
+    prefetch = started("最近有什么讲座")
+    assert prefetch.claim(tool_call({"query_text": "最近讲座"})) is None
+
+    future = prefetch.claim(tool_call({"query_text": " 最近有什么讲座 ", "top_k": 3}))
+    assert future is not None
+    assert future.result() == [{"title": "最近有什么讲座", "top_k": 3}]
+    # 每个预取只能被认领一次
+    assert prefetch.claim(tool_call({"query_text": "最近有什么讲座"})) is None
+
+
+def test_claim_rejects_different_arguments():
+    prefetch = started("最近有什么讲座")
+    assert prefetch.claim(tool_call({"query_text": "最近有什么讲座", "top_k": 5})) is None
+    assert prefetch.discard() == ["search_jiaodian_news"]
+
+
+def test_credential_like_input_is_not_prefetched():
+    prefetch = SpeculativePrefetch("学号20210001 密码abc 讲座", {"search_jiaodian_news": search_jiaodian_news})
+    assert prefetch.start() == []
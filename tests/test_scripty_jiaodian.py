@@ -0,0 +1,80 @@
+import requests
+
+import Tool.scripty_jiaodian as scripty_jiaodian
+from Tool.doc_store import get_document_store
+
+BASE = "https://www.sztu.edu.cn/"
+
+
+def list_page(items, pager=""):
+    links = "".join(
+        f'<li><a href="{href}"><div class="yy-ifo"><h3>{title}</h3><p>摘要</p></div></a></li>'
+        for href, title in items
+    )
+    return f"<html><body><ul>{links}</ul>{pager}</body></html>"
+
+
+def detail_page(text):
+    return (
+        '<html><body><div class="content-pg"><div class="c-ifo">时间: 2025/10/20</div>'
+        f"<p>{text}</p></div></body></html>"
+    )
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.headers = {}
+
+
+def make_fetcher(pages, requested):
+    class FakeFetcher:
+        def __init__(self, headers=None):
+            pass
+
+        def get(self, url, etag=None, last_modified=None):
+            requested.append(url)
+            if url not in pages:
+                response = requests.Response()
+                response.status_code = 404
+                raise requests.HTTPError(response=response)
+            return FakeResponse(pages[url])
+
+    return FakeFetcher
+
+
+def test_new_article_on_newest_page_is_stored(tmp_path, monkeypatch):
+    """入口页 (最新) 上的新文章被保存，遇到全部已抓取的列表页后不再请求更旧的页。"""
+    corpus_dir = str(tmp_path)
+    store = get_document_store(corpus_dir)
+    assert store.add("最旧的文章", "旧正文", url=BASE + "info/1.htm") == 1
+    assert store.add("次新的文章", "正文", url=BASE + "info/2.htm") == 2
+
+    pages = {
+        BASE + "jdjd/xyxw.htm": list_page(
+            [("../info/3.htm", "最新的文章"), ("../info/2.htm", "次新的文章")],
+            pager='<a href="xyxw/2.htm">下页</a><a href="xyxw/1.htm">尾页</a>',
+        ),
+        BASE + "jdjd/xyxw/2.htm": list_page([("../../info/2.htm", "次新的文章")]),
+        BASE + "jdjd/xyxw/1.htm": list_page([("../../info/1.htm", "最旧的文章")]),
+        BASE + "info/3.htm": detail_page("新文章的正文。"),
+    }
+    requested = []
+    indexed = []
+    monkeypatch.setattr(scripty_jiaodian, "JIAODIAN_DIR", corpus_dir)
+    monkeypatch.setattr(scripty_jiaodian, "PoliteFetcher", make_fetcher(pages, requested))
+    monkeypatch.setattr(scripty_jiaodian, "build_corpus_index", lambda *args, **kwargs: indexed.append(args))
+
+    scripty_jiaodian.run_sztu_news_spider()
+
+    meta, body = store.fetch([3])[3]
+    assert meta["title"] == "最新的文章"
+    assert body == "新文章的正文。"
+    assert meta["date"] == "2025-10-20"
+    assert requested[0] == BASE + "jdjd/xyxw.htm"
+    assert BASE + "jdjd/xyxw/1.htm" not in requested
+    assert indexed
+    with open(tmp_path / "text_title_list.txt", encoding="utf-8") as f:
+        # 标题列表中的编号与文档库中的编号一致
+        assert "3. 最新的文章" in f.read()
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+
+# Server 导入时会创建 OpenAI 客户端；其他模块的 load_dotenv 可能已把 .env 中的空值写入环境变量
+if not os.environ.get("OPENAI_API_KEY"):
+    os.environ["OPENAI_API_KEY"] = "test"
+
+import Server
+from Config.config import MAX_WORKERS, SERVER_MAX_BODY_BYTES, SERVER_MAX_ITERATIONS
+from Server import AgentServer
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def request(raw, feed_eof=True):
+    """把原始请求交给 AgentServer.handle，返回 (状态码, JSON 响应体)。"""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        if feed_eof:
+            reader.feed_eof()
+        writer = FakeWriter()
+        await AgentServer().handle(reader, writer)
+        assert writer.closed
+        return writer.data
+
+    head, _, body = asyncio.run(run()).partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(body)
+
+
+def post_chat(payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return request(b"POST /chat HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+
+
+def test_invalid_chat_requests_are_rejected_with_400():
+    assert post_chat({"query": ""})[0] == 400
+    assert post_chat({"text": "讲座"})[0] == 400
+    assert post_chat({"query": "讲座", "max_iterations": "abc"})[0] == 400
+    assert post_chat({"query": "讲座", "max_iterations": 0})[0] == 400
+    assert request(b"garbage\r\n\r\n")[0] == 400
+
+
+def test_max_iterations_is_capped(monkeypatch):
+    calls = []
+
+    async def fake_agent(query, max_iterations, on_delta=None):
+        calls.append(max_iterations)
+        return f"回答: {query}"
+
+    monkeypatch.setattr(Server, "run_master_agent_async", fake_agent)
+    status, payload = post_chat({"query": "讲座", "max_iterations": 10 ** 6, "session_id": "s1"})
+
+    assert status == 200
+    assert payload["answer"] == "回答: 讲座" and payload["session_id"] == "s1"
+    assert calls == [SERVER_MAX_ITERATIONS]
+
+
+def test_oversized_body_is_rejected_with_413():
+    status, _ = request(b"POST /chat HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (SERVER_MAX_BODY_BYTES + 1))
+    assert status == 413
+
+
+def test_slow_client_gets_408(monkeypatch):
+    monkeypatch.setattr(Server, "SERVER_READ_TIMEOUT", 0.05)
+    status, _ = request(b"POST /chat HTTP/1.1\r\nContent-Length: 10\r\n\r\n{", feed_eof=False)
+    assert status == 408
+
+
+def test_concurrency_is_clamped_to_the_tool_pool():
+    server = AgentServer(max_concurrency=MAX_WORKERS + 10)
+    assert server.max_concurrency == MAX_WORKERS
+    assert server._semaphore._value == MAX_WORKERS
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from Agent.streaming import StreamAssembler
+
+
+def chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = SimpleNamespace(role=None, content=content, tool_calls=tool_calls)
+    return SimpleNamespace(
+        id="chatcmpl-1", created=0, model="fake", usage=None,
+        choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)],
+    )
+
+
+def tool_delta(index, name=None, arguments=None, call_id=None):
+    return SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_text_round_streams_each_delta_as_it_arrives():
+    received = []
+    assembler = StreamAssembler(received.append, holdback=True)
+
+    assembler.add_chunk(chunk(content="你"))
+    assert received == ["你"]
+    assembler.add_chunk(chunk(content="好"))
+    assert received == ["你", "好"]
+    assembler.add_chunk(chunk(finish_reason="stop"))
+
+    message = assembler.build().choices[0].message
+    assert message.content == "你好"
+    assert message.tool_calls is None
+
+
+def test_tool_call_round_emits_no_text():
+    received = []
+    assembler = StreamAssembler(received.append, holdback=True)
+
+    assembler.add_chunk(chunk(tool_calls=[tool_delta(0, name="search_news", call_id="call_1")]))
+    assembler.add_chunk(chunk(tool_calls=[tool_delta(0, arguments='{"query_text": ')]))
+    assembler.add_chunk(chunk(content="稍等", tool_calls=[tool_delta(0, arguments='"讲座"}')]))
+    assembler.add_chunk(chunk(finish_reason="tool_calls"))
+
+    assert received == []
+    response = assembler.build()
+    assert response.choices[0].finish_reason == "tool_calls"
+    call = response.choices[0].message.tool_calls[0]
+    assert call.id == "call_1"
+    assert call.function.name == "search_news"
+    assert call.function.arguments == '{"query_text": "讲座"}'
+
+
+def test_without_holdback_text_is_forwarded_even_in_tool_call_round():
+    received = []
+    assembler = StreamAssembler(received.append, holdback=False)
+
+    assembler.add_chunk(chunk(tool_calls=[tool_delta(0, name="search_news", call_id="call_1")]))
+    assembler.add_chunk(chunk(content="稍等"))
+
+    assert received == ["稍等"]
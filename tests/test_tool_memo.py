@@ -0,0 +1,59 @@
+import pytest
+
+from Agent.tool_memo import ToolMemo, canonical_arguments
+
+
+def search_news(query_text, top_k=3):
+    return []
+
+
+def test_canonical_arguments_fills_defaults_and_sorts_keys():
+    assert canonical_arguments(search_news, {"query_text": "运动会"}) == \
+        canonical_arguments(search_news, {"top_k": 3, "query_text": "运动会"})
+    assert canonical_arguments(search_news, {"query_text": "运动会", "top_k": 5}) != \
+        canonical_arguments(search_news, {"query_text": "运动会"})
+
+
+def test_first_claim_owns_and_duplicates_in_the_same_round_coalesce():
+    memo = ToolMemo()
+    memo.begin_round()
+    key = ("search_news", canonical_arguments(search_news, {"query_text": "运动会"}))
+
+    future, owner, source = memo.claim(key)
+    assert (owner, source) == (True, "new")
+    duplicate, owner, source = memo.claim(key)
+    assert (owner, source) == (False, "batch")
+    assert duplicate is future
+
+    memo.resolve(key, "结果")
+    assert duplicate.result(timeout=1) == "结果"
+    assert (memo.coalesced, memo.hits) == (1, 0)
+
+
+def test_later_rounds_reuse_the_memoized_result():
+    memo = ToolMemo()
+    key = ("search_news", "{}")
+    memo.begin_round()
+    future, _, _ = memo.claim(key)
+    memo.resolve(key, "结果")
+
+    memo.begin_round()
+    reused, owner, source = memo.claim(key)
+    assert (owner, source) == (False, "memo")
+    assert reused is future and reused.result() == "结果"
+    assert memo.hits == 1
+
+
+def test_failed_call_is_removed_so_the_next_claim_runs_again():
+    memo = ToolMemo()
+    key = ("search_news", "{}")
+    memo.begin_round()
+    future, _, _ = memo.claim(key)
+    waiter, _, _ = memo.claim(key)
+    memo.resolve(key, error=TimeoutError("超时"))
+
+    with pytest.raises(TimeoutError):
+        waiter.result()
+    retry, owner, source = memo.claim(key)
+    assert (owner, source) == (True, "new")
+    assert retry is not future